@@ -1,9 +1,21 @@
-from flask import Flask, request, jsonify, render_template, send_file
+from flask import Flask, Response, request, jsonify, render_template, send_file, stream_with_context
 from celery import Celery
+from celery.signals import worker_process_init
 import os
 from pathlib import Path
 from src.format_converter import convert_to_jsonl
 from src.location_extractor import extract_location_data
+from src.pipeline import run_fused_pipeline
+from src.format_detector import detect_format
+from src.satellite_tables import write_satellite_tables
+from src.resampler import RESAMPLE_METHODS, resample_location_file
+from src.incremental import ResumeRegistry, find_resumable, head_key, resume_processing, resume_state
+from src.columnar_writer import OUTPUT_FORMATS, OUTPUT_EXTENSIONS, parquet_available
+from src.result_cache import ResultCache, CACHE_MAX_BYTES, cache_key, save_and_hash
+from src.timestamp_index import INDEX_SUFFIX, remove_index
+from src.result_query import is_result_file, parse_bbox, parse_fields, parse_time_ms, query_records
+from src.json_encoder import encode_record
+from src.sandbox_pool import sandbox_pool
 from werkzeug.utils import secure_filename
 import uuid
 import json
@@ -17,15 +29,100 @@ app.config['CELERY_RESULT_BACKEND'] = 'redis://localhost:6383/0'
 celery = Celery(app.name, broker=app.config['CELERY_BROKER_URL'])
 celery.conf.update(app.config)
 
+@worker_process_init.connect
+def start_sandboxes(**kwargs):
+    """Start the sandboxes for generated code with each worker process, so the first LLM attempt does not wait for them"""
+    sandbox_pool.start()
+
 UPLOAD_FOLDER = 'uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Results of earlier uploads, keyed by content hash, pipeline version and options
+CACHE_FOLDER = 'cache'
+result_cache = ResultCache(CACHE_FOLDER, int(os.getenv('RESULT_CACHE_MAX_BYTES', CACHE_MAX_BYTES)))
+
+# Cache keys of earlier uploads by file head, so re-uploads of a growing log only process the new tail
+resume_registry = ResumeRegistry(os.path.join(CACHE_FOLDER, '.resume'))
+
+# Formats with a fused pipeline are converted and extracted in one pass, set
+# this to still write the converted records (for debugging or auditing)
+KEEP_CONVERTED_OUTPUT = os.getenv('KEEP_CONVERTED_OUTPUT', '').lower() in ('1', 'true', 'yes')
+
+# Download content types by file extension
+DOWNLOAD_MIMETYPES = {
+    '.jsonl': 'application/json',
+    '.parquet': 'application/vnd.apache.parquet',
+}
+
+def write_satellite_output(file_path, satellites_output, output_format, output):
+    """Write the per-epoch GSV satellite tables of an NMEA upload, returning the file name or None"""
+    if detect_format(file_path)[0] != 'NMEA':
+        return None
+    satellites_file = os.path.join(UPLOAD_FOLDER, satellites_output)
+    try:
+        if write_satellite_tables(file_path, satellites_file, output_format) > 0:
+            output.append(f"Successfully assembled satellite tables: {satellites_output}")
+            return satellites_output
+        os.remove(satellites_file)
+        remove_index(satellites_file)
+    except Exception as e:
+        output.append(f"Warning: Could not assemble satellite tables: {str(e)}")
+    return None
+
+def resample_output(location_file, resample, output_format, output):
+    """Resample a location output in place when a sample rate was requested, returning False on failure"""
+    if not resample:
+        return True
+    rate_hz, method = resample['rate'], resample['method']
+    if resample_location_file(location_file, location_file, rate_hz, method, output_format):
+        output.append(f"Resampled location data to {rate_hz:g} Hz ({method})")
+        return True
+    output.append(f"Error: Could not resample location data to {rate_hz:g} Hz")
+    return False
+
+def resume_outputs(file_path, incremental, output_names, output):
+    """Continue the outputs of an earlier upload that this file extends, returning (files, resume state) or None"""
+    prior_key, manifest = find_resumable(result_cache, resume_registry, file_path, incremental['head'])
+    if not manifest:
+        return None
+    
+    # Copies, not links, as the files are appended to
+    files = {}
+    for role, name in output_names.items():
+        path = os.path.join(UPLOAD_FOLDER, name)
+        if result_cache.restore(prior_key, manifest, role, path, link=False):
+            files[role] = path
+    if 'location' not in files:
+        return None
+    
+    state = manifest['resume']
+    output.append(f"Upload extends an earlier upload, processing from byte {state['resume_offset']}")
+    new_state = resume_processing(file_path, state, files['location'], files.get('satellites'), files.get('converted'))
+    if new_state is None:
+        output.append("Incremental processing failed, processing the whole file")
+        return None
+    return files, new_state
+
+def remember_for_resume(file_path, incremental, cache_key, files, state=None):
+    """Cache the outputs with the point later, grown uploads of the file can resume from"""
+    if state is None:
+        file_format, _ = detect_format(file_path)
+        state = resume_state(file_path, file_format, files['location']) or {}
+    result_cache.store(cache_key, files, metadata={'resume': state})
+    if state:
+        resume_registry.register(incremental['head'], cache_key)
+
 @celery.task(bind=True)
-def process_gnss_data(self, file_path, original_filename=None):
+def process_gnss_data(self, file_path, original_filename=None, output_format='jsonl', cache_key=None, resample=None,
+                      incremental=None):
     """Process GNSS data file in two steps:
     1. Convert to JSONL format
     2. Extract location data
-    If standard processing fails, fall back to LLM assistance
+    Formats with a fused pipeline run both steps in one pass. If standard
+    processing fails, fall back to LLM assistance. resample ({'rate': Hz,
+    'method': ...}) resamples the location output to a fixed rate.
+    incremental ({'head': head_key}) continues the outputs of an earlier
+    upload that this file extends, processing only the new tail
     """
     try:
         output = []
@@ -36,20 +133,89 @@ def process_gnss_data(self, file_path, original_filename=None):
             
         # Generate output filenames based on original filename
         base_name = os.path.splitext(original_filename)[0]
-        jsonl_output = f"{base_name}.jsonl"
-        location_output = f"{base_name}.location.jsonl"
+        extension = OUTPUT_EXTENSIONS[output_format]
+        jsonl_output = f"{base_name}{extension}"
+        location_output = f"{base_name}.location{extension}"
+        satellites_output = f"{base_name}.satellites{extension}"
+        
+        # Reuse the conversion of an identical earlier upload when it is cached
+        jsonl_file = None
+        manifest = result_cache.lookup(cache_key) if cache_key else None
+        if manifest and result_cache.restore(cache_key, manifest, 'converted', os.path.join(UPLOAD_FOLDER, jsonl_output)):
+            jsonl_file = os.path.join(UPLOAD_FOLDER, jsonl_output)
+        
+        # Append to the outputs of an earlier upload when this one extends it
+        resumed = resume_outputs(file_path, incremental, {
+            'location': location_output, 'satellites': satellites_output, 'converted': jsonl_output,
+        }, output) if incremental and cache_key and not manifest else None
+        if resumed:
+            files, state = resumed
+            output.append(f"Successfully extracted location data: {location_output}")
+            remember_for_resume(file_path, incremental, cache_key, files, state)
+            try:
+                os.remove(file_path)  # Remove the uploaded file with UUID name
+            except Exception as e:
+                output.append(f"Warning: Could not clean up temporary files: {str(e)}")
+            return {
+                'status': 'success',
+                'result_file': location_output,
+                'satellites_file': satellites_output if 'satellites' in files else None,
+                'output': output
+            }
+        
+        # Convert and extract in one pass when the format allows it
+        if not manifest:
+            output.append("Starting one-pass conversion and location extraction...")
+            self.update_state(state='PROGRESS', meta={'output': output})
+            converted_file = os.path.join(UPLOAD_FOLDER, jsonl_output) if KEEP_CONVERTED_OUTPUT else None
+            result_file = run_fused_pipeline(
+                file_path, os.path.join(UPLOAD_FOLDER, location_output), output_format, converted_file,
+            )
+            if result_file and not resample_output(result_file, resample, output_format, output):
+                return {
+                    'status': 'error',
+                    'message': f'Failed to resample location data of {original_filename}',
+                    'output': output
+                }
+            if result_file:
+                output.append("Converted and extracted location data in one pass")
+                output.append(f"Successfully extracted location data: {location_output}")
+                satellites_file = write_satellite_output(file_path, satellites_output, output_format, output)
+                files = {
+                    'converted': converted_file,
+                    'location': result_file,
+                    'satellites': satellites_file and os.path.join(UPLOAD_FOLDER, satellites_file),
+                }
+                if cache_key and incremental:
+                    remember_for_resume(file_path, incremental, cache_key, files)
+                elif cache_key:
+                    result_cache.store(cache_key, files)
+                try:
+                    os.remove(file_path)  # Remove the uploaded file with UUID name
+                except Exception as e:
+                    output.append(f"Warning: Could not clean up temporary files: {str(e)}")
+                return {
+                    'status': 'success',
+                    'result_file': location_output,
+                    'satellites_file': satellites_file,
+                    'output': output
+                }
+            output.append("One-pass processing not available, converting and extracting separately")
         
         # Step 1: Convert to JSONL - Try standard conversion once
         output.append("Starting file format detection and conversion...")
         self.update_state(state='PROGRESS', meta={'output': output})
         
         try:
-            # Try standard conversion once
-            jsonl_file = convert_to_jsonl(file_path, os.path.join(UPLOAD_FOLDER, jsonl_output))
             if jsonl_file:
-                output.append("Standard conversion successful")
+                output.append("Standard conversion skipped, using cached conversion result")
             else:
-                raise Exception("Standard conversion failed")
+                # Try standard conversion once
+                jsonl_file = convert_to_jsonl(file_path, os.path.join(UPLOAD_FOLDER, jsonl_output), output_format=output_format)
+                if jsonl_file:
+                    output.append("Standard conversion successful")
+                else:
+                    raise Exception("Standard conversion failed")
         except Exception as e:
             output.append(f"Standard conversion failed: {str(e)}")
             output.append("Falling back to LLM assistance for conversion...")
@@ -75,6 +241,8 @@ def process_gnss_data(self, file_path, original_filename=None):
         
         output.append(f"Successfully converted file to JSONL: {jsonl_output}")
         self.update_state(state='PROGRESS', meta={'output': output})
+        if cache_key and not manifest:
+            result_cache.store(cache_key, {'converted': jsonl_file})
         
         # Step 2: Extract location data - Try standard extraction once
         output.append("Starting location data extraction...")
@@ -82,7 +250,7 @@ def process_gnss_data(self, file_path, original_filename=None):
         
         try:
             # Try standard extraction once
-            result_file = extract_location_data(jsonl_file, os.path.join(UPLOAD_FOLDER, location_output))
+            result_file = extract_location_data(jsonl_file, os.path.join(UPLOAD_FOLDER, location_output), output_format=output_format)
             if result_file:
                 output.append("Standard location extraction successful")
             else:
@@ -113,13 +281,26 @@ def process_gnss_data(self, file_path, original_filename=None):
                     'output': output
                 }
         
+        if not resample_output(result_file, resample, output_format, output):
+            return {
+                'status': 'error',
+                'message': f'Failed to resample location data from {jsonl_output}',
+                'output': output
+            }
         output.append(f"Successfully extracted location data: {location_output}")
+        satellites_file = write_satellite_output(file_path, satellites_output, output_format, output)
+        if cache_key:
+            result_cache.store(cache_key, {
+                'location': os.path.join(UPLOAD_FOLDER, location_output),
+                'satellites': satellites_file and os.path.join(UPLOAD_FOLDER, satellites_file),
+            })
         
         # Clean up temporary files
         try:
             os.remove(file_path)  # Remove the uploaded file with UUID name
             if jsonl_file != os.path.join(UPLOAD_FOLDER, location_output):  # Don't remove if it's the same as output
                 os.remove(jsonl_file)  # Remove intermediate JSONL file
+                remove_index(jsonl_file)
         except Exception as e:
             output.append(f"Warning: Could not clean up temporary files: {str(e)}")
         
@@ -127,6 +308,7 @@ def process_gnss_data(self, file_path, original_filename=None):
         return {
             'status': 'success',
             'result_file': location_output,
+            'satellites_file': satellites_file,
             'output': output
         }
         
@@ -151,23 +333,70 @@ def upload_file():
     if file.filename == '':
         return jsonify({'status': 'error', 'message': 'No selected file'})
     
+    # Output format is chosen per upload, JSONL unless Parquet is requested
+    output_format = request.form.get('output_format', 'jsonl').lower()
+    if output_format not in OUTPUT_FORMATS:
+        return jsonify({'status': 'error', 'message': f'Unsupported output format: {output_format}'})
+    if output_format == 'parquet' and not parquet_available():
+        return jsonify({'status': 'error', 'message': 'Parquet output requires pyarrow on the server'})
+    
+    # Optional fixed output rate, the receiver rate is kept when none is given
+    resample = None
+    sample_rate = request.form.get('sample_rate', '').strip()
+    if sample_rate:
+        resample_method = request.form.get('resample_method', 'nearest').lower()
+        try:
+            rate_hz = float(sample_rate)
+        except ValueError:
+            rate_hz = 0
+        if not rate_hz > 0 or rate_hz == float('inf'):
+            return jsonify({'status': 'error', 'message': f'Invalid sample rate: {sample_rate}'})
+        if resample_method not in RESAMPLE_METHODS:
+            return jsonify({'status': 'error', 'message': f'Unsupported resampling method: {resample_method}'})
+        resample = {'rate': rate_hz, 'method': resample_method}
+    
     try:
         # Generate a unique filename to avoid conflicts
         original_filename = secure_filename(file.filename)
         file_extension = os.path.splitext(original_filename)[1]
         unique_filename = f"{uuid.uuid4()}{file_extension}"
         
-        # Save uploaded file with unique name
+        # Save uploaded file with unique name, hashing it as it streams in
         file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-        file.save(file_path)
+        content_hash = save_and_hash(file.stream, file_path)
+        options = {'output_format': output_format, 'extension': file_extension.lower()}
+        if resample:
+            options['resample'] = resample
+        key = cache_key(content_hash, options)
+        
+        # Answer identical re-uploads from the cache without starting a task
+        manifest = result_cache.lookup(key)
+        location_output = f"{os.path.splitext(original_filename)[0]}.location{OUTPUT_EXTENSIONS[output_format]}"
+        if manifest and result_cache.restore(key, manifest, 'location', os.path.join(UPLOAD_FOLDER, location_output)):
+            os.remove(file_path)
+            satellites_output = f"{os.path.splitext(original_filename)[0]}.satellites{OUTPUT_EXTENSIONS[output_format]}"
+            if not result_cache.restore(key, manifest, 'satellites', os.path.join(UPLOAD_FOLDER, satellites_output)):
+                satellites_output = None
+            return jsonify({
+                'status': 'success',
+                'cached': True,
+                'result_file': location_output,
+                'satellites_file': satellites_output,
+                'original_filename': original_filename,
+                'output_format': output_format
+            })
         
         # Start processing task
-        task = process_gnss_data.delay(file_path, original_filename)
+        # Re-uploads of a growing log are processed from where the earlier upload left off
+        incremental = {'head': head_key(file_path, options)} if output_format == 'jsonl' and not resample else None
+        
+        task = process_gnss_data.delay(file_path, original_filename, output_format, key, resample, incremental)
         
         return jsonify({
             'status': 'success',
             'task_id': task.id,
-            'original_filename': original_filename
+            'original_filename': original_filename,
+            'output_format': output_format
         })
         
     except Exception as e:
@@ -238,7 +467,7 @@ def download_file(filename):
             file_path,
             as_attachment=True,
             download_name=filename,
-            mimetype='application/json'
+            mimetype=DOWNLOAD_MIMETYPES.get(os.path.splitext(filename)[1].lower(), 'application/octet-stream')
         )
         response.headers["Content-Disposition"] = f"attachment; filename={filename}"
         return response
@@ -249,5 +478,45 @@ def download_file(filename):
             'message': str(e)
         }), 500
 
+@app.route('/query/<filename>')
+def query_file(filename):
+    """Stream the records of a processed file within a time window and bounding box
+
+    Query parameters: start and end (epoch ms or ISO 8601, inclusive), bbox
+    (min_lat,min_lon,max_lat,max_lon) and fields (comma separated). Matching
+    records are returned as JSONL. Only result files (converted, location and
+    satellite records in JSONL or Parquet) can be queried.
+    """
+    file_path = os.path.join(UPLOAD_FOLDER, filename)
+    if secure_filename(filename) != filename or not is_result_file(filename) or not os.path.exists(file_path):
+        return jsonify({
+            'status': 'error',
+            'message': 'File not found'
+        }), 404
+    
+    try:
+        start_ms = parse_time_ms(request.args.get('start'))
+        end_ms = parse_time_ms(request.args.get('end'))
+        bbox = parse_bbox(request.args.get('bbox'))
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Invalid query: {str(e)}'
+        }), 400
+    
+    def generate():
+        # Encode matching records in batches rather than one response chunk each
+        lines = []
+        for record in query_records(file_path, start_ms, end_ms, bbox, fields):
+            lines.append(encode_record(record))
+            if len(lines) >= 1000:
+                yield b'\n'.join(lines) + b'\n'
+                lines = []
+        if lines:
+            yield b'\n'.join(lines) + b'\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000, debug=True) 
\ No newline at end of file
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Latency of the GNSSProcessor LLM fallback against the local stub server
+
+Usage: python benchmarks/bench_llm_fallback.py [--candidates 1 2 4] [--delay 2.0] [file]
+Defaults to the first UrbanNav .nmea file in uploads/. Each run starts a fresh stub
+(benchmarks/stub_llm_server.py) and an empty code cache, and processes a copy
+of the file, so no attempt is served from an earlier one.
+"""
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub_llm_server import start_server
+
+def run(input_file, candidates, delay, folder):
+    """Process a copy of input_file through the fallback, returning (seconds, output lines, stub requests)"""
+    requests = []
+    server = start_server(0, delay, log=requests.append)
+    os.environ['LLM_BASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        work = tempfile.mkdtemp(dir=folder)
+        copy = os.path.join(work, os.path.basename(input_file))
+        shutil.copyfile(input_file, copy)
+        code_cache.folder = os.path.join(work, 'code-cache')
+
+        processor = GNSSProcessor()
+        processor.candidates = candidates
+        processor.output_callback = lambda message: None
+        start = time.perf_counter()
+        output_file = processor.process_file(copy)
+        elapsed = time.perf_counter() - start
+        with open(output_file, 'rb') as f:
+            lines = sum(1 for _ in f)
+        return elapsed, lines, len(requests)
+    finally:
+        server.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('file', nargs='?')
+    parser.add_argument('--candidates', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--delay', type=float, default=2.0, help="Seconds the stub takes per response")
+    args = parser.parse_args()
+
+    input_file = args.file or next(iter(sorted(glob.glob(os.path.join(ROOT, 'uploads', 'UrbanNav-*.nmea')))), None)
+    if not input_file:
+        print("No NMEA files found")
+        return
+
+    # Keep enough sandboxes for every candidate of a round
+    sandbox_pool.size = max(args.candidates)
+    sandbox_pool.start()
+    # Wait for every sandbox to finish preloading, so the first run is not charged for it
+    for _ in range(sandbox_pool.size):
+        sandbox_pool.run('os:getpid', [])
+    folder = tempfile.mkdtemp(prefix='bench-llm-')
+    try:
+        print(f"LLM fallback on {input_file}, stub delay {args.delay:g}s")
+        for candidates in args.candidates:
+            elapsed, lines, requests = run(input_file, candidates, args.delay, folder)
+            print(f"{candidates} candidate(s): {elapsed:.2f}s, {requests} LLM request(s), {lines} records")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == "__main__":
+    # Credentials are not checked by the stub
+    for name in ('AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_API_VERSION', 'AZURE_OPENAI_ENDPOINT', 'AZURE_OPENAI_ENGINE'):
+        os.environ.setdefault(name, 'stub')
+    from src.gnss_processor import GNSSProcessor
+    from src.code_cache import code_cache
+    from src.sandbox_pool import sandbox_pool
+    main()
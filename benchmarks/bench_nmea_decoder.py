@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of the table-driven NMEA decoder against pynmea2
+
+Usage: python benchmarks/bench_nmea_decoder.py [files...]
+Defaults to every .nmea file in uploads/.
+"""
+import glob
+import os
+import sys
+import time
+
+import pynmea2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.nmea_decoder import decode_sentence, ChecksumMismatch, FIELD_TABLES
+from src.stream_reader import iter_lines
+
+def split_timestamp(line):
+    """Split off a trailing millisecond timestamp the same way the converter does"""
+    head, sep, last = line.rpartition(',')
+    if sep and last.isdigit() and len(last) >= 13:
+        return head, int(last)
+    return line, None
+
+def pynmea2_decode(sentence, timestamp=None):
+    """Reference path: pynmea2.parse followed by a getattr per field"""
+    msg = pynmea2.parse(sentence)
+    data = {}
+    for field in msg.fields:
+        data[field[1]] = getattr(msg, field[1])
+    data['sentence_type'] = msg.sentence_type
+    if timestamp is not None:
+        data['timestamp_ms'] = timestamp
+    return data
+
+def load_sentences(paths):
+    """Collect the sentences the table-driven decoder handles"""
+    sentences = []
+    for path in paths:
+        for line in iter_lines(path):
+            line = line.strip()
+            if not line.startswith('$'):
+                continue
+            sentence, timestamp = split_timestamp(line)
+            # Proprietary sentences such as $PIGSV never take the fast path
+            if sentence[1:2] != 'P' and sentence[3:6] in FIELD_TABLES:
+                sentences.append((sentence, timestamp))
+    return sentences
+
+def run(decode, sentences):
+    """Decode every sentence, returning (seconds, decoded records)"""
+    results = []
+    start = time.perf_counter()
+    for sentence, timestamp in sentences:
+        try:
+            results.append(decode(sentence, timestamp))
+        except (pynmea2.ParseError, ChecksumMismatch):
+            results.append(None)
+    return time.perf_counter() - start, results
+
+def main():
+    paths = sys.argv[1:] or sorted(glob.glob('uploads/*.nmea'))
+    if not paths:
+        print("No NMEA files found")
+        return
+
+    sentences = load_sentences(paths)
+    print(f"Benchmarking {len(sentences)} sentences from {len(paths)} files")
+
+    ref_time, ref_results = run(pynmea2_decode, sentences)
+    fast_time, fast_results = run(decode_sentence, sentences)
+
+    # Sentences the decoder declines (None) would take the pynmea2 fallback
+    fallbacks = sum(1 for result in fast_results if result is None)
+    mismatches = sum(
+        1 for ref, fast in zip(ref_results, fast_results)
+        if fast is not None and ref != fast
+    )
+
+    print(f"pynmea2:      {ref_time:.3f}s ({len(sentences) / ref_time:,.0f} sentences/s)")
+    print(f"table-driven: {fast_time:.3f}s ({len(sentences) / fast_time:,.0f} sentences/s)")
+    print(f"Speedup:      {ref_time / fast_time:.1f}x")
+    print(f"Fallbacks:    {fallbacks}")
+    print(f"Mismatches:   {mismatches}")
+
+if __name__ == "__main__":
+    main()
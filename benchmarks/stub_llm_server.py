@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Local stub of the chat completions API for exercising the LLM fallbacks offline
+
+Usage: python benchmarks/stub_llm_server.py [--port 8765] [--delay 2.0] [--replies replies.json]
+Then point the fallbacks at it with LLM_BASE_URL=http://127.0.0.1:8765
+
+Every POST to a path ending in /chat/completions is answered after --delay
+seconds with n choices. Choices are taken in turn from the replies (a JSON
+list of assistant messages); the default replies are a broken and a working
+NMEA GGA processor, so a single candidate per round needs one repair round
+and two candidates per round succeed in the first.
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BROKEN_REPLY = '''```python
+location_records = [parse_gga(line) for line in open(input_file)]
+```'''
+
+WORKING_REPLY = '''```python
+location_records = []
+with open(input_file, encoding='latin1') as f:
+    for line in f:
+        fields = line.strip().split(',')
+        if not fields[0].endswith('GGA') or len(fields) < 10 or not fields[2] or not fields[4]:
+            continue
+        latitude = int(fields[2][:2]) + float(fields[2][2:]) / 60
+        longitude = int(fields[4][:3]) + float(fields[4][3:]) / 60
+        location_records.append({
+            'timestamp_ms': int(fields[-1]) if fields[-1].isdigit() else None,
+            'latitude': -latitude if fields[3] == 'S' else latitude,
+            'longitude': -longitude if fields[5] == 'W' else longitude,
+            'altitude': float(fields[9]) if fields[9] else None,
+        })
+location_records = [record for record in location_records if record['timestamp_ms'] is not None]
+```'''
+
+DEFAULT_REPLIES = [BROKEN_REPLY, WORKING_REPLY]
+
+def make_handler(replies, delay, log=print):
+    """Request handler answering chat completions with the replies in turn"""
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if not self.path.split('?')[0].endswith('/chat/completions'):
+                self.send_error(404)
+                return
+            n = int(body.get('n') or 1)
+            with lock:
+                picks = [replies[next(counter) % len(replies)] for _ in range(n)]
+            time.sleep(delay)
+            response = json.dumps({
+                'id': f"stub-{time.time_ns()}",
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model') or 'stub',
+                'choices': [
+                    {'index': i, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}
+                    for i, content in enumerate(picks)
+                ],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+            log(f"{self.path} n={n} messages={len(body.get('messages', []))}")
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+def start_server(port=0, delay=0.0, replies=None, log=print):
+    """Serve the stub in a background thread and return the server (server_address has the port)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(replies or DEFAULT_REPLIES, delay, log))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=2.0, help="Seconds before each response, like a model generating")
+    parser.add_argument('--replies', help="JSON file with a list of assistant replies")
+    args = parser.parse_args()
+
+    replies = DEFAULT_REPLIES
+    if args.replies:
+        with open(args.replies, 'r') as f:
+            replies = json.load(f)
+    server = start_server(args.port, args.delay, replies)
+    print(f"Stub chat completions on http://127.0.0.1:{server.server_address[1]}, set LLM_BASE_URL to it")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
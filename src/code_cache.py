@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import re
+import uuid
+from src.format_detector import detect_format, read_prefix
+
+# Where validated LLM-generated code is kept, next to the result cache
+CODE_CACHE_FOLDER = os.getenv('LLM_CODE_CACHE_FOLDER', os.path.join('cache', '.llm_code'))
+
+# Cached converters kept, least recently used ones are evicted first
+CODE_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CODE_CACHE_MAX_ENTRIES', '200'))
+
+# Bump when the fingerprint changes, so converters cached under older fingerprints are not matched
+FINGERPRINT_VERSION = 2
+
+# Lines of the prefix looked at for the fingerprint
+FINGERPRINT_LINES = 500
+
+# Share of those lines a body signature needs, so occasional sentences (e.g. $GNDTM) do not count
+FINGERPRINT_MIN_SHARE = 0.01
+
+# Separators used to count the fields of other text lines
+_FIELD_SEPARATORS = re.compile(r'[,;\t]|\s+')
+
+# NMEA sentence types (talker + formatter, or P + proprietary name)
+_SENTENCE_TYPE = re.compile(r'^[A-Z0-9]{3,8}$')
+
+# Sentences whose field count follows the data (satellites in view, residuals), only their type counts
+VARIABLE_LENGTH_SENTENCES = ('GSV', 'GRS', 'GSA')
+
+def _line_signature(line, in_header):
+    """Structural signature of one line: header label, sentence type and field count, or JSON keys
+
+    None for lines that say nothing about the structure (binary garbage).
+    """
+    if in_header and len(line) > 60 and line[60:].strip():
+        # RINEX style header: the label in columns 61-80, plus the observation types it declares
+        label = line[60:80].strip()
+        return ('label', label, tuple(line[:60].split()) if label == 'SYS / # / OBS TYPES' else None)
+    if not line.isprintable():
+        # Binary messages interleaved with text, e.g. UBX frames in a receiver log
+        return None
+    if line.startswith('$'):
+        fields = line.split('*')[0].split(',')
+        sentence_type = fields[0][1:]
+        if not _SENTENCE_TYPE.match(sentence_type):
+            return None
+        trailing_timestamp = line.rsplit(',', 1)[-1].isdigit() and '*' in line
+        if sentence_type.startswith('P'):
+            # Proprietary sentences carry a message ID whose layout varies, e.g. $PUBX,00 and $PUBX,03
+            return ('sentence', sentence_type, fields[1] if len(fields) > 1 else None, trailing_timestamp)
+        if sentence_type[2:] in VARIABLE_LENGTH_SENTENCES:
+            return ('sentence', sentence_type, None, trailing_timestamp)
+        return ('sentence', sentence_type, len(fields), trailing_timestamp)
+    if line.startswith('{'):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return ('text', '{', None)
+        if isinstance(record, dict):
+            return ('json', tuple(sorted(record)), record.get('sentence_type'))
+    tokens = [token for token in _FIELD_SEPARATORS.split(line) if token]
+    head = tokens[0] if tokens and tokens[0].isalpha() else ''
+    return ('text', head, len(tokens))
+
+def looks_binary(prefix):
+    """Whether a file prefix holds a binary protocol rather than text lines"""
+    head = prefix[:4096]
+    return sum(1 for byte in head if byte < 32 and byte not in b'\r\n\t') > len(head) // 10
+
+def input_fingerprint(input_file):
+    """Fingerprint of an input's structure, shared by files of the same dialect
+
+    Text files are described by their header labels (RINEX), the talker,
+    sentence type and field count of their sentences (NMEA), the key sets of
+    their JSON records or the field counts of other lines. Only the structure
+    counts, values and the order of lines are ignored, as are sentences
+    too rare to show up in every part of a log. RINEX observation bodies vary
+    with the satellites in view, so only the header is used.
+    """
+    file_format, _ = detect_format(input_file)
+    prefix = read_prefix(input_file)
+    text = prefix.decode('latin1')
+    if looks_binary(prefix):
+        # Binary protocols are only told apart by the detected format
+        signature = [('binary',)]
+    else:
+        signatures, counts, lines = set(), {}, 0
+        in_header = 'END OF HEADER' in text
+        for line in text.splitlines()[:FINGERPRINT_LINES]:
+            line = line.rstrip()
+            if not line:
+                continue
+            if in_header and line[60:80].strip() == 'END OF HEADER':
+                in_header = False
+                signatures.add(('label', 'END OF HEADER', None))
+                break
+            signature = _line_signature(line, in_header)
+            if signature is None:
+                continue
+            if in_header:
+                signatures.add(signature)
+            else:
+                counts[signature] = counts.get(signature, 0) + 1
+                lines += 1
+        signatures.update(key for key, count in counts.items() if count >= lines * FINGERPRINT_MIN_SHARE)
+        signature = sorted(signatures, key=repr)
+    key = json.dumps([FINGERPRINT_VERSION, file_format, signature], default=repr)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def generalize_paths(code, paths):
+    """Replace the file paths written into generated code with placeholders"""
+    # Longest first, an output path often starts with the input path
+    for name, path in sorted(paths.items(), key=lambda item: -len(item[1])):
+        code = code.replace(path, f"{{{{{name}}}}}")
+    return code
+
+def specialize_paths(code, paths):
+    """Put the paths of the current files into cached code"""
+    for name, path in paths.items():
+        code = code.replace(f"{{{{{name}}}}}", path)
+    return code
+
+class CodeCache:
+    """Validated LLM-generated code, keyed by task and input fingerprint
+
+    Each entry is a small JSON file whose mtime records the last use, entries
+    beyond max_entries are evicted least recently used first. Paths of the
+    files the code was generated for are stored as placeholders and filled in
+    with the paths of the file it is reused for.
+    """
+
+    def __init__(self, folder=CODE_CACHE_FOLDER, max_entries=CODE_CACHE_MAX_ENTRIES):
+        self.folder = folder
+        self.max_entries = max_entries
+
+    def _path(self, task, fingerprint):
+        return os.path.join(self.folder, f"{task}-{fingerprint}.json")
+
+    def get(self, task, fingerprint, paths):
+        """Cached code for a task and fingerprint with the given paths filled in, None on a miss"""
+        path = self._path(task, fingerprint)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return specialize_paths(entry['code'], paths)
+
+    def put(self, task, fingerprint, code, paths):
+        """Keep code that produced valid output for an input with this fingerprint"""
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            temp = os.path.join(self.folder, f".tmp-{uuid.uuid4().hex}")
+            with open(temp, 'w') as f:
+                json.dump({'task': task, 'fingerprint': fingerprint, 'code': generalize_paths(code, paths)}, f)
+            os.replace(temp, self._path(task, fingerprint))
+            self.evict()
+        except OSError as e:
+            print(f"Could not cache generated code: {str(e)}")
+
+    def invalidate(self, task, fingerprint):
+        """Drop cached code that failed validation"""
+        try:
+            os.remove(self._path(task, fingerprint))
+        except OSError:
+            pass
+
+    def evict(self):
+        """Remove least recently used entries beyond max_entries"""
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith('.json') or name.startswith('.'):
+                continue
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.folder, name)), name))
+            except OSError:
+                continue
+        entries.sort()
+        for _, name in entries[:max(0, len(entries) - self.max_entries)]:
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except OSError:
+                continue
+
+# Shared by the converter, the extractor and GNSSProcessor
+code_cache = CodeCache()
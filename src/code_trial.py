@@ -0,0 +1,88 @@
+import math
+import os
+import shutil
+import tempfile
+from src.code_cache import generalize_paths, looks_binary, specialize_paths
+from src.sandbox_pool import SandboxError, sandbox_pool
+
+# Bytes of the input generated code is tried on before it runs on the whole file
+TRIAL_SAMPLE_BYTES = int(os.getenv('LLM_TRIAL_SAMPLE_BYTES', str(256 * 1024)))
+
+# Slices of a line-oriented input the sample is made of, spread from its start to its end
+TRIAL_SAMPLE_SLICES = 4
+
+# Seconds generated code may run on the sample before the attempt counts as failed
+TRIAL_TIMEOUT = float(os.getenv('LLM_TRIAL_TIMEOUT', '20'))
+
+# Paths passed after the code to a trial target, in the order run_*_code takes them
+TRIAL_PATH_ARGUMENTS = ('input_file', 'output_file')
+
+def write_sample(input_file, sample_file, max_bytes=TRIAL_SAMPLE_BYTES, slices=TRIAL_SAMPLE_SLICES):
+    """Write a bounded sample of an input, False when the whole file is no larger than the sample
+
+    Line-oriented text without a header (NMEA, JSONL, CSV) is sampled in
+    whole lines from slices spread over the file, so records from late in a
+    log are tried too. Files with a header (RINEX) and binary protocols only
+    stay parseable from their start, they are sampled from the head.
+    """
+    size = os.path.getsize(input_file)
+    if size <= max_bytes:
+        return False
+    with open(input_file, 'rb') as f:
+        head = f.read(max_bytes)
+        if looks_binary(head) or b'END OF HEADER' in head:
+            with open(sample_file, 'wb') as out:
+                out.write(head)
+            return True
+
+        step = max_bytes // slices
+        with open(sample_file, 'wb') as out:
+            for i in range(slices):
+                f.seek(i * (size - step) // (slices - 1) if slices > 1 else 0)
+                block = f.read(step)
+                # Keep complete lines only
+                if i > 0:
+                    block = block[block.find(b'\n') + 1:]
+                block = block[:block.rfind(b'\n') + 1]
+                out.write(block)
+    return True
+
+def trial_run(target, code, paths, timeout=TRIAL_TIMEOUT):
+    """Try generated code on a bounded sample of its input before it runs on the whole file
+
+    target ('module:function') is called in a sandbox as target(code,
+    input_file, output_file) and returns whether its output validates.
+    paths maps placeholder names to the real files, 'input_file' being the
+    input and 'output_file' the output; the
+    paths written into the code are pointed at a sample of the input and at
+    outputs in a temporary folder. The sandbox gets timeout seconds, so code
+    that hangs or crashes on the sample fails in seconds. Returns (passed,
+    error), passed is True without a trial when the input is no larger than
+    the sample.
+    """
+    folder = tempfile.mkdtemp(prefix='llm-trial-')
+    try:
+        input_file = paths['input_file']
+        sample_paths = {
+            name: os.path.join(folder, ('sample-' if name == 'input_file' else '') + os.path.basename(path))
+            for name, path in paths.items()
+        }
+        if not write_sample(input_file, sample_paths['input_file']):
+            return True, None
+        sample_code = specialize_paths(generalize_paths(code, paths), sample_paths)
+        print(f"Trying generated code on a {os.path.getsize(sample_paths['input_file'])} byte sample of the input...")
+        try:
+            passed = bool(sandbox_pool.run(
+                target, [sample_code] + [sample_paths[name] for name in TRIAL_PATH_ARGUMENTS],
+                timeout=timeout, cpu_seconds=math.ceil(timeout), on_output=lambda line: None,
+            ))
+            error = None if passed else "Output of the sample did not validate"
+        except SandboxError as e:
+            passed, error = False, str(e)
+        if passed:
+            print("Generated code passed the trial on the sample")
+        else:
+            print(f"Generated code failed the trial on the sample: {error}")
+        return passed, error
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
@@ -0,0 +1,286 @@
+import json
+import os
+import numpy as np
+from src.stream_reader import iter_lines
+from src.json_encoder import JsonlWriter
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional, JSONL keeps working without pyarrow
+    pa = None
+    pc = None
+    pq = None
+
+# Output formats selectable per upload
+OUTPUT_FORMATS = ('jsonl', 'parquet')
+
+# File extension used for each output format
+OUTPUT_EXTENSIONS = {'jsonl': '.jsonl', 'parquet': '.parquet'}
+
+# Each Parquet row group covers this much time (by timestamp_ms)
+ROW_GROUP_MS = 60 * 1000
+
+# Upper bound on rows buffered for one row group
+MAX_ROW_GROUP_ROWS = 500000
+
+# Records collected by ColumnarWriter.write before they are converted to an Arrow table
+RECORD_BATCH_ROWS = 10000
+
+# Low-cardinality string columns stored dictionary-encoded
+DICTIONARY_COLUMNS = ('satellite_system', 'sv', 'record_type', 'sentence_type')
+
+def parquet_available():
+    """Check whether pyarrow is installed"""
+    return pa is not None
+
+def is_parquet_file(file_path):
+    """Check for the Parquet magic bytes at the start of a file"""
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(4) == b'PAR1'
+    except OSError:
+        return False
+
+def iter_parquet_records(input_file, batch_size=65536):
+    """Yield the rows of a Parquet file as dicts, one record batch at a time"""
+    parquet_file = pq.ParquetFile(input_file, memory_map=True)
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        yield from batch.to_pylist()
+
+def records_table(records):
+    """Arrow table of dict records, columns whose values mix types (e.g. altitude in GGA and GNS) become strings"""
+    try:
+        return pa.Table.from_pylist(records)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        pass
+    columns = {}
+    for name in dict.fromkeys(key for record in records for key in record):
+        values = [record.get(name) for record in records]
+        try:
+            columns[name] = pa.array(values)
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            columns[name] = pa.array([None if value is None else str(value) for value in values], pa.string())
+    return pa.table(columns)
+
+def unify_schemas(schemas):
+    """Unify table schemas, a column whose types cannot be promoted into one becomes a string column"""
+    try:
+        return pa.unify_schemas(schemas, promote_options='permissive')
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        pass
+    fields = []
+    for name in dict.fromkeys(name for schema in schemas for name in schema.names):
+        columns = [pa.schema([schema.field(name)]) for schema in schemas if name in schema.names]
+        try:
+            fields.append(pa.unify_schemas(columns, promote_options='permissive').field(name))
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+def conform_table(table, schema):
+    """Cast a table to a schema, adding the columns it lacks as nulls"""
+    columns = [
+        _encode_column(table.column(field.name), field) if field.name in table.column_names
+        else pa.nulls(len(table), field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+def _encode_column(column, field):
+    """Cast a spilled column to its type in the final Parquet schema"""
+    if pa.types.is_dictionary(field.type):
+        return column.cast(field.type.value_type).dictionary_encode()
+    return column.cast(field.type)
+
+class ColumnarWriter:
+    """Write records or DataFrame blocks to Parquet with one row group per time window
+
+    Blocks are spilled to Arrow IPC pieces while writing, because record keys can
+    change along the file. close() unifies the piece schemas and copies the
+    memory-mapped pieces into the final Parquet file.
+    """
+
+    def __init__(self, output_file, row_group_ms=ROW_GROUP_MS):
+        if pa is None:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.output_file = output_file
+        self.row_group_ms = row_group_ms
+        self.rows = 0
+        self._pending = []
+        self._pending_rows = 0
+        self._window = None
+        self._pieces = []
+        self._piece_writer = None
+        self._piece_schema = None
+        self._records = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, record):
+        """Buffer one dict record, same interface as JsonlWriter.write"""
+        self._records.append(record)
+        if len(self._records) >= RECORD_BATCH_ROWS:
+            self.write_records(self._records)
+            self._records = []
+
+    def write_records(self, records):
+        """Buffer a list of dict records"""
+        if records:
+            self.write_table(records_table(records))
+
+    def write_frame(self, df):
+        """Buffer a DataFrame block, NaN values become nulls"""
+        if len(df):
+            self.write_table(pa.Table.from_pandas(df, preserve_index=False))
+
+    def write_table(self, table):
+        """Buffer an Arrow table, starting a new row group whenever the time window changes"""
+        table = table.replace_schema_metadata(None)
+        if 'timestamp_ms' in table.column_names:
+            timestamps = table.column('timestamp_ms').to_numpy(zero_copy_only=False)
+            windows = np.nan_to_num(timestamps.astype(float), nan=-1) // self.row_group_ms
+        else:
+            windows = np.full(len(table), -1.0)
+
+        # Boundaries where consecutive rows fall into different windows
+        cuts = np.flatnonzero(np.diff(windows)) + 1
+        start = 0
+        for cut in cuts.tolist() + [len(table)]:
+            window = windows[start]
+            if self._pending and (window != self._window or self._pending_rows >= MAX_ROW_GROUP_ROWS):
+                self._flush()
+            self._window = window
+            self._pending.append(table.slice(start, cut - start))
+            self._pending_rows += cut - start
+            start = cut
+
+    def _flush(self):
+        """Spill the buffered rows as one record batch (future row group)"""
+        try:
+            table = pa.concat_tables(self._pending, promote_options='permissive')
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            # A column changed type between batches, keep it as strings
+            schema = unify_schemas([pending.schema for pending in self._pending])
+            table = pa.concat_tables([conform_table(pending, schema) for pending in self._pending])
+        table = table.combine_chunks()
+        self._pending = []
+        self._pending_rows = 0
+
+        # Start a new piece whenever the record keys or types change
+        if self._piece_writer is None or table.schema != self._piece_schema:
+            self._close_piece()
+            piece = f"{self.output_file}.part{len(self._pieces)}"
+            self._pieces.append(piece)
+            self._piece_schema = table.schema
+            self._piece_writer = pa.ipc.new_file(piece, table.schema)
+        for batch in table.to_batches(max_chunksize=len(table) or None):
+            self._piece_writer.write_batch(batch)
+        self.rows += len(table)
+
+    def _close_piece(self):
+        """Finish the IPC piece currently being written"""
+        if self._piece_writer is not None:
+            self._piece_writer.close()
+            self._piece_writer = None
+
+    def _final_schema(self, schemas):
+        """Unify piece schemas and dictionary-encode the low-cardinality string columns"""
+        schema = unify_schemas(schemas)
+        fields = []
+        for field in schema:
+            if pa.types.is_large_string(field.type):
+                # pandas string columns arrive as large_string, 32-bit offsets are plenty per row group
+                field = field.with_type(pa.string())
+            if field.name in DICTIONARY_COLUMNS and pa.types.is_string(field.type):
+                field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+            elif pa.types.is_null(field.type):
+                # Columns that were empty everywhere still need a physical type
+                field = field.with_type(pa.string())
+            fields.append(field)
+        return pa.schema(fields)
+
+    def close(self):
+        """Write the final Parquet file and remove the spilled pieces"""
+        try:
+            self.write_records(self._records)
+            self._records = []
+            if self._pending:
+                self._flush()
+            self._close_piece()
+            if not self._pieces:
+                # Like an empty JSONL file, still leave a (column-less) Parquet file behind
+                pq.write_table(pa.table({}), self.output_file)
+                return self.rows
+
+            readers = [pa.ipc.open_file(pa.memory_map(piece)) for piece in self._pieces]
+            schema = self._final_schema([reader.schema for reader in readers])
+            with pq.ParquetWriter(self.output_file, schema) as writer:
+                for reader in readers:
+                    for i in range(reader.num_record_batches):
+                        batch = reader.get_batch(i)
+                        columns = [
+                            _encode_column(batch.column(field.name), field)
+                            if field.name in batch.schema.names
+                            else pa.nulls(batch.num_rows, field.type)
+                            for field in schema
+                        ]
+                        writer.write_batch(pa.record_batch(columns, schema=schema))
+            return self.rows
+        finally:
+            self.abort()
+
+    def abort(self):
+        """Drop the spilled pieces without writing the Parquet file"""
+        self._close_piece()
+        self._pending = []
+        self._records = []
+        for piece in self._pieces:
+            if os.path.exists(piece):
+                os.remove(piece)
+        self._pieces = []
+
+def open_record_writer(output_file, output_format='jsonl', index=False, append=False):
+    """Open a record writer for the output format, both accept write(record) and work as context managers
+
+    index=True writes a timestamp sidecar index for JSONL; Parquet row groups
+    already carry timestamp_ms statistics and need none. append=True adds to
+    an existing JSONL file, Parquet files cannot be appended to.
+    """
+    if output_format == 'parquet':
+        if append:
+            raise ValueError("Parquet outputs cannot be appended to")
+        return ColumnarWriter(output_file)
+    return JsonlWriter(output_file, index=index, append=append)
+
+def jsonl_to_parquet(input_file, output_file, batch_size=10000):
+    """Convert an existing JSONL file (e.g. LLM fallback output) to Parquet"""
+    with ColumnarWriter(output_file) as writer:
+        records = []
+        for line in iter_lines(input_file):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+            if len(records) >= batch_size:
+                writer.write_records(records)
+                records = []
+        writer.write_records(records)
+    return writer.rows
+
+def parquet_to_jsonl(input_file, output_file):
+    """Write the rows of a Parquet file back out as JSONL"""
+    with JsonlWriter(output_file) as writer:
+        for record in iter_parquet_records(input_file):
+            writer.write(record)
+    return writer.records
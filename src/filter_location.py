@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import json
 from utils import custom_serializer, convert_nmea_coordinates, setup_argument_parser
+from json_encoder import JsonlWriter
 
 def filter_location_data(input_file, output_file):
     """Filter JSONL file to keep only records with location data"""
@@ -45,9 +46,9 @@ def filter_location_data(input_file, output_file):
         
         # Write filtered records to new JSONL file
         print(f"Writing filtered data to: {output_file}")
-        with open(output_file, 'w') as f:
+        with JsonlWriter(output_file) as writer:
             for record in location_records:
-                f.write(json.dumps(record, default=custom_serializer) + '\n')
+                writer.write(record)
         
         print("Filtering complete")
         if location_records:
@@ -0,0 +1,215 @@
+import json
+import os
+import re
+
+# Bytes read from the start of a file for detection
+PREFIX_BYTES = 64 * 1024
+
+# Content detections below this confidence are cross-checked with the file extension
+MIN_CONFIDENCE = 0.6
+
+# Confidence given to a format suggested only by the file extension
+EXTENSION_CONFIDENCE = 0.3
+
+# Extensions used as a hint when no sniffer recognises the content
+EXTENSION_HINTS = {
+    '.obs': 'RINEX', '.rnx': 'RINEX', '.crx': 'RINEX',
+    '.nmea': 'NMEA', '.nma': 'NMEA',
+    '.ubx': 'UBX',
+    '.rtcm': 'RTCM3', '.rtcm3': 'RTCM3',
+    '.json': 'JSONL', '.jsonl': 'JSONL',
+}
+
+# RINEX 2 short names such as .21o (observation) or .21d (Hatanaka compressed)
+_RINEX_SHORT_EXTENSION = re.compile(r'^\.\d\d[od]$', re.IGNORECASE)
+
+# NMEA 0183 sentence start: $ + talker (or P for proprietary) + sentence formatter
+_NMEA_SENTENCE = re.compile(rb'^\$(?:[A-Z]{2}[A-Z]{3}|P[A-Z0-9]{3,6}),')
+
+# Registered formats: name -> {'sniff': function(prefix) -> confidence, 'converter': function or None}
+FORMATS = {}
+
+def register_format(name, sniff, converter=None):
+    """Register a format sniffer and (optionally) its native converter"""
+    FORMATS[name] = {'sniff': sniff, 'converter': converter}
+
+def register_converter(name, converter):
+    """Attach a native converter to an already registered format"""
+    FORMATS[name]['converter'] = converter
+
+def get_converter(name):
+    """Return the native converter registered for a format, or None"""
+    entry = FORMATS.get(name)
+    return entry['converter'] if entry else None
+
+def read_prefix(input_file, size=PREFIX_BYTES):
+    """Read a bounded prefix of a file for sniffing"""
+    with open(input_file, 'rb') as f:
+        return f.read(size)
+
+def _prefix_lines(prefix):
+    """Complete lines of the prefix, the last one may be cut off by the size limit"""
+    lines = prefix.splitlines()
+    if lines and not prefix.endswith((b'\n', b'\r')) and len(lines) > 1:
+        lines = lines[:-1]
+    return [line.strip() for line in lines if line.strip()]
+
+def sniff_rinex(prefix):
+    """Look for RINEX header labels in columns 61-80"""
+    first = prefix[:200].split(b'\n', 1)[0]
+    label = first[60:80].strip()
+    if label == b'RINEX VERSION / TYPE':
+        # Only observation files (type O) have a native converter
+        return 1.0 if first[20:21] == b'O' else 0.5
+    if label == b'CRINEX VERS   / TYPE':
+        # Hatanaka-compressed, read_rinex3_header declines it so the converters fall back to georinex
+        return 0.8
+    if b'END OF HEADER' in prefix and b'RINEX VERSION / TYPE' in prefix:
+        return 0.7
+    return 0.0
+
+def sniff_nmea(prefix):
+    """Fraction of lines that look like NMEA sentences, weighted by valid checksums"""
+    lines = _prefix_lines(prefix)
+    if not lines:
+        return 0.0
+    score = 0.0
+    for line in lines:
+        if not _NMEA_SENTENCE.match(line):
+            continue
+        star = line.rfind(b'*')
+        checksum = line[star + 1:star + 3] if star != -1 else b''
+        try:
+            expected = int(checksum, 16)
+        except ValueError:
+            score += 0.5
+            continue
+        actual = 0
+        for byte in line[1:star]:
+            actual ^= byte
+        score += 1.0 if actual == expected else 0.5
+    return score / len(lines)
+
+def _ubx_frame_length(prefix, start):
+    """Length of a valid UBX frame at start, or 0"""
+    if prefix[start:start + 2] != b'\xb5\x62' or len(prefix) < start + 8:
+        return 0
+    length = prefix[start + 4] | (prefix[start + 5] << 8)
+    end = start + 6 + length + 2
+    if end > len(prefix):
+        return 0
+    # 8-bit Fletcher checksum over class, id, length and payload
+    ck_a = ck_b = 0
+    for byte in prefix[start + 2:start + 6 + length]:
+        ck_a = (ck_a + byte) & 0xFF
+        ck_b = (ck_b + ck_a) & 0xFF
+    if prefix[end - 2] != ck_a or prefix[end - 1] != ck_b:
+        return 0
+    return end - start
+
+def sniff_ubx(prefix):
+    """Check for consecutive u-blox UBX frames starting at the first 0xB5 0x62 sync"""
+    return _sniff_frames(prefix, b'\xb5\x62', _ubx_frame_length)
+
+def _crc24q(data):
+    """CRC-24Q used by RTCM 3 transport frames"""
+    crc = 0
+    for byte in data:
+        crc ^= byte << 16
+        for _ in range(8):
+            crc <<= 1
+            if crc & 0x1000000:
+                crc ^= 0x1864CFB
+    return crc & 0xFFFFFF
+
+def _rtcm3_frame_length(prefix, start):
+    """Length of a valid RTCM 3 frame at start, or 0"""
+    if len(prefix) < start + 6 or prefix[start] != 0xD3 or prefix[start + 1] & 0xFC:
+        return 0
+    length = ((prefix[start + 1] & 0x03) << 8) | prefix[start + 2]
+    end = start + 3 + length + 3
+    if end > len(prefix):
+        return 0
+    if _crc24q(prefix[start:end - 3]) != int.from_bytes(prefix[end - 3:end], 'big'):
+        return 0
+    return end - start
+
+def sniff_rtcm3(prefix):
+    """Check for consecutive RTCM 3 frames starting at the first 0xD3 preamble"""
+    return _sniff_frames(prefix, b'\xd3', _rtcm3_frame_length)
+
+def _sniff_frames(prefix, sync, frame_length, max_frames=4):
+    """Confidence from how many back-to-back valid frames follow the first sync marker"""
+    start = prefix.find(sync)
+    # Try a few sync candidates, payload bytes can look like a sync marker
+    for _ in range(16):
+        if start == -1:
+            return 0.0
+        frames = 0
+        position = start
+        while frames < max_frames:
+            length = frame_length(prefix, position)
+            if not length:
+                break
+            frames += 1
+            position += length
+        if frames:
+            return min(1.0, 0.4 + 0.2 * frames)
+        start = prefix.find(sync, start + 1)
+    return 0.0
+
+def sniff_jsonl(prefix):
+    """Fraction of lines that are JSON objects"""
+    lines = _prefix_lines(prefix)
+    if not lines or not lines[0].startswith(b'{'):
+        return 0.0
+    objects = 0
+    for line in lines:
+        try:
+            if isinstance(json.loads(line), dict):
+                objects += 1
+        except ValueError:
+            continue
+    return objects / len(lines)
+
+register_format('RINEX', sniff_rinex)
+register_format('NMEA', sniff_nmea)
+register_format('UBX', sniff_ubx)
+register_format('RTCM3', sniff_rtcm3)
+register_format('JSONL', sniff_jsonl)
+
+def extension_hint(input_file):
+    """Format suggested by the file extension, or None"""
+    ext = os.path.splitext(input_file)[1].lower()
+    if _RINEX_SHORT_EXTENSION.match(ext):
+        return 'RINEX'
+    return EXTENSION_HINTS.get(ext)
+
+def detect_format(input_file, prefix_bytes=PREFIX_BYTES):
+    """Detect the format of a file from a bounded prefix
+
+    Returns (format name, confidence between 0 and 1). The name is None when
+    neither the content nor the extension suggests a registered format.
+    """
+    try:
+        prefix = read_prefix(input_file, prefix_bytes)
+    except OSError as e:
+        print(f"Error reading file for format detection: {str(e)}")
+        return None, 0.0
+
+    best, confidence = None, 0.0
+    for name, entry in FORMATS.items():
+        try:
+            score = entry['sniff'](prefix)
+        except Exception as e:
+            print(f"Error sniffing {name}: {str(e)}")
+            continue
+        if score > confidence:
+            best, confidence = name, score
+
+    # Fall back to the extension only when the content is inconclusive
+    if confidence < MIN_CONFIDENCE:
+        hint = extension_hint(input_file)
+        if hint is not None and (best is None or hint == best or confidence < EXTENSION_CONFIDENCE):
+            best, confidence = hint, max(confidence, EXTENSION_CONFIDENCE)
+    return best, confidence
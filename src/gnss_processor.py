@@ -10,11 +10,83 @@ import os
 from dotenv import load_dotenv
 import re
 import numpy as np
-from openai import AzureOpenAI
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from src.stream_reader import iter_lines
+from src.rinex_reader import iter_rinex_frames
+from src.json_encoder import JsonlWriter
+from src.timestamp_index import index_path, remove_index
+from src.record_validator import validate_batch
+from src.code_cache import code_cache, input_fingerprint
+from src.code_trial import trial_run
+from src.sandbox_pool import SandboxError, sandbox_pool
+from src.llm_client import create_client
 
 # Load environment variables
 load_dotenv()
 
+# Candidates requested per round of the LLM repair loop, evaluated concurrently (raise SANDBOX_POOL_SIZE to match)
+LLM_CANDIDATES = int(os.getenv('LLM_CANDIDATES', '1'))
+
+# Band 1 measurement of each record field, RINEX 2 name first, then RINEX 3 codes by tracking attribute
+RINEX_BAND1_FIELDS = {
+    'pseudorange': 'C1',
+    'carrier_phase': 'L1',
+    'doppler': 'D1',
+    'signal_strength': 'S1',
+}
+
+def band1_column(df, prefix):
+    """First available value per row among the band 1 columns of a measurement type
+
+    A column named exactly prefix (RINEX 2) comes first, then the RINEX 3
+    codes such as C1C or C1X in file order, so each constellation falls back
+    to the signal it actually tracks.
+    """
+    names = [prefix] if prefix in df.columns else []
+    names += [c for c in df.columns if isinstance(c, str) and len(c) == 3 and c.startswith(prefix)]
+    values = np.full(len(df), np.nan)
+    for name in names:
+        column = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float)
+        values = np.where(np.isnan(values), column, values)
+    return values
+
+def blank_to_none(strings):
+    """Object array of a string Series with empty strings as None
+
+    Done in numpy, Series.replace('', None) fills from the previous row on
+    pandas < 2.1 and gives NaN on pandas 3.
+    """
+    values = strings.to_numpy(dtype=object)
+    values[values == ''] = None
+    return values
+
+def rinex_frame_records(df):
+    """Convert a block of RINEX observation rows to records, dropping rows without any non-zero measurement"""
+    if not len(df):
+        return []
+    measurements = {field: band1_column(df, prefix) for field, prefix in RINEX_BAND1_FIELDS.items()}
+    keep = np.logical_or.reduce([~np.isnan(v) & (v != 0) for v in measurements.values()])
+    if not keep.any():
+        return []
+    
+    # 'G01' or 'G 1': system letter, then the number without padding blanks
+    sv = df['sv'].astype(str).str.strip() if 'sv' in df.columns else pd.Series('', index=df.index)
+    systems = blank_to_none(sv.str[:1])
+    numbers = blank_to_none(sv.str[1:].str.strip())
+    times = df['time'].tolist() if 'time' in df.columns else [None] * len(df)
+    
+    records = pd.DataFrame({
+        'timestamp': np.array(times, dtype=object)[keep],
+        'satellite_system': systems[keep],
+        'satellite_number': numbers[keep],
+        **{
+            field: np.where(np.isnan(values[keep]), None, values[keep])
+            for field, values in measurements.items()
+        },
+    }, dtype=object)  # Keep None, pandas 3 would infer string columns with NaN
+    return records.to_dict('records')
+
 class GNSSProcessor:
     def __init__(self):
         self.system_prompt = """You are an expert GNSS data processing AI agent specializing in Python scripting. Your task is to generate a robust Python script that processes GNSS data to extract standardized location records. The generated Python code must:
@@ -24,6 +96,7 @@ class GNSSProcessor:
 4. Include error handling that captures execution errors and assigns them to a variable named 'execution_errors'.
 Return only the Python code following these guidelines."""
         self.output_callback = print  # Default to print function
+        self.candidates = max(1, LLM_CANDIDATES)
 
     def log(self, message):
         """Helper method to handle output messages"""
@@ -61,39 +134,10 @@ Return only the Python code following these guidelines."""
     def process_rinex(self, input_file):
         """Process RINEX observation file"""
         try:
-            # Read RINEX data
-            obs_data = gr.load(input_file)
-            df = obs_data.to_dataframe().reset_index()
-            
-            # Filter for location-related data
+            # Read RINEX data in bounded blocks of epochs, one batch of records per block
             location_records = []
-            for _, row in df.iterrows():
-                try:
-                    # Extract satellite system and number safely
-                    sv = row.get('sv', '')
-                    if isinstance(sv, str) and ' ' in sv:
-                        sat_sys, sat_num = sv.split()
-                    else:
-                        sat_sys = sv[:1] if isinstance(sv, str) and sv else None
-                        sat_num = sv[1:] if isinstance(sv, str) and len(sv) > 1 else None
-
-                    # Create record with safe value extraction
-                    record = {
-                        'timestamp': row.get('time'),
-                        'satellite_system': sat_sys,
-                        'satellite_number': sat_num,
-                        'pseudorange': float(row.get('C1', 0)) if pd.notna(row.get('C1')) else None,
-                        'carrier_phase': float(row.get('L1', 0)) if pd.notna(row.get('L1')) else None,
-                        'doppler': float(row.get('D1', 0)) if pd.notna(row.get('D1')) else None,
-                        'signal_strength': float(row.get('S1', 0)) if pd.notna(row.get('S1')) else None
-                    }
-                    
-                    # Only add records with valid data
-                    if any(v is not None and v != 0 for v in [record['pseudorange'], record['carrier_phase'], record['doppler'], record['signal_strength']]):
-                        location_records.append(record)
-                except (ValueError, TypeError, IndexError) as e:
-                    print(f"Warning: Error processing RINEX record: {str(e)}")
-                    continue
+            for batch in self.iter_rinex_batches(input_file):
+                location_records.extend(batch)
             
             if not location_records:
                 raise ValueError("No valid location records found in RINEX file")
@@ -103,36 +147,42 @@ Return only the Python code following these guidelines."""
         except Exception as e:
             raise Exception(f"Error processing RINEX file: {str(e)}")
 
+    def iter_rinex_batches(self, input_file):
+        """Yield the RINEX records of each observation block as a list, built with whole-column operations"""
+        for df in iter_rinex_frames(input_file):
+            batch = rinex_frame_records(df)
+            if batch:
+                yield batch
+
     def process_nmea(self, input_file):
         """Process NMEA file"""
         try:
             location_records = []
             
-            with open(input_file, 'r') as f:
-                for line in f:
-                    try:
-                        # Split the line to separate NMEA message and timestamp
-                        parts = line.strip().split(',')
-                        if len(parts) < 2:  # Skip invalid lines
-                            continue
-                            
-                        nmea_msg = ','.join(parts[:-1])
-                        timestamp = int(parts[-1]) if parts[-1].isdigit() else None
-                        
-                        msg = pynmea2.parse(nmea_msg)
-                        
-                        # Extract location data from GGA, RMC, or GNS messages
-                        if msg.sentence_type in ['GGA', 'RMC', 'GNS']:
-                            record = self.extract_location_data(msg, timestamp)
-                            if record:
-                                location_records.append(record)
-                                    
-                    except (pynmea2.ParseError, ValueError, AttributeError) as e:
-                        print(f"Warning: Error parsing NMEA message: {str(e)}")
-                        continue
-                    except Exception as e:
-                        print(f"Warning: Unexpected error processing NMEA line: {str(e)}")
+            for line in iter_lines(input_file):
+                try:
+                    # Split the line to separate NMEA message and timestamp
+                    parts = line.strip().split(',')
+                    if len(parts) < 2:  # Skip invalid lines
                         continue
+                        
+                    nmea_msg = ','.join(parts[:-1])
+                    timestamp = int(parts[-1]) if parts[-1].isdigit() else None
+                    
+                    msg = pynmea2.parse(nmea_msg)
+                    
+                    # Extract location data from GGA, RMC, or GNS messages
+                    if msg.sentence_type in ['GGA', 'RMC', 'GNS']:
+                        record = self.extract_location_data(msg, timestamp)
+                        if record:
+                            location_records.append(record)
+                                
+                except (pynmea2.ParseError, ValueError, AttributeError) as e:
+                    print(f"Warning: Error parsing NMEA message: {str(e)}")
+                    continue
+                except Exception as e:
+                    print(f"Warning: Unexpected error processing NMEA line: {str(e)}")
+                    continue
             
             if not location_records:
                 raise ValueError("No valid location records found in NMEA file")
@@ -200,6 +250,24 @@ Return only the Python code following these guidelines."""
             with open(input_file, 'r') as f:
                 sample_content = f.read(2000)  # Read first 2KB for analysis
 
+            # Files with the structure of an earlier success reuse its validated code
+            fingerprint = input_fingerprint(input_file)
+            output_file = str(Path(input_file).with_suffix('.location.jsonl'))
+            paths = {'input_file': input_file, 'output_file': output_file}
+            cached_code = code_cache.get('process', fingerprint, paths)
+            if cached_code is not None:
+                self.log("Reusing cached processing code for this input structure...")
+                try:
+                    count = sandbox_pool.run(
+                        'src.gnss_processor:run_processing_code', [cached_code, input_file, output_file], on_output=self.log,
+                    )
+                    self.log(f"Successfully processed {count} records")
+                    return output_file
+                except SandboxError as e:
+                    self.log(f"Cached processing code failed: {str(e)}")
+                self.log("Cached processing code failed validation, discarding it")
+                code_cache.invalidate('process', fingerprint)
+
             self.log("Analyzing file format...")
             # Initialize conversation history
             messages = [
@@ -212,136 +280,35 @@ Return only the Python code following these guidelines."""
                 self.log(f"\nProcessing attempt {attempt + 1} of {max_attempts}")
                 try:
                     # Get AI response
-                    self.log("Generating processing code...")
-                    client = AzureOpenAI(
-                        api_key=os.getenv('AZURE_OPENAI_API_KEY'),
-                        api_version=os.getenv('AZURE_OPENAI_API_VERSION'),
-                        base_url=f"{os.getenv('AZURE_OPENAI_ENDPOINT')}/deployments/{os.getenv('AZURE_OPENAI_ENGINE')}"
-                    )
+                    self.log(f"Generating processing code ({self.candidates} candidate(s))...")
+                    client = create_client()
                     
                     response = client.chat.completions.create(
                         model=os.getenv('AZURE_OPENAI_ENGINE'),
                         messages=messages,
                         temperature=0.7,
-                        max_tokens=10000
+                        max_tokens=10000,
+                        n=self.candidates
                     )
                     
-                    ai_response = response.choices[0].message.content
-                    
-                    # Extract python code block(s) from the LLM response
-                    code_blocks = re.findall(r'```python\s*(.*?)\s*```', ai_response, re.DOTALL)
-                    if not code_blocks:
-                        self.log("No Python code block found in response, requesting clarification...")
-                        messages.append({"role": "assistant", "content": ai_response})
-                        messages.append({"role": "user", "content": "Please provide the code within a Python code block using ```python and ``` markers."})
-                        continue
-                    processing_code = code_blocks[0]
-                    self.log("\nGenerated code:")
-                    self.log("```python")
-                    self.log(processing_code)
-                    self.log("```")
-                    
-                    # Create a safe execution environment with output capture
-                    local_env = {
-                        'input_file': input_file,
-                        'pd': pd,
-                        'np': np,
-                        'datetime': datetime,
-                        'json': json,
-                        'pynmea2': pynmea2,
-                        'gr': gr,
-                        'Path': Path,
-                        'print': lambda *args: execution_output.append(' '.join(str(arg) for arg in args))
-                    }
-                    
-                    execution_output = []
-                    debug_info = {
-                        'attempt': attempt + 1,
-                        'output': [],
-                        'error': None,
-                        'records_generated': False,
-                        'records_valid': False
-                    }
-                    
-                    try:
-                        # Execute the processing code
-                        self.log("\nExecuting generated code...")
-                        try:
-                            compiled_code = compile(processing_code, '<string>', 'exec')
-                        except SyntaxError as se:
-                            error_msg = f"Syntax error in generated code: {se}"
-                            self.log(error_msg)
-                            debug_info['error'] = error_msg
-                            messages.append({"role": "assistant", "content": ai_response})
-                            messages.append({
-                                "role": "user", 
-                                "content": f"Attempt {attempt + 1} generated code with syntax error: {se}. Please fix the code to avoid leading zeros in numeric literals and any syntax errors."
-                            })
-                            continue
-                        exec(compiled_code, globals(), local_env)
-                        debug_info['output'] = execution_output
-                        
-                        # Check if location_records were generated
-                        if 'location_records' not in local_env:
-                            self.log("No location_records variable was created")
-                            debug_info['error'] = "No location_records variable was created"
-                            messages.append({"role": "assistant", "content": ai_response})
-                            messages.append({
-                                "role": "user", 
-                                "content": f"Attempt {attempt + 1} failed:\n" + 
-                                         f"Output: {' | '.join(execution_output)}\n" +
-                                         f"Error: {debug_info['error']}\n" +
-                                         "The code executed but didn't generate location_records. Please modify the code to create a list of location_records with the required fields."
-                            })
-                            continue
-                        
-                        debug_info['records_generated'] = True
-                        location_records = local_env['location_records']
-                        
-                        # Validate records
-                        self.log("Validating generated records...")
-                        if not self._validate_records(location_records):
-                            self.log("Generated records don't match required format")
-                            debug_info['error'] = "Generated records don't match required format"
-                            messages.append({"role": "assistant", "content": ai_response})
-                            messages.append({
-                                "role": "user",
-                                "content": f"Attempt {attempt + 1} failed:\n" +
-                                         f"Output: {' | '.join(execution_output)}\n" +
-                                         f"Error: {debug_info['error']}\n" +
-                                         "Sample of invalid records:\n" +
-                                         str(location_records[:2]) + "\n" +
-                                         "Please fix the code to ensure all required fields (timestamp_ms, latitude, longitude) are present and properly formatted."
-                            })
-                            continue
-                        
-                        debug_info['records_valid'] = True
-                        
-                        # Save to JSONL
-                        self.log("Records validated successfully, saving to file...")
-                        output_file = str(Path(input_file).with_suffix('.location.jsonl'))
-                        with open(output_file, 'w') as f:
-                            for record in location_records:
-                                f.write(json.dumps(record, default=self.custom_serializer) + '\n')
-                        
-                        self.log(f"Successfully processed {len(location_records)} records")
+                    responses = [choice.message.content or '' for choice in response.choices]
+                    if not responses:
+                        raise Exception("No candidates in the response")
+                    processing_code, count, feedback = self._evaluate_candidates(
+                        responses, attempt, input_file, output_file, paths,
+                    )
+                    if processing_code is not None:
+                        self.log(f"Successfully processed {count} records")
+                        code_cache.put('process', fingerprint, processing_code, paths)
                         return output_file
-                        
-                    except Exception as e:
-                        error_msg = str(e)
-                        self.log(f"Error during execution: {error_msg}")
-                        debug_info['error'] = error_msg
-                        messages.append({"role": "assistant", "content": ai_response})
-                        messages.append({
-                            "role": "user",
-                            "content": f"Attempt {attempt + 1} failed:\n" +
-                                     f"Output: {' | '.join(execution_output)}\n" +
-                                     f"Error: {error_msg}\n" +
-                                     "Code execution failed. Please fix the error and try again."
-                        })
-                        
-                        if attempt == max_attempts - 1:
-                            raise Exception(f"Failed to process file after {max_attempts} attempts: {error_msg}")
+                    
+                    # Failures of all candidates go into one repair prompt, which quotes
+                    # each candidate's code when there was more than one
+                    if len(responses) == 1:
+                        messages.append({"role": "assistant", "content": responses[0]})
+                    messages.append({"role": "user", "content": feedback})
+                    if attempt == max_attempts - 1:
+                        raise Exception(f"Failed to process file after {max_attempts} attempts: {feedback}")
                     
                 except Exception as e:
                     self.log(f"Error during attempt {attempt + 1}: {str(e)}")
@@ -354,28 +321,159 @@ Return only the Python code following these guidelines."""
             self.log(f"Fatal error: {str(e)}")
             raise Exception(f"Error processing file {input_file}: {str(e)}")
 
+    def _evaluate_candidates(self, responses, attempt, input_file, output_file, paths):
+        """Evaluate the candidates of one attempt concurrently, each in its own sandbox
+
+        The first candidate whose records validate is kept and the others are
+        cancelled. Returns (code, record count, None) for it, or (None, None,
+        feedback) with the code and failure of each candidate for the repair prompt.
+        """
+        if len(responses) == 1:
+            result = self._evaluate_candidate(responses[0], attempt, input_file, output_file, paths)
+            return result if result[0] is not None else (None, None, result[2])
+
+        cancel = threading.Event()
+        candidate_files = [f"{output_file}.candidate{i}" for i in range(len(responses))]
+        winner, failures = None, {}
+        try:
+            with ThreadPoolExecutor(max_workers=len(responses)) as pool:
+                futures = {
+                    pool.submit(self._evaluate_candidate, content, attempt, input_file, candidate_files[i], paths, cancel): i
+                    for i, content in enumerate(responses)
+                }
+                for future in as_completed(futures):
+                    i = futures[future]
+                    processing_code, count, feedback = future.result()
+                    if processing_code is not None and winner is None:
+                        self.log(f"Candidate {i + 1} of {len(responses)} succeeded")
+                        winner = (i, processing_code, count)
+                        cancel.set()
+                    elif processing_code is None and not cancel.is_set():
+                        failures[i] = feedback
+            if winner is not None:
+                os.replace(candidate_files[winner[0]], output_file)
+                if os.path.exists(index_path(candidate_files[winner[0]])):
+                    os.replace(index_path(candidate_files[winner[0]]), index_path(output_file))
+                return winner[1], winner[2], None
+        finally:
+            for candidate_file in candidate_files:
+                if os.path.exists(candidate_file):
+                    os.remove(candidate_file)
+                remove_index(candidate_file)
+
+        sections = []
+        for i in sorted(failures):
+            code = extract_code(responses[i])
+            quoted = f"```python\n{code}\n```\n" if code is not None else ""
+            sections.append(f"Candidate {i + 1}:\n{quoted}{failures[i]}")
+        feedback = f"None of the {len(responses)} candidates of attempt {attempt + 1} worked.\n\n" + "\n\n".join(sections)
+        return None, None, feedback
+
+    def _evaluate_candidate(self, ai_response, attempt, input_file, output_file, paths, cancel=None):
+        """Check, try and run one generated candidate, returning (code, record count, None) or (None, None, feedback)"""
+        processing_code = extract_code(ai_response)
+        if processing_code is None:
+            self.log("No Python code block found in response, requesting clarification...")
+            return None, None, "Please provide the code within a Python code block using ```python and ``` markers."
+        self.log("\nGenerated code:")
+        self.log("```python")
+        self.log(processing_code)
+        self.log("```")
+        
+        # Output printed by the code in its sandbox is collected for the repair prompt
+        execution_output = []
+        try:
+            self.log("\nExecuting generated code...")
+            try:
+                compile(processing_code, '<string>', 'exec')
+            except SyntaxError as se:
+                self.log(f"Syntax error in generated code: {se}")
+                return None, None, (
+                    f"Attempt {attempt + 1} generated code with syntax error: {se}. "
+                    "Please fix the code to avoid leading zeros in numeric literals and any syntax errors."
+                )
+            
+            # A failing candidate is found on a sample of the input, not after a full pass
+            passed, trial_error = trial_run('src.gnss_processor:run_processing_code', processing_code, paths)
+            if not passed:
+                self.log(f"Generated code failed on a sample of the input: {trial_error}")
+                return None, None, (
+                    f"Attempt {attempt + 1} failed on a sample of the input file:\n" +
+                    f"Error: {trial_error}\n" +
+                    "Please fix the code so it creates a list of location_records with the required fields (timestamp_ms, latitude, longitude)."
+                )
+            
+            # Run, validate and save in a sandbox process, so runaway code cannot take down the worker
+            count = sandbox_pool.run(
+                'src.gnss_processor:run_processing_code', [processing_code, input_file, output_file],
+                on_output=execution_output.append, cancel=cancel,
+            )
+            return processing_code, count, None
+            
+        except Exception as e:
+            error_msg = str(e)
+            self.log(f"Error during execution: {error_msg}")
+            return None, None, (
+                f"Attempt {attempt + 1} failed:\n" +
+                f"Output: {' | '.join(execution_output)}\n" +
+                f"Error: {error_msg}\n" +
+                "Code execution failed. Please fix the error and try again."
+            )
+
     def _validate_records(self, records):
         """Validate that records contain required fields in correct format"""
         if not records or not isinstance(records, list):
             return False
             
-        required_fields = {'timestamp_ms', 'latitude', 'longitude'}
-        numeric_fields = {'latitude', 'longitude', 'altitude', 'hdop', 'speed'}
-        
-        for record in records:
-            if not isinstance(record, dict):
-                return False
-                
-            # Check required fields exist
-            if not all(field in record for field in required_fields):
-                return False
-                
-            # Validate numeric fields
-            for field in numeric_fields:
-                if field in record and record[field] is not None:
-                    try:
-                        float(record[field])
-                    except (ValueError, TypeError):
-                        return False
-        
-        return True 
\ No newline at end of file
+        accept, reasons = validate_batch(
+            records,
+            required=('timestamp_ms', 'latitude', 'longitude'),
+            numeric=('latitude', 'longitude', 'altitude', 'hdop', 'speed'),
+        )
+        if reasons:
+            self.log(f"Rejected records: {reasons}")
+        return bool(accept.all())
+
+def extract_code(ai_response):
+    """First Python code block of an LLM response, None if it has none"""
+    code_blocks = re.findall(r'```python\s*(.*?)\s*```', ai_response, re.DOTALL)
+    return code_blocks[0] if code_blocks else None
+
+def processing_env(input_file):
+    """Execution environment of generated processing code"""
+    return {
+        'input_file': input_file,
+        'pd': pd,
+        'np': np,
+        'datetime': datetime,
+        'json': json,
+        'pynmea2': pynmea2,
+        'gr': gr,
+        'Path': Path,
+    }
+
+def run_processing_code(processing_code, input_file, output_file):
+    """Execute generated processing code and write its location_records to output_file
+
+    Runs inside a sandbox process (see SandboxPool). Returns the number of
+    records written, raises ValueError when the code creates no valid
+    location_records.
+    """
+    local_env = processing_env(input_file)
+    exec(compile(processing_code, '<string>', 'exec'), globals(), local_env)
+    if 'location_records' not in local_env:
+        raise ValueError(
+            "No location_records variable was created. "
+            "Please modify the code to create a list of location_records with the required fields."
+        )
+    location_records = local_env['location_records']
+    if not GNSSProcessor()._validate_records(location_records):
+        sample = location_records[:2] if isinstance(location_records, list) else location_records
+        raise ValueError(
+            f"Generated records don't match required format. Sample of invalid records: {str(sample)[:1000]}. "
+            "Please ensure all required fields (timestamp_ms, latitude, longitude) are present and properly formatted."
+        )
+    with JsonlWriter(output_file, index=True) as writer:
+        for record in location_records:
+            writer.write(record)
+    return len(location_records)
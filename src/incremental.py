@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import numpy as np
+from src.stream_reader import CHUNK_SIZE
+from src.nmea_decoder import split_log_timestamp
+from src.rinex_reader import parse_epoch_time, read_rinex3_header
+from src.location_extractor import EPOCH_REORDER_WINDOW
+from src.timestamp_index import ensure_index, truncate_records
+from src.pipeline import run_fused_pipeline
+from src.satellite_tables import write_satellite_tables
+
+# Bytes at the start of a file that identify its earlier, shorter uploads
+HEAD_BYTES = 64 * 1024
+
+# Bytes read per step when scanning a file backwards for the resume point
+BACKWARD_CHUNK = 256 * 1024
+
+# Bump when the resume state layout or the resume rules change
+RESUME_VERSION = 1
+
+def nmea_line_time(line):
+    """Logger receive time of an NMEA log line, None when it has none"""
+    return split_log_timestamp(line.decode('latin1').strip())[1]
+
+def rinex_line_time(line):
+    """Epoch time in ms of a RINEX 3 epoch record line, None for other lines"""
+    if not line.startswith(b'>'):
+        return None
+    try:
+        epoch = parse_epoch_time(line.decode('latin1'))
+    except ValueError:
+        return None
+    return int(np.datetime64(epoch, 'ms').astype(np.int64))
+
+# Time of a line for each format that can be resumed
+LINE_TIMES = {
+    'NMEA': nmea_line_time,
+    'RINEX': rinex_line_time,
+}
+
+def iter_lines_backwards(input_file, chunk_size=BACKWARD_CHUNK):
+    """Yield (offset, raw line) pairs from the end of a file to its start"""
+    with open(input_file, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        tail = b''
+        while position > 0:
+            step = min(chunk_size, position)
+            position -= step
+            f.seek(position)
+            pieces = (f.read(step) + tail).split(b'\n')
+            offsets = []
+            offset = position
+            for piece in pieces:
+                offsets.append(offset)
+                offset += len(piece) + 1
+            # The first piece may be the end of a line that started in the chunk before
+            first = 1 if position > 0 else 0
+            tail = pieces[0] if first else b''
+            for i in range(len(pieces) - 1, first - 1, -1):
+                yield offsets[i], pieces[i]
+
+def find_resume_point(input_file, file_format, resume_ms=None):
+    """Offset and time of the first line at or after resume_ms (the last timed line when None)
+
+    Returns (offset, time ms), or (None, None) when no line has a time.
+    """
+    line_time = LINE_TIMES[file_format]
+    found = (None, None)
+    for offset, line in iter_lines_backwards(input_file):
+        if not line.strip():
+            continue
+        timestamp = line_time(line)
+        if timestamp is None:
+            continue
+        if resume_ms is None:
+            return offset, timestamp
+        if timestamp < resume_ms:
+            break
+        found = (offset, timestamp)
+    return found
+
+def digest_prefix(input_file, size):
+    """SHA-256 hex digest of the first size bytes of a file"""
+    digest = hashlib.sha256()
+    with open(input_file, 'rb') as f:
+        remaining = size
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+def head_key(input_file, options=None):
+    """Key shared by all uploads of one growing log, from its first HEAD_BYTES and the processing options"""
+    with open(input_file, 'rb') as f:
+        head = f.read(HEAD_BYTES)
+    key = json.dumps({'head': hashlib.sha256(head).hexdigest(), 'options': options or {}}, sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def resume_state(input_file, file_format, location_file):
+    """Where a later upload of the same, grown file can pick up processing, None if it cannot
+
+    Records from resume_ms on are dropped and rebuilt from resume_offset,
+    because the last epochs may be incomplete at the end of the file. For
+    NMEA these are the epochs still open in the epoch assembler at the end
+    (EPOCH_REORDER_WINDOW), for RINEX only the last epoch. Only the bytes
+    before resume_offset have to match, so a line cut off by the logger does
+    not prevent resuming.
+    """
+    if file_format not in LINE_TIMES:
+        return None
+    if file_format == 'RINEX' and read_rinex3_header(input_file) is None:
+        return None
+
+    if file_format == 'NMEA':
+        resume_ms = _nth_last_timestamp(location_file, EPOCH_REORDER_WINDOW + 1)
+        if resume_ms is None:
+            return None
+        resume_offset, resume_ms = find_resume_point(input_file, file_format, resume_ms)
+    else:
+        resume_offset, resume_ms = find_resume_point(input_file, file_format)
+    if not resume_offset:
+        return None
+    return {
+        'version': RESUME_VERSION,
+        'format': file_format,
+        'resume_offset': resume_offset,
+        'resume_ms': resume_ms,
+        'prefix_hash': digest_prefix(input_file, resume_offset),
+    }
+
+def _nth_last_timestamp(output_file, n):
+    """timestamp_ms of the n-th last record of an indexed JSONL output, None if it has fewer records"""
+    index = ensure_index(output_file)
+    timestamps = []
+    checkpoints = index['checkpoints']
+    # Read whole blocks from the end until n records are collected
+    for i in range(len(checkpoints) - 1, -1, -1):
+        end = checkpoints[i + 1][0] if i + 1 < len(checkpoints) else index['size']
+        with open(output_file, 'rb') as f:
+            f.seek(checkpoints[i][0])
+            block = f.read(end - checkpoints[i][0])
+        found = [json.loads(line).get('timestamp_ms') for line in block.splitlines() if line.strip()]
+        timestamps = [t for t in found if t is not None] + timestamps
+        if len(timestamps) >= n:
+            return timestamps[-n]
+    return None
+
+def matches_prefix(input_file, state):
+    """Whether a file starts with the bytes an earlier upload was processed up to, and grew beyond them"""
+    if not state or state.get('version') != RESUME_VERSION:
+        return False
+    if os.path.getsize(input_file) <= state['resume_offset']:
+        return False
+    return digest_prefix(input_file, state['resume_offset']) == state['prefix_hash']
+
+def truncate_outputs(state, files):
+    """Cut the outputs of an earlier upload back to the resume point"""
+    for path in files:
+        if path and os.path.exists(path):
+            truncate_records(path, state['resume_ms'])
+
+class ResumeRegistry:
+    """Cache keys of processed uploads grouped by head_key, to find the earlier uploads of a growing log"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, head):
+        return os.path.join(self.folder, f"{head}.json")
+
+    def candidates(self, head):
+        """Cache keys registered for a head key, most recent first"""
+        try:
+            with open(self._path(head), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def register(self, head, key, limit=8):
+        """Remember a processed upload under its head key"""
+        keys = [key] + [k for k in self.candidates(head) if k != key]
+        temp = f"{self._path(head)}.{os.getpid()}"
+        with open(temp, 'w') as f:
+            json.dump(keys[:limit], f)
+        os.replace(temp, self._path(head))
+
+def find_resumable(result_cache, registry, input_file, head):
+    """Find a cached upload that the file extends, returning (cache key, manifest) or (None, None)"""
+    for key in registry.candidates(head):
+        manifest = result_cache.lookup(key)
+        if manifest and matches_prefix(input_file, manifest.get('resume')):
+            return key, manifest
+    return None, None
+
+def resume_processing(input_file, state, location_file, satellites_file=None, intermediate_file=None):
+    """Process only the new tail of a grown file, appending to copies of its earlier JSONL outputs
+
+    The outputs are cut back to the resume point first, then the fused
+    pipeline runs from resume_offset. Returns the resume state of the grown
+    file (or an empty dict when it cannot be resumed again), None when
+    processing failed and the outputs are unusable.
+    """
+    print(f"Resuming {state['format']} processing of {input_file} at byte {state['resume_offset']}")
+    truncate_outputs(state, (location_file, satellites_file, intermediate_file))
+    if not run_fused_pipeline(
+        input_file, location_file, 'jsonl', intermediate_file, start=state['resume_offset'], append=True,
+    ):
+        return None
+    if satellites_file:
+        write_satellite_tables(input_file, satellites_file, 'jsonl', start=state['resume_offset'], append=True)
+    return resume_state(input_file, state['format'], location_file) or {}
@@ -0,0 +1,161 @@
+import json
+import math
+import os
+from datetime import date, datetime, time
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from src.timestamp_index import TimestampIndex, build_index, line_starts, line_timestamps, load_index
+
+try:
+    import orjson
+except ImportError:  # The standard library encoder produces the same records, only slower
+    orjson = None
+
+# Encoded bytes collected before JsonlWriter issues a write
+WRITE_BUFFER_BYTES = 1024 * 1024
+
+def _isoformat(value):
+    return value.isoformat()
+
+def _finite(value):
+    """Map NaN/Infinity to None, strict JSON has no spelling for them"""
+    return value if math.isfinite(value) else None
+
+def _finite_item(value):
+    return _finite(float(value))
+
+def _normalize_dict(record):
+    return {key: _normalize(value) for key, value in record.items()}
+
+def _normalize_list(values):
+    return [_normalize(value) for value in values]
+
+# Conversions applied before encoding, keyed by exact type so the lookup is a
+# single dict access per value. Everything else is passed to the backend as is.
+_CONVERTERS = {
+    datetime: _isoformat,
+    date: _isoformat,
+    time: _isoformat,
+    pd.Timestamp: _isoformat,
+    Decimal: _finite_item,
+    np.float64: _finite_item,
+    np.float32: _finite_item,
+    np.int64: int,
+    np.int32: int,
+    np.bool_: bool,
+    dict: _normalize_dict,
+    list: _normalize_list,
+    tuple: _normalize_list,
+}
+
+if orjson is None:
+    # json.dumps writes bare NaN tokens, so plain floats need the check as well
+    _CONVERTERS[float] = _finite
+
+def _normalize(value):
+    converter = _CONVERTERS.get(type(value))
+    return value if converter is None else converter(value)
+
+def _fallback(value):
+    """Last resort for types without a converter, same as custom_serializer"""
+    return str(value)
+
+if orjson is not None:
+    def encode_record(record):
+        """Encode a record as one compact line of strict JSON (UTF-8 bytes, no newline)"""
+        # Non-str keys are stringified as json.dumps does, not rejected
+        return orjson.dumps(_normalize(record), default=_fallback, option=orjson.OPT_NON_STR_KEYS)
+else:
+    _encoder = json.JSONEncoder(
+        separators=(',', ':'), ensure_ascii=False, allow_nan=False, default=_fallback,
+    )
+
+    def encode_record(record):
+        """Encode a record as one compact line of strict JSON (UTF-8 bytes, no newline)"""
+        return _encoder.encode(_normalize(record)).encode('utf-8')
+
+def encode_value(value):
+    """Encode a single value as a JSON token string"""
+    return encode_record(value).decode('utf-8')
+
+class JsonlWriter:
+    """Buffered JSONL writer that encodes records and writes them in large blocks
+
+    offset is the number of bytes written so far (including buffered ones), so
+    callers can note where each record starts. With index=True a timestamp
+    sidecar index (see timestamp_index) is written next to the file on close.
+    append=True adds to an existing file, continuing its index when it has one.
+    """
+
+    def __init__(self, output_file, buffer_bytes=WRITE_BUFFER_BYTES, index=False, append=False):
+        self.output_file = output_file
+        self.buffer_bytes = buffer_bytes
+        self.offset = os.path.getsize(output_file) if append and os.path.exists(output_file) else 0
+        self.records = 0
+        self.index = None
+        if index:
+            saved = load_index(output_file) if self.offset else None
+            self.index = TimestampIndex.from_dict(saved) if saved else TimestampIndex()
+            if self.offset and saved is None:
+                # Appending to a file without a usable index, index it as it stands first
+                self.index = TimestampIndex.from_dict(build_index(output_file))
+        self._buffer = []
+        self._buffered = 0
+        self._file = open(output_file, 'ab' if append else 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, record):
+        """Encode and buffer one record, returning the byte offset where it starts"""
+        timestamp = record.get('timestamp_ms') if isinstance(record, dict) else None
+        return self.write_line(encode_record(record), timestamp)
+
+    def write_line(self, line, timestamp_ms=None):
+        """Buffer one pre-encoded JSON line (bytes without newline)"""
+        start = self.offset
+        if self.index is not None:
+            self.index.add(timestamp_ms if isinstance(timestamp_ms, int) else None, start)
+        self._append(line + b'\n', 1)
+        return start
+
+    def write_lines(self, lines, timestamps=None):
+        """Buffer a block of pre-encoded JSON lines (str without newlines)
+
+        timestamps holds the timestamp_ms of each line for the index, they are
+        read back from the lines when not given.
+        """
+        if lines:
+            data = ('\n'.join(lines) + '\n').encode('utf-8')
+            if self.index is not None:
+                if timestamps is None:
+                    timestamps = line_timestamps(lines)
+                self.index.add_block(self.offset, line_starts(data), timestamps)
+            self._append(data, len(lines))
+
+    def _append(self, data, records):
+        self._buffer.append(data)
+        self._buffered += len(data)
+        self.offset += len(data)
+        self.records += records
+        if self._buffered >= self.buffer_bytes:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered lines to the file"""
+        if self._buffer:
+            self._file.write(b''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def close(self):
+        """Flush and close the file"""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+            if self.index is not None:
+                self.index.save(self.output_file)
@@ -0,0 +1,14 @@
+import os
+from openai import AzureOpenAI
+
+def llm_base_url():
+    """Chat completions base URL: LLM_BASE_URL when set (e.g. benchmarks/stub_llm_server.py), else the Azure deployment"""
+    return os.getenv('LLM_BASE_URL') or f"{os.getenv('AZURE_OPENAI_ENDPOINT')}/deployments/{os.getenv('AZURE_OPENAI_ENGINE')}"
+
+def create_client():
+    """Client for the LLM fallbacks"""
+    return AzureOpenAI(
+        api_key=os.getenv('AZURE_OPENAI_API_KEY'),
+        api_version=os.getenv('AZURE_OPENAI_API_VERSION'),
+        base_url=llm_base_url()
+    )
@@ -1,154 +1,529 @@
+import itertools
 import json
 import os
+import re
+from collections import OrderedDict
 from pathlib import Path
+import numpy as np
+import pandas as pd
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from src.stream_reader import iter_lines
+from src.rinex_reader import RINEX_SYSTEMS, frame_timestamps, iter_rinex_frames
+from src.format_detector import MIN_CONFIDENCE, detect_format
+from src.timestamp_index import build_index, remove_index
+from src.code_cache import code_cache, input_fingerprint
+from src.code_trial import trial_run
+from src.llm_client import create_client
+from src.sandbox_pool import sandbox_pool
+from src.record_validator import (
+    VALIDATION_BLOCK_ROWS, iter_blocks, merge_reasons, validate_batch, validate_location_batch,
+)
+from src.columnar_writer import (
+    OUTPUT_EXTENSIONS, is_parquet_file, iter_parquet_records, jsonl_to_parquet, open_record_writer,
+    parquet_to_jsonl,
+)
+
+# NMEA fix epochs kept open for late sentences before they are written out
+EPOCH_REORDER_WINDOW = 4
+
+# Fields of a merged NMEA epoch record
+EPOCH_FIELDS = (
+    'timestamp_ms', 'latitude', 'longitude', 'altitude', 'speed', 'course',
+    'hdop', 'pdop', 'vdop', 'num_satellites', 'quality', 'fix_type',
+)
+
+# Location fields of each RINEX observation type (P is the RINEX 2 P-code pseudorange)
+RINEX_MEASUREMENTS = {
+    'C': 'pseudorange', 'P': 'pseudorange', 'L': 'carrier_phase', 'D': 'doppler', 'S': 'signal_strength',
+}
+
+# RINEX observation codes: type, band and (RINEX 3) tracking attribute, e.g. C1C, L2W or S1
+_RINEX_CODE = re.compile(r'^([CPLDS])(\d)([A-Z]?)$')
+
+# Fields of a RINEX location record, one record per satellite and signal
+RINEX_LOCATION_FIELDS = (
+    'timestamp_ms', 'satellite_system', 'satellite_number', 'signal',
+    'pseudorange', 'carrier_phase', 'doppler', 'signal_strength', 'record_type',
+)
+
+# Lines at the start of a file always sent to the LLM as a sample
+LLM_SAMPLE_HEAD_LINES = 15
+
+# Most sample lines, lines after the head are added for message types not seen yet
+LLM_SAMPLE_MAX_LINES = 25
+
+# Lines after the head searched for further message types
+LLM_SAMPLE_SCAN_LINES = 1000
 
 # Load environment variables
 load_dotenv()
 
 # Configure Azure OpenAI
-client = AzureOpenAI(
-    api_key=os.getenv('AZURE_OPENAI_API_KEY'),
-    api_version=os.getenv('AZURE_OPENAI_API_VERSION'),
-    base_url=f"{os.getenv('AZURE_OPENAI_ENDPOINT')}/deployments/{os.getenv('AZURE_OPENAI_ENGINE')}"
-)
+client = create_client()
+
+# Fields of LLM extraction output, by category
+POSITIONING_FIELDS = {
+    'location': ['latitude', 'longitude', 'altitude'],
+    'gnss': ['satellite_system', 'satellite_number', 'pseudorange', 'carrier_phase'],
+    'quality': ['hdop', 'pdop', 'num_satellites', 'fix_type', 'quality', 'accuracy'],
+    'motion': ['speed', 'course', 'heading', 'velocity']
+}
 
 def validate_location_records(records):
     """Validate if location records have useful positioning data for FGO"""
-    if not records:
-        return False
-        
-    # Basic validation - each record should be a dictionary
-    if not all(isinstance(record, dict) for record in records):
-        return False
-    
-    # Each record should have at least a timestamp
-    if not all('timestamp_ms' in record for record in records):
+    if not records or not isinstance(records, list):
         return False
     
-    # Each record should have some form of positioning data
-    positioning_fields = {
-        'location': ['latitude', 'longitude', 'altitude'],
-        'gnss': ['satellite_system', 'satellite_number', 'pseudorange', 'carrier_phase'],
-        'quality': ['hdop', 'pdop', 'num_satellites', 'fix_type', 'quality', 'accuracy'],
-        'motion': ['speed', 'course', 'heading', 'velocity']
-    }
-    
-    # Record should contain at least one field from location OR gnss categories
-    # and optionally fields from quality/motion categories
-    for record in records:
-        has_location = any(field in record for field in positioning_fields['location'])
-        has_gnss = any(field in record for field in positioning_fields['gnss'])
-        if not (has_location or has_gnss):
-            return False
-            
-        # Validate numeric fields if present
-        for category in positioning_fields.values():
-            for field in category:
-                if field in record and record[field] is not None:
-                    try:
-                        float(record[field])
-                    except (ValueError, TypeError):
-                        return False
-    
-    return True
+    # Each record needs a timestamp and at least one location or gnss field,
+    # every positioning field present must be numeric
+    accept, reasons = validate_batch(
+        records,
+        required=('timestamp_ms',),
+        numeric=[field for category in POSITIONING_FIELDS.values() for field in category],
+        any_of=POSITIONING_FIELDS['location'] + POSITIONING_FIELDS['gnss'],
+    )
+    if reasons:
+        print(f"Rejected location records: {reasons}")
+    return bool(accept.all())
+
+def extract_location_data(input_file, output_file=None, output_format='jsonl'):
+    """Extract standardized location records from JSONL file
 
-def extract_location_data(input_file, output_file=None):
-    """Extract standardized location records from JSONL file"""
+    The input may also be a Parquet converter output; output_format 'parquet'
+    writes the location records as a Parquet file.
+    """
     try:
         print(f"Starting location data extraction from: {input_file}")
         input_path = Path(input_file)
         
         if output_file is None:
-            output_file = str(input_path.with_suffix('.location.jsonl'))
+            output_file = str(input_path.with_suffix('.location' + OUTPUT_EXTENSIONS[output_format]))
             
-        # Try standard extraction first
+        # Try standard extraction first: one streaming pass from input to output
         print("Attempting standard extraction...")
-        success = False
         try:
-            # Try NMEA extraction with binary mode
-            success, records = extract_nmea_location_data(input_file)
-            if not success:
-                # Try RINEX extraction
-                success, records = extract_rinex_location_data(input_file)
-            
-            if success and records:
-                # Write valid location records
-                with open(output_file, 'w') as f:
-                    for record in records:
-                        if validate_location_record(record):
-                            f.write(json.dumps(record) + '\n')
+            counts = new_extraction_counts()
+            with open_record_writer(output_file, output_format, index=True) as writer:
+                for record in iter_location_records(input_file, counts):
+                    writer.write(record)
+            print_extraction_summary(counts)
+            if counts['valid'] > 0:
                 print("Standard extraction successful")
                 return output_file
+            os.remove(output_file)
+            remove_index(output_file)
         except Exception as e:
             print(f"Standard extraction failed: {str(e)}")
         
         # If standard extraction fails, try LLM extraction
         print("Standard extraction failed, attempting LLM extraction...")
-        return extract_with_llm(input_file, output_file)
+        llm_input = input_file
+        if is_parquet_file(input_file):
+            # The LLM works from a text sample, so hand it the records as JSONL
+            llm_input = os.path.splitext(input_file)[0] + '.llm-input.jsonl'
+            parquet_to_jsonl(input_file, llm_input)
+        try:
+            if output_format == 'parquet':
+                return extract_with_llm_to_parquet(llm_input, output_file)
+            result = extract_with_llm(llm_input, output_file)
+            if result:
+                build_index(output_file)
+            return result
+        finally:
+            if llm_input != input_file and os.path.exists(llm_input):
+                os.remove(llm_input)
             
     except Exception as e:
         print(f"Error extracting location data: {str(e)}")
         return None
 
-def extract_gga_location(record):
-    """Extract location data from GGA message"""
+def extract_with_llm_to_parquet(input_file, output_file):
+    """Run the LLM extraction into a temporary JSONL file and convert it to Parquet"""
+    jsonl_file = os.path.splitext(output_file)[0] + '.llm.jsonl'
     try:
-        if not all(field in record for field in ['latitude', 'longitude']):
+        if not extract_with_llm(input_file, jsonl_file):
             return None
-            
-        location = {
-            'timestamp_ms': record.get('timestamp_ms'),
-            'latitude': float(record['latitude']),
-            'longitude': float(record['longitude']),
-            'altitude': float(record['altitude']) if 'altitude' in record else None,
-            'num_satellites': int(record['num_satellites']) if 'num_satellites' in record else None,
-            'hdop': float(record['hdop']) if 'hdop' in record else None,
-            'quality': int(record['quality']) if 'quality' in record else None,
-            'record_type': 'GGA'
-        }
-        return location
-    except (ValueError, TypeError) as e:
-        print(f"Error extracting GGA location: {str(e)}")
+        return output_file if jsonl_to_parquet(jsonl_file, output_file) > 0 else None
+    finally:
+        if os.path.exists(jsonl_file):
+            os.remove(jsonl_file)
+
+def new_extraction_counts():
+    """Per-category counters for one extraction pass"""
+    return {
+        'lines': 0, 'blank': 0, 'json': 0, 'sentences': 0, 'other': 0, 'malformed': 0,
+        'skipped': 0, 'epochs': 0, 'observations': 0, 'rejected': 0, 'valid': 0, 'rejections': {},
+    }
+
+def print_extraction_summary(counts):
+    """Print the counters of an extraction pass"""
+    print("Location Extraction Summary:")
+    print(f"- Input lines: {counts['lines']} (blank: {counts['blank']}, other text: {counts['other']}, malformed: {counts['malformed']})")
+    print(f"- JSON records: {counts['json']}, raw NMEA sentences: {counts['sentences']}")
+    print(f"- Without location data: {counts['skipped']}")
+    print(f"- NMEA epochs assembled: {counts['epochs']}")
+    print(f"- RINEX observation rows: {counts['observations']}")
+    print(f"- Rejected by validation: {counts['rejected']}")
+    for reason, count in sorted(counts['rejections'].items()):
+        print(f"  - {reason}: {count}")
+    print(f"- Valid location records: {counts['valid']}")
+
+def iter_input_records(input_file, counts=None):
+    """Yield dict records from a JSONL or Parquet converter output, parsing raw NMEA lines too
+
+    Each line is classified by its first character, so only lines that look
+    like JSON objects reach the JSON parser.
+    """
+    if counts is None:
+        counts = new_extraction_counts()
+    if is_parquet_file(input_file):
+        for record in iter_parquet_records(input_file):
+            counts['json'] += 1
+            yield record
+        return
+    
+    # Stream the content line by line in bounded chunks
+    for line in iter_lines(input_file):
+        counts['lines'] += 1
+        line = line.strip()
+        if not line:
+            counts['blank'] += 1
+            continue
+        
+        if line[0] == '{':
+            try:
+                record = json.loads(line)
+            except ValueError:
+                counts['malformed'] += 1
+                continue
+            counts['json'] += 1
+        elif line[0] == '$':
+            record = parse_nmea_sentence(line)
+            if record is None:
+                counts['malformed'] += 1
+                continue
+            counts['sentences'] += 1
+        else:
+            counts['other'] += 1
+            continue
+        yield record
+
+def to_location_record(record):
+    """Map an input record to a location record by its type, None if it has no location data"""
+    if not isinstance(record, dict):
         return None
+    
+    # Parsed raw sentences and earlier extraction output are already standardized
+    if 'latitude' in record or 'pseudorange' in record:
+        return record
+    
+    sentence_type = record.get('sentence_type')
+    if sentence_type is not None:
+        extractor = NMEA_EXTRACTORS.get(str(sentence_type)[-3:])
+        return extractor(record) if extractor else None
+    return None
 
-def extract_rmc_location(record):
-    """Extract location data from RMC message"""
+class NmeaEpochAssembler:
+    """Merge the NMEA sentences of one fix epoch into a single location record
+
+    Sentences are grouped by their UTC time. Sentences without one (GSA, VTG)
+    join the epoch received at the same timestamp_ms when the log has receive
+    times, otherwise the most recent epoch. At most `window` epochs are kept
+    open, the oldest is emitted when a newer one arrives.
+    """
+
+    def __init__(self, window=EPOCH_REORDER_WINDOW):
+        self.window = window
+        self._epochs = OrderedDict()
+        self._received = {}
+
+    def add(self, utc_time, received_ms, partial):
+        """Merge the location fields of one sentence, returning the epochs that left the window"""
+        key = utc_time
+        if key is None:
+            key = self._received.get(received_ms)
+            if key is None:
+                if received_ms is None and self._epochs:
+                    key = next(reversed(self._epochs))
+                else:
+                    # Hold the sentence until its timed sentences arrive
+                    key = ('received', received_ms)
+        
+        epoch = self._epochs.get(key)
+        if epoch is None:
+            epoch = self._epochs[key] = {'record': dict.fromkeys(EPOCH_FIELDS), 'received': received_ms}
+            held = self._epochs.pop(('received', received_ms), None) if utc_time is not None else None
+            if held is not None:
+                merge_epoch_fields(epoch['record'], held['record'])
+            if received_ms is not None:
+                self._received[received_ms] = key
+        merge_epoch_fields(epoch['record'], partial)
+        
+        emitted = []
+        while len(self._epochs) > self.window:
+            emitted.append(self._pop_oldest())
+        return emitted
+
+    def flush(self):
+        """Emit all open epochs"""
+        return [self._pop_oldest() for _ in range(len(self._epochs))]
+
+    def _pop_oldest(self):
+        _, epoch = self._epochs.popitem(last=False)
+        self._received.pop(epoch['received'], None)
+        record = epoch['record']
+        record['record_type'] = 'NMEA'
+        return record
+
+def merge_epoch_fields(record, partial):
+    """Fill the epoch fields that are still missing from a sentence's location fields"""
+    for field in EPOCH_FIELDS:
+        if record[field] is None and partial.get(field) is not None:
+            record[field] = partial[field]
+
+def candidate_locations(records, counts, window=EPOCH_REORDER_WINDOW):
+    """Standardize a stream of converter records into location records
+
+    NMEA sentences are merged per fix epoch, other records pass through one by one.
+    """
+    assembler = NmeaEpochAssembler(window)
+    for record in records:
+        if isinstance(record, dict) and 'sv' in record and 'pseudorange' not in record:
+            # Converted RINEX observation row, one location record per signal
+            counts['observations'] += 1
+            locations = extract_rinex_locations(record)
+            if not locations:
+                counts['skipped'] += 1
+            yield from locations
+            continue
+        
+        location = to_location_record(record)
+        if location is None:
+            counts['skipped'] += 1
+        elif record.get('sentence_type') is not None:
+            epochs = assembler.add(record.get('timestamp'), record.get('timestamp_ms'), location)
+            counts['epochs'] += len(epochs)
+            yield from epochs
+        else:
+            yield location
+    
+    epochs = assembler.flush()
+    counts['epochs'] += len(epochs)
+    yield from epochs
+
+def iter_candidate_locations(input_file, counts, window=EPOCH_REORDER_WINDOW):
+    """Read, classify and standardize the records of a file in a single streaming pass"""
+    return candidate_locations(iter_input_records(input_file, counts), counts, window)
+
+def is_rinex_observation_file(input_file):
+    """Check whether a file is a RINEX observation file that can be read without conversion"""
+    name, confidence = detect_format(input_file)
+    return name == 'RINEX' and confidence >= MIN_CONFIDENCE
+
+def iter_rinex_locations(input_file, counts):
+    """Stream location records straight from the parsed observations of a RINEX file"""
+    for frame in iter_rinex_frames(input_file, use=RINEX_SYSTEMS):
+        counts['observations'] += len(frame)
+        yield from rinex_frame_to_locations(frame)
+
+def iter_location_records(input_file, counts, window=EPOCH_REORDER_WINDOW, block_rows=VALIDATION_BLOCK_ROWS):
+    """Stream the valid location records of a file, validating them in blocks
+
+    RINEX observation files are read directly, other inputs are converter
+    outputs (JSONL/Parquet) or raw NMEA.
+    """
+    if is_rinex_observation_file(input_file):
+        candidates = iter_rinex_locations(input_file, counts)
+    else:
+        candidates = iter_candidate_locations(input_file, counts, window)
+    return iter_valid_locations(candidates, counts, block_rows)
+
+def iter_valid_locations(candidates, counts, block_rows=VALIDATION_BLOCK_ROWS):
+    """Validate candidate location records in blocks, yielding the accepted ones"""
+    for block in iter_blocks(candidates, block_rows):
+        accept, reasons = validate_location_batch(block)
+        valid = int(accept.sum())
+        counts['valid'] += valid
+        counts['rejected'] += len(block) - valid
+        merge_reasons(counts['rejections'], reasons)
+        for location, accepted in zip(block, accept.tolist()):
+            if accepted:
+                yield location
+
+def _optional_float(value):
+    """Convert a field to float, None when it is empty or not a number"""
+    if value is None or value == '':
+        return None
     try:
-        if not all(field in record for field in ['latitude', 'longitude']):
-            return None
-            
-        location = {
-            'timestamp_ms': record.get('timestamp_ms'),
-            'latitude': float(record['latitude']),
-            'longitude': float(record['longitude']),
-            'speed': float(record['speed']) if 'speed' in record else None,
-            'course': float(record['course']) if 'course' in record else None,
-            'record_type': 'RMC'
-        }
-        return location
-    except (ValueError, TypeError) as e:
-        print(f"Error extracting RMC location: {str(e)}")
+        return float(value)
+    except (ValueError, TypeError):
         return None
 
-def extract_rinex_location(record):
-    """Extract location data from RINEX record"""
-    try:
+def _optional_int(value):
+    """Convert a field to int, None when it is empty or not a number"""
+    number = _optional_float(value)
+    return int(number) if number is not None else None
+
+def extract_gga_location(record):
+    """Extract location data from a converted GGA record"""
+    latitude, longitude = convert_nmea_coordinates(
+        record.get('lat'), record.get('lat_dir'), record.get('lon'), record.get('lon_dir'))
+    if latitude is None or longitude is None:
+        return None
+    
+    return {
+        'timestamp_ms': record.get('timestamp_ms'),
+        'latitude': latitude,
+        'longitude': longitude,
+        'altitude': _optional_float(record.get('altitude')),
+        'num_satellites': _optional_int(record.get('num_sats')),
+        'hdop': _optional_float(record.get('horizontal_dil')),
+        'quality': _optional_int(record.get('gps_qual')),
+        'record_type': 'GGA'
+    }
+
+def extract_rmc_location(record):
+    """Extract location data from a converted RMC record"""
+    latitude, longitude = convert_nmea_coordinates(
+        record.get('lat'), record.get('lat_dir'), record.get('lon'), record.get('lon_dir'))
+    if latitude is None or longitude is None:
+        return None
+    
+    speed = _optional_float(record.get('spd_over_grnd'))
+    return {
+        'timestamp_ms': record.get('timestamp_ms'),
+        'latitude': latitude,
+        'longitude': longitude,
+        'speed': speed * 0.514444 if speed is not None else None,  # Convert knots to m/s
+        'course': _optional_float(record.get('true_course')),
+        'record_type': 'RMC'
+    }
+
+def extract_gns_location(record):
+    """Extract location data from a converted GNS record"""
+    latitude, longitude = convert_nmea_coordinates(
+        record.get('lat'), record.get('lat_dir'), record.get('lon'), record.get('lon_dir'))
+    if latitude is None or longitude is None:
+        return None
+    
+    return {
+        'timestamp_ms': record.get('timestamp_ms'),
+        'latitude': latitude,
+        'longitude': longitude,
+        'altitude': _optional_float(record.get('altitude')),
+        'num_satellites': _optional_int(record.get('num_sats')),
+        'hdop': _optional_float(record.get('hdop')),
+        'record_type': 'GNS'
+    }
+
+def extract_gsa_location(record):
+    """Extract DOPs and fix type from a GSA record (converted or parsed from a raw sentence)"""
+    return {
+        'timestamp_ms': record.get('timestamp_ms'),
+        'pdop': _optional_float(record.get('pdop')),
+        'hdop': _optional_float(record.get('hdop')),
+        'vdop': _optional_float(record.get('vdop')),
+        'fix_type': _optional_int(record.get('mode_fix_type', record.get('fix_type'))),
+        'record_type': 'GSA'
+    }
+
+def extract_vtg_location(record):
+    """Extract speed and course from a converted VTG record"""
+    speed = _optional_float(record.get('spd_over_grnd_kts'))
+    return {
+        'timestamp_ms': record.get('timestamp_ms'),
+        'speed': speed * 0.514444 if speed is not None else None,  # Convert knots to m/s
+        'course': _optional_float(record.get('true_track')),
+        'record_type': 'VTG'
+    }
+
+def group_rinex_signals(codes):
+    """Group observation codes by signal, e.g. {'1C': {'pseudorange': 'C1C', 'carrier_phase': 'L1C', ...}}"""
+    signals = {}
+    for code in codes:
+        match = _RINEX_CODE.match(code) if isinstance(code, str) else None
+        if not match:
+            continue
+        kind, band, attribute = match.groups()
+        # Keep RINEX 2 P-code ranges apart from the C/A code on the same band
+        signal = band + (attribute or ('P' if kind == 'P' else ''))
+        signals.setdefault(signal, {}).setdefault(RINEX_MEASUREMENTS[kind], code)
+    return signals
+
+def extract_rinex_locations(record):
+    """Extract one location record per signal from a converted RINEX observation row"""
+    sv = str(record.get('sv') or '')
+    timestamp_ms = record.get('timestamp_ms')
+    if timestamp_ms is None and record.get('time') is not None:
+        timestamp_ms = int(pd.Timestamp(record['time']).timestamp() * 1000)
+    
+    locations = []
+    for signal, codes in group_rinex_signals(record).items():
+        measurements = {field: _optional_float(record.get(code)) for field, code in codes.items()}
+        if all(value is None for value in measurements.values()):
+            continue
         location = {
-            'timestamp_ms': int(record['time'].timestamp() * 1000) if 'time' in record else None,
-            'satellite_system': record.get('sv', '').split()[0] if record.get('sv', '') else None,
-            'satellite_number': record.get('sv', '').split()[1] if record.get('sv', '') and len(record.get('sv', '').split()) > 1 else None,
-            'pseudorange': float(record['C1']) if 'C1' in record else None,
-            'carrier_phase': float(record['L1']) if 'L1' in record else None,
-            'doppler': float(record['D1']) if 'D1' in record else None,
-            'signal_strength': float(record['S1']) if 'S1' in record else None,
+            'timestamp_ms': timestamp_ms,
+            'satellite_system': record.get('satellite_system') or sv[:1] or None,
+            'satellite_number': record.get('satellite_number') or sv[1:].strip() or None,
+            'signal': signal,
+            'pseudorange': None, 'carrier_phase': None, 'doppler': None, 'signal_strength': None,
             'record_type': 'RINEX'
         }
-        return location
-    except (ValueError, TypeError, AttributeError) as e:
-        print(f"Error extracting RINEX location: {str(e)}")
-        return None
+        location.update(measurements)
+        locations.append(location)
+    return locations
+
+def rinex_frame_to_locations(df):
+    """Turn a block of parsed RINEX observations into location records, one per satellite and signal
+
+    Works on whole columns: each signal's measurements are cut from the block
+    as arrays and rows without any measurement are dropped.
+    """
+    if not len(df):
+        return []
+    timestamps = frame_timestamps(df)
+    sv = df['sv'].astype(str).str.strip()
+    systems = sv.str[:1].to_numpy(dtype=object)
+    numbers = sv.str[1:].str.strip().to_numpy(dtype=object)
+    rows = np.arange(len(df))
+    
+    blocks = []
+    for signal, codes in group_rinex_signals(df.columns).items():
+        values = {
+            field: df[codes[field]].to_numpy(dtype=float) if field in codes else np.full(len(df), np.nan)
+            for field in ('pseudorange', 'carrier_phase', 'doppler', 'signal_strength')
+        }
+        observed = np.logical_or.reduce([np.isfinite(column) for column in values.values()])
+        if not observed.any():
+            continue
+        block = {
+            'row': rows[observed],
+            'timestamp_ms': timestamps[observed],
+            'satellite_system': systems[observed],
+            'satellite_number': numbers[observed],
+            'signal': signal,
+        }
+        block.update({field: column[observed] for field, column in values.items()})
+        blocks.append(pd.DataFrame(block))
+    if not blocks:
+        return []
+    
+    # Back to observation order: epoch, satellite, then signal
+    locations = pd.concat(blocks, ignore_index=True).sort_values('row', kind='stable')
+    locations['record_type'] = 'RINEX'
+    locations = locations[list(RINEX_LOCATION_FIELDS)]
+    locations = locations.astype(object).where(locations.notna(), None)
+    return locations.to_dict('records')
+
+# Location extractors for converted NMEA records, by sentence formatter
+NMEA_EXTRACTORS = {
+    'GGA': extract_gga_location,
+    'RMC': extract_rmc_location,
+    'GNS': extract_gns_location,
+    'GSA': extract_gsa_location,
+    'VTG': extract_vtg_location,
+}
 
 def is_valid_location(record):
     """Validate location record format"""
@@ -171,110 +546,6 @@ def is_valid_location(record):
     except Exception:
         return False
 
-def extract_nmea_location_data(input_file):
-    """Extract location data from NMEA JSONL file"""
-    try:
-        records = []
-        # Try reading as binary first
-        try:
-            with open(input_file, 'rb') as f:
-                content = f.read()
-                # Try different encodings
-                for encoding in ['utf-8', 'latin1', 'ascii']:
-                    try:
-                        text = content.decode(encoding)
-                        break
-                    except UnicodeDecodeError:
-                        continue
-                else:
-                    # If no encoding works, try reading line by line
-                    text = ''
-                    for line in content.split(b'\n'):
-                        try:
-                            text += line.decode('utf-8', errors='ignore') + '\n'
-                        except:
-                            continue
-        except Exception as e:
-            print(f"Error reading NMEA file: {e}")
-            return False, []
-
-        # Process the text content
-        for line in text.splitlines():
-            try:
-                if not line.strip():
-                    continue
-                    
-                # Try parsing as JSON first
-                try:
-                    record = json.loads(line)
-                except:
-                    # If not JSON, try parsing as NMEA
-                    if line.startswith('$'):
-                        record = parse_nmea_sentence(line)
-                    else:
-                        continue
-                
-                if record and validate_location_record(record):
-                    records.append(record)
-            except Exception as e:
-                print(f"Error processing line: {str(e)}")
-                continue
-                
-        return bool(records), records
-    except Exception as e:
-        print(f"Error extracting NMEA data: {str(e)}")
-        return False, []
-
-def extract_rinex_location_data(input_file):
-    """Extract location data from RINEX JSONL file"""
-    try:
-        location_records = []
-        
-        with open(input_file, 'r') as f:
-            for line in f:
-                try:
-                    data = json.loads(line)
-                    
-                    # Extract satellite system and number
-                    sv = data.get('sv', '')
-                    if isinstance(sv, str) and ' ' in sv:
-                        sat_sys, sat_num = sv.split()
-                    else:
-                        sat_sys = sv[:1] if isinstance(sv, str) and sv else None
-                        sat_num = sv[1:] if isinstance(sv, str) and len(sv) > 1 else None
-                    
-                    if sat_sys and sat_num:
-                        # Create standardized record
-                        record = {
-                            'timestamp_ms': int(data['time'].timestamp() * 1000),
-                            'satellite_system': sat_sys,
-                            'satellite_number': sat_num
-                        }
-                        
-                        # Add observation data if available
-                        if 'C1' in data:
-                            record['pseudorange'] = float(data['C1'])
-                        if 'L1' in data:
-                            record['carrier_phase'] = float(data['L1'])
-                        if 'D1' in data:
-                            record['doppler'] = float(data['D1'])
-                        if 'S1' in data:
-                            record['signal_strength'] = float(data['S1'])
-                            
-                        location_records.append(record)
-                        
-                except json.JSONDecodeError:
-                    continue
-                except Exception as e:
-                    print(f"Error processing line: {e}")
-                    continue
-                    
-        return len(location_records) > 0, location_records
-        
-    except Exception as e:
-        print(f"Error extracting RINEX location data: {str(e)}")
-        return False, []
-
 def convert_nmea_coordinates(lat, lat_dir, lon, lon_dir):
     """Convert NMEA coordinate format to decimal degrees"""
     try:
@@ -314,6 +585,7 @@ def parse_nmea_sentence(sentence):
             if len(parts) >= 15:
                 try:
                     record.update({
+                        'timestamp': parts[1] or None,
                         'timestamp_ms': int(float(parts[1]) * 1000) if parts[1] else None,
                         'latitude': float(parts[2][:2]) + float(parts[2][2:]) / 60 if parts[2] else None,
                         'lat_dir': parts[3],
@@ -333,6 +605,7 @@ def parse_nmea_sentence(sentence):
             if len(parts) >= 12:
                 try:
                     record.update({
+                        'timestamp': parts[1] or None,
                         'timestamp_ms': int(float(parts[1]) * 1000) if parts[1] else None,
                         'status': parts[2],
                         'latitude': float(parts[3][:2]) + float(parts[3][2:]) / 60 if parts[3] else None,
@@ -363,53 +636,56 @@ def parse_nmea_sentence(sentence):
     except Exception:
         return None
 
+def message_type(line):
+    """NMEA sentence type or JSON record sentence_type of a line, None if it has neither"""
+    if line.startswith('$'):
+        return line.split(',')[0][1:]
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record.get('sentence_type') if isinstance(record, dict) else None
+
+def read_sample_lines(input_file, head=LLM_SAMPLE_HEAD_LINES, limit=LLM_SAMPLE_MAX_LINES, scan=LLM_SAMPLE_SCAN_LINES):
+    """Sample lines of a file for the LLM: its first lines, then lines of message types not seen yet
+
+    Lines are streamed, so only the first head + scan lines are ever read.
+    """
+    lines = iter_lines(input_file)
+    sample = list(itertools.islice(lines, head))
+    seen = {message_type(line) for line in sample}
+    for line in itertools.islice(lines, scan):
+        if len(sample) >= limit:
+            break
+        msg_type = message_type(line)
+        if msg_type is not None and msg_type not in seen:
+            seen.add(msg_type)
+            sample.append(line)
+    return sample
+
 def extract_with_llm(input_file, output_file):
     """Use LLM to extract location data from file"""
     try:
         print("Starting LLM-based extraction...")
         
+        # Files with the structure of an earlier success reuse its validated code
+        fingerprint = input_fingerprint(input_file)
+        paths = {'input_file': input_file, 'output_file': output_file}
+        cached_code = code_cache.get('extract', fingerprint, paths)
+        if cached_code is not None:
+            print("Reusing cached extractor for this input structure...")
+            try:
+                if run_sandboxed_extraction(cached_code, input_file, output_file):
+                    return output_file
+            except Exception as e:
+                print(f"Cached extractor failed: {str(e)}")
+            print("Cached extractor failed validation, discarding it")
+            code_cache.invalidate('extract', fingerprint)
+        
         # Read sample data for analysis
         print("Reading sample data...")
-        sample_lines = []
-        unique_message_types = set()
-        
         try:
-            with open(input_file, 'rb') as f:
-                content = f.read()
-                # Try different encodings
-                for encoding in ['utf-8', 'latin1', 'ascii']:
-                    try:
-                        text = content.decode(encoding)
-                        break
-                    except UnicodeDecodeError:
-                        continue
-                else:
-                    text = content.decode('utf-8', errors='ignore')
-                
-                # Get first 15 lines minimum
-                lines = text.splitlines()[:15]
-                sample_lines.extend(lines)
-                
-                # Look for more unique message types up to 25 lines total
-                if len(lines) > 15:
-                    for line in lines[15:]:
-                        if len(sample_lines) >= 25:
-                            break
-                        try:
-                            if line.startswith('$'):
-                                msg_type = line.split(',')[0][1:]
-                                if msg_type not in unique_message_types:
-                                    unique_message_types.add(msg_type)
-                                    sample_lines.append(line)
-                            else:
-                                record = json.loads(line)
-                                msg_type = record.get('sentence_type')
-                                if msg_type not in unique_message_types:
-                                    unique_message_types.add(msg_type)
-                                    sample_lines.append(line)
-                        except:
-                            continue
-                            
+            sample_lines = read_sample_lines(input_file)
         except Exception as e:
             print(f"Error reading sample data: {e}")
             return None
@@ -454,19 +730,17 @@ The code should handle both JSON and raw NMEA formats. Return only the Python co
                 else:
                     code_to_exec = generated_code
 
-                print("\nExecuting generated code...")
+                # A failing candidate is found on a sample of the input, not after a full pass
+                passed, error = trial_run('src.location_extractor:run_extraction_code', code_to_exec, paths)
+                if not passed:
+                    print(f"Attempt {attempt + 1} failed on the trial sample: {error}")
+                    continue
 
-                # Execute only the code block content
-                local_vars = {'INPUT_FILE': input_file, 'OUTPUT_FILE': output_file}
-                exec(code_to_exec, globals(), local_vars)
-                
-                # Verify the results
-                if os.path.exists(output_file):
-                    with open(output_file, 'r') as f:
-                        records = [json.loads(line) for line in f]
-                    if validate_location_records(records):
-                        print("LLM extraction successful")
-                        return output_file
+                print("\nExecuting generated code...")
+                if run_sandboxed_extraction(code_to_exec, input_file, output_file):
+                    print("LLM extraction successful")
+                    code_cache.put('extract', fingerprint, code_to_exec, paths)
+                    return output_file
                         
             except Exception as e:
                 print(f"Attempt {attempt + 1} failed: {str(e)}")
@@ -478,94 +752,27 @@ The code should handle both JSON and raw NMEA formats. Return only the Python co
         print(f"Error in LLM extraction: {str(e)}")
         return None
 
+def run_sandboxed_extraction(code_to_exec, input_file, output_file):
+    """Run generated extraction code in a sandbox process, raises SandboxError when it fails"""
+    return bool(sandbox_pool.run('src.location_extractor:run_extraction_code', [code_to_exec, input_file, output_file]))
+
+def run_extraction_code(code_to_exec, input_file, output_file):
+    """Execute generated extraction code and validate the location records it wrote"""
+    # Execute only the code block content
+    local_vars = {'INPUT_FILE': input_file, 'OUTPUT_FILE': output_file}
+    exec(code_to_exec, globals(), local_vars)
+    
+    # Verify the results
+    if os.path.exists(output_file):
+        with open(output_file, 'r') as f:
+            records = [json.loads(line) for line in f]
+        return validate_location_records(records)
+    return False
+
 def validate_location_record(record):
     """Validate a single location record"""
-    try:
-        # Basic validation
-        if not isinstance(record, dict):
-            return False
-            
-        # Must have timestamp
-        if 'timestamp_ms' not in record:
-            return False
-            
-        # Check for positioning data
-        has_position = False
-        
-        # Direct position
-        if all(field in record for field in ['latitude', 'longitude']):
-            try:
-                lat = float(record['latitude'])
-                lon = float(record['longitude'])
-                if -90 <= lat <= 90 and -180 <= lon <= 180:
-                    has_position = True
-                    
-                # Validate altitude if present
-                if 'altitude' in record and record['altitude'] is not None:
-                    alt = float(record['altitude'])
-                    if not (-1000 <= alt <= 9000):  # Reasonable altitude range in meters
-                        return False
-            except (ValueError, TypeError):
-                return False
-                
-        # GNSS raw measurements
-        if all(field in record for field in ['pseudorange', 'carrier_phase']):
-            try:
-                float(record['pseudorange'])
-                float(record['carrier_phase'])
-                has_position = True
-            except (ValueError, TypeError):
-                pass
-                
-        if not has_position:
-            return False
-            
-        # Validate quality indicators if present
-        if 'hdop' in record and record['hdop'] is not None:
-            try:
-                hdop = float(record['hdop'])
-                if not (0 <= hdop <= 50):  # Reasonable HDOP range
-                    return False
-            except (ValueError, TypeError):
-                return False
-                
-        if 'pdop' in record and record['pdop'] is not None:
-            try:
-                pdop = float(record['pdop'])
-                if not (0 <= pdop <= 50):  # Reasonable PDOP range
-                    return False
-            except (ValueError, TypeError):
-                return False
-                
-        if 'num_satellites' in record and record['num_satellites'] is not None:
-            try:
-                num_sats = int(record['num_satellites'])
-                if not (0 <= num_sats <= 50):  # Reasonable number of satellites
-                    return False
-            except (ValueError, TypeError):
-                return False
-                
-        # Validate motion data if present
-        if 'speed' in record and record['speed'] is not None:
-            try:
-                speed = float(record['speed'])
-                if not (0 <= speed <= 278):  # Max speed ~1000 km/h in m/s
-                    return False
-            except (ValueError, TypeError):
-                return False
-                
-        if 'course' in record and record['course'] is not None:
-            try:
-                course = float(record['course'])
-                if not (0 <= course <= 360):  # Course in degrees
-                    return False
-            except (ValueError, TypeError):
-                return False
-                
-        return True
-        
-    except Exception:
-        return False
+    accept, _ = validate_location_batch([record])
+    return bool(accept[0])
 
 def _validate_coordinates(latitude, longitude, altitude=None):
     """Validate coordinate ranges"""
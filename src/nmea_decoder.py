@@ -0,0 +1,144 @@
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from functools import reduce
+from operator import xor
+from string import hexdigits
+
+_HEX_DIGITS = frozenset(hexdigits)
+
+class ChecksumMismatch(ValueError):
+    """Raised when an NMEA sentence checksum does not match its content"""
+
+def parse_timestamp(s):
+    """Convert hhmmss[.ss] to a UTC datetime.time (same semantics as pynmea2)"""
+    ms_s = s[6:]
+    ms = ms_s and int(float(ms_s) * 1000000) or 0
+    return time(hour=int(s[0:2]), minute=int(s[2:4]), second=int(s[4:6]),
+                microsecond=ms, tzinfo=timezone.utc)
+
+def parse_datestamp(s):
+    """Convert DDMMYY to a datetime.date (same semantics as pynmea2)"""
+    if len(s) == 6 and s.isdigit():
+        # Fast path for the canonical form, strptime maps 69-99 to the 1900s
+        year = int(s[4:6])
+        year += 2000 if year < 69 else 1900
+        return date(year, int(s[2:4]), int(s[0:2]))
+    return datetime.strptime(s, '%d%m%y').date()
+
+# Per-sentence field tables: (field name, converter or None for raw strings).
+# Names, order and converters mirror pynmea2 so records stay interchangeable.
+FIELD_TABLES = {
+    'GGA': (
+        ('timestamp', parse_timestamp), ('lat', None), ('lat_dir', None),
+        ('lon', None), ('lon_dir', None), ('gps_qual', int), ('num_sats', None),
+        ('horizontal_dil', None), ('altitude', float), ('altitude_units', None),
+        ('geo_sep', None), ('geo_sep_units', None), ('age_gps_data', None),
+        ('ref_station_id', None),
+    ),
+    'RMC': (
+        ('timestamp', parse_timestamp), ('status', None), ('lat', None),
+        ('lat_dir', None), ('lon', None), ('lon_dir', None),
+        ('spd_over_grnd', float), ('true_course', float),
+        ('datestamp', parse_datestamp), ('mag_variation', None),
+        ('mag_var_dir', None), ('mode_indicator', None), ('nav_status', None),
+    ),
+    'GNS': (
+        ('timestamp', parse_timestamp), ('lat', None), ('lat_dir', None),
+        ('lon', None), ('lon_dir', None), ('mode_indicator', None),
+        ('num_sats', None), ('hdop', None), ('altitude', None), ('geo_sep', None),
+        ('age_gps_data', None), ('diferential', None),
+    ),
+    'GSV': (
+        ('num_messages', None), ('msg_num', None), ('num_sv_in_view', None),
+    ) + tuple(
+        (name % i, None)
+        for i in range(1, 5)
+        for name in ('sv_prn_num_%d', 'elevation_deg_%d', 'azimuth_%d', 'snr_%d')
+    ),
+    'GSA': (
+        ('mode', None), ('mode_fix_type', None),
+    ) + tuple(('sv_id%02d' % i, None) for i in range(1, 13)) + (
+        ('pdop', None), ('hdop', None), ('vdop', None),
+    ),
+    'VTG': (
+        ('true_track', float), ('true_track_sym', None), ('mag_track', Decimal),
+        ('mag_track_sym', None), ('spd_over_grnd_kts', Decimal),
+        ('spd_over_grnd_kts_sym', None), ('spd_over_grnd_kmph', float),
+        ('spd_over_grnd_kmph_sym', None), ('faa_mode', None),
+    ),
+}
+
+# Precompute names and typed columns so decoding is a zip plus a few conversions
+_DECODERS = {
+    sentence: (
+        tuple(name for name, _ in fields),
+        tuple((name, conv) for name, conv in fields if conv is not None),
+    )
+    for sentence, fields in FIELD_TABLES.items()
+}
+
+def split_log_timestamp(line):
+    """Split a logged line into the sentence and the millisecond receive timestamp appended to it, if any"""
+    head, sep, last = line.rpartition(',')
+    if sep and last.isdigit() and len(last) >= 13:  # Looks like a millisecond timestamp
+        return head, int(last)
+    return line, None
+
+def sentence_body(sentence):
+    """Return the sentence between '$' and the checksum, None if the checksum is malformed
+
+    Raises ChecksumMismatch when the checksum does not match the content.
+    """
+    star = sentence.find('*')
+    if star == -1:
+        return sentence[1:]
+    checksum = sentence[star + 1:]
+    if len(checksum) != 2 or not _HEX_DIGITS.issuperset(checksum):
+        return None
+    expected = int(checksum, 16)
+    body = sentence[1:star]
+    if not body.isascii():
+        return None
+    if reduce(xor, body.encode('ascii'), 0) != expected:
+        raise ChecksumMismatch(f"checksum does not match: {expected:02X}")
+    return body
+
+def decode_sentence(sentence, timestamp=None):
+    """Decode a known NMEA sentence into a dict, or return None if it is not in the tables
+
+    Raises ChecksumMismatch when the sentence carries a checksum that does not match.
+    Anything unusual (proprietary or query sentences, malformed checksum, non-ASCII
+    data) returns None so the caller can fall back to pynmea2.
+    """
+    if len(sentence) < 7 or sentence[0] != '$' or sentence[6] != ',':
+        return None
+    header = sentence[1:6].upper()
+    decoder = _DECODERS.get(header[2:])
+    if decoder is None or header[0] == 'P' or not (header.isascii() and header.isalnum()):
+        return None
+
+    body = sentence_body(sentence)
+    if body is None:
+        return None
+
+    names, typed = decoder
+    values = body[6:].split(',')
+    if len(values) < len(names):
+        values += [''] * (len(names) - len(values))
+
+    data = dict(zip(names, values))
+    for name, conv in typed:
+        value = data[name]
+        if value == '':
+            data[name] = None
+        else:
+            try:
+                data[name] = conv(value)
+            except Exception:
+                pass
+
+    # Add sentence type and timestamp
+    data['sentence_type'] = header[2:]
+    if timestamp is not None:
+        data['timestamp_ms'] = timestamp
+    return data
@@ -0,0 +1,128 @@
+import os
+from contextlib import ExitStack
+from src.format_detector import MIN_CONFIDENCE, detect_format
+from src.columnar_writer import ColumnarWriter, open_record_writer
+from src.timestamp_index import remove_index
+from src.record_validator import VALIDATION_BLOCK_ROWS
+from src.rinex_reader import RINEX_SYSTEMS, frame_timestamps, iter_rinex_frames, iter_rinex3_frames
+from src.format_converter import iter_nmea_records, rinex_frame_to_columns, rinex_frame_to_lines
+from src.location_extractor import (
+    candidate_locations, iter_valid_locations, new_extraction_counts, print_extraction_summary,
+    rinex_frame_to_locations,
+)
+
+def iter_rinex_stage(input_file, counts, intermediate=None, start=0):
+    """Parse RINEX observation blocks into candidate location records"""
+    if start:
+        # Resuming at an epoch record of a grown RINEX 3 file
+        frames = iter_rinex3_frames(input_file, use=RINEX_SYSTEMS, start=start)
+    else:
+        frames = iter_rinex_frames(input_file, use=RINEX_SYSTEMS)
+    for frame in frames:
+        counts['observations'] += len(frame)
+        if intermediate is not None:
+            if isinstance(intermediate, ColumnarWriter):
+                intermediate.write_frame(rinex_frame_to_columns(frame))
+            else:
+                intermediate.write_lines(rinex_frame_to_lines(frame), frame_timestamps(frame) if len(frame) else None)
+        yield from rinex_frame_to_locations(frame)
+
+def iter_nmea_stage(input_file, counts, intermediate=None, start=0):
+    """Decode NMEA sentences and hand the records to the epoch assembler as they are read"""
+    nmea_counts = {'total': 0, 'valid': 0, 'gga': 0, 'rmc': 0}
+    timed = {'records': 0, 'timestamped': 0}
+    records = count_timestamped(iter_nmea_records(input_file, nmea_counts, start), timed)
+    if intermediate is not None:
+        records = tee_records(records, intermediate)
+    yield from candidate_locations(records, counts)
+    counts['lines'] += nmea_counts['total']
+    counts['sentences'] += nmea_counts['valid']
+    check_timestamped(timed)
+
+def check_timestamped(timed):
+    """Raise unless at least half of the records counted so far have a timestamp
+
+    Same acceptance rule as validate_jsonl for the two-step conversion, logs
+    without receive timestamps are left to the LLM fallback.
+    """
+    if timed['timestamped'] == 0 or timed['timestamped'] / timed['records'] < 0.5:
+        raise ValueError(f"Only {timed['timestamped']} of {timed['records']} NMEA records have a timestamp")
+
+def count_timestamped(records, timed, block_rows=VALIDATION_BLOCK_ROWS):
+    """Pass records through while counting those with a timestamp_ms
+
+    The first block_rows records are held back and checked first, so a log
+    without receive timestamps fails before anything is written.
+    """
+    held = []
+    for record in records:
+        timed['records'] += 1
+        if 'timestamp_ms' in record:
+            timed['timestamped'] += 1
+        if held is None:
+            yield record
+            continue
+        held.append(record)
+        if len(held) >= block_rows:
+            check_timestamped(timed)
+            yield from held
+            held = None
+    if held:
+        check_timestamped(timed)
+        yield from held
+
+def tee_records(records, writer):
+    """Pass records through while writing each one to the intermediate output"""
+    for record in records:
+        writer.write(record)
+        yield record
+
+# Formats that can be converted and extracted in one pass, and their first stage
+FUSED_STAGES = {
+    'RINEX': iter_rinex_stage,
+    'NMEA': iter_nmea_stage,
+}
+
+def run_fused_pipeline(input_file, location_file, output_format='jsonl', intermediate_file=None,
+                       start=0, append=False):
+    """Convert a file and extract its location records in one streaming pass
+
+    Records flow from the converter straight into the extractor, so the
+    converted output is only written when intermediate_file is given (e.g. for
+    debugging or auditing the converter). start and append process a grown
+    file from a byte offset onwards, adding to the existing outputs (see
+    incremental). Returns location_file, or None when the format has no fused
+    path or no valid location record was found.
+    """
+    file_format, confidence = detect_format(input_file)
+    stage = FUSED_STAGES.get(file_format) if confidence >= MIN_CONFIDENCE else None
+    if stage is None:
+        return None
+
+    print(f"Converting and extracting {file_format} data in one pass: {input_file}")
+    counts = new_extraction_counts()
+    try:
+        with ExitStack() as stack:
+            intermediate = None
+            if intermediate_file:
+                intermediate = stack.enter_context(
+                    open_record_writer(intermediate_file, output_format, index=True, append=append)
+                )
+            writer = stack.enter_context(open_record_writer(location_file, output_format, index=True, append=append))
+            for record in iter_valid_locations(stage(input_file, counts, intermediate, start), counts):
+                writer.write(record)
+    except Exception as e:
+        print(f"Fused pipeline failed: {str(e)}")
+        for path in (location_file, intermediate_file):
+            if path and os.path.exists(path):
+                os.remove(path)
+            if path:
+                remove_index(path)
+        return None
+
+    print_extraction_summary(counts)
+    if counts['valid'] > 0 or append:
+        return location_file
+    os.remove(location_file)
+    remove_index(location_file)
+    return None
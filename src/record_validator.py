@@ -0,0 +1,144 @@
+import numpy as np
+
+# Records validated per batch when streaming a file
+VALIDATION_BLOCK_ROWS = 10000
+
+# Plausible ranges of location fields, checked when a value is present
+RANGE_RULES = {
+    'altitude': (-1000, 9000),  # Dead Sea to Mount Everest, in meters
+    'hdop': (0, 50),
+    'pdop': (0, 50),
+    'num_satellites': (0, 50),
+    'speed': (0, 278),  # About 1000 km/h in m/s
+    'course': (0, 360),  # Degrees
+}
+
+# Raw measurements of a RINEX signal record, any one of them makes it usable
+OBSERVATION_FIELDS = ('pseudorange', 'carrier_phase', 'doppler', 'signal_strength')
+
+# Fields that can give a record its position
+POSITION_FIELDS = ('latitude', 'longitude') + OBSERVATION_FIELDS
+
+# Standardized location records: a timestamp, a position and values within RANGE_RULES
+LOCATION_RULES = {
+    'required': ('timestamp_ms',),
+    'numeric': ('latitude', 'longitude') + tuple(RANGE_RULES),
+    'ranges': RANGE_RULES,
+    'position': True,
+}
+
+# Marks a field missing from a record, as opposed to present with a None value
+_MISSING = object()
+
+def _parse_floats(values):
+    """Parse values one by one, flagging those that are not numbers"""
+    column = np.full(len(values), np.nan)
+    non_numeric = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        if value is None:
+            continue
+        try:
+            column[i] = float(value)
+        except (ValueError, TypeError):
+            non_numeric[i] = True
+    return column, non_numeric
+
+def records_to_columns(records, fields):
+    """Gather fields of a block of records into float columns
+
+    Returns (is_record, columns, present, non_numeric). Columns hold NaN where
+    a value is missing, None or not a number; present tells a missing key apart
+    from a None value, non_numeric flags values that do not parse as numbers.
+    """
+    size = len(records)
+    is_record = np.fromiter((isinstance(record, dict) for record in records), dtype=bool, count=size)
+    dicts = [record if isinstance(record, dict) else {} for record in records]
+
+    columns, present, non_numeric = {}, {}, {}
+    for field in fields:
+        values = [record.get(field, _MISSING) for record in dicts]
+        present[field] = np.fromiter((value is not _MISSING for value in values), dtype=bool, count=size)
+        values = [None if value is _MISSING else value for value in values]
+        try:
+            # Fast path: numpy converts numbers, numeric strings and None (to NaN) in one call
+            column = np.array(values, dtype=np.float64)
+            if column.shape != (size,):
+                raise ValueError("nested values")
+            columns[field] = column
+            non_numeric[field] = np.zeros(size, dtype=bool)
+        except (ValueError, TypeError):
+            columns[field], non_numeric[field] = _parse_floats(values)
+    return is_record, columns, present, non_numeric
+
+def _position_mask(columns, present):
+    """Coordinates within range, or at least one raw measurement of a signal
+
+    Many signals are tracked without a carrier phase lock (code only, or
+    Doppler and SNR only), so no single observable is required.
+    """
+    lat, lon = columns['latitude'], columns['longitude']
+    coordinates = (lat >= -90) & (lat <= 90) & (lon >= -180) & (lon <= 180)
+    measurements = np.logical_or.reduce([
+        present[field] & ~np.isnan(columns[field]) for field in OBSERVATION_FIELDS
+    ])
+    return coordinates | measurements
+
+def validate_batch(records, required=(), numeric=(), ranges=None, any_of=(), position=False):
+    """Validate a block of records with vectorized masks
+
+    required: keys every record must have; numeric: fields that must parse as
+    numbers when present and not None; ranges: {field: (min, max)} for present
+    values; any_of: at least one of these keys must be present; position: a
+    valid position is required (see _position_mask).
+
+    Returns (accept mask, {rejection reason: count}). A rejected record is
+    counted under the first rule it fails.
+    """
+    ranges = ranges or {}
+    fields = set(required) | set(numeric) | set(ranges) | set(any_of)
+    if position:
+        fields |= set(POSITION_FIELDS)
+    is_record, columns, present, non_numeric = records_to_columns(records, sorted(fields))
+
+    checks = [('not_a_record', ~is_record)]
+    checks += [(f"missing_{field}", ~present[field]) for field in required]
+    if numeric:
+        checks.append(('non_numeric', np.logical_or.reduce([non_numeric[field] for field in numeric])))
+    if any_of:
+        checks.append(('no_positioning_fields', ~np.logical_or.reduce([present[field] for field in any_of])))
+    if position:
+        checks.append(('no_position', ~_position_mask(columns, present)))
+    for field, (low, high) in ranges.items():
+        # NaN (missing or None) compares False, so absent values pass
+        checks.append((f"{field}_out_of_range", (columns[field] < low) | (columns[field] > high)))
+
+    accept = np.ones(len(records), dtype=bool)
+    reasons = {}
+    for reason, failed in checks:
+        failed = failed & accept
+        count = int(np.count_nonzero(failed))
+        if count:
+            reasons[reason] = count
+            accept &= ~failed
+    return accept, reasons
+
+def validate_location_batch(records):
+    """Validate a block of standardized location records"""
+    return validate_batch(records, **LOCATION_RULES)
+
+def merge_reasons(total, reasons):
+    """Add the rejection counts of one batch to running totals"""
+    for reason, count in reasons.items():
+        total[reason] = total.get(reason, 0) + count
+    return total
+
+def iter_blocks(items, block_rows=VALIDATION_BLOCK_ROWS):
+    """Group an iterable into lists of at most block_rows items"""
+    block = []
+    for item in items:
+        block.append(item)
+        if len(block) >= block_rows:
+            yield block
+            block = []
+    if block:
+        yield block
@@ -0,0 +1,196 @@
+import math
+import os
+from src.columnar_writer import OUTPUT_EXTENSIONS, open_record_writer
+from src.location_extractor import iter_input_records
+from src.timestamp_index import index_path, remove_index
+
+# Resampling methods selectable per upload
+RESAMPLE_METHODS = ('nearest', 'linear')
+
+# Epochs further apart than this are a gap, no records are interpolated across it
+MAX_INTERPOLATION_GAP_MS = 5000
+
+# Fields interpolated between two epochs, the others are taken from the nearer epoch
+INTERPOLATED_FIELDS = ('latitude', 'longitude', 'altitude', 'speed')
+
+def iter_epochs(records, counts):
+    """Group consecutive records with the same timestamp_ms, dropping records that go back in time"""
+    epoch_time, epoch = None, []
+    for record in records:
+        timestamp = record.get('timestamp_ms') if isinstance(record, dict) else None
+        if not isinstance(timestamp, (int, float)):
+            counts['skipped'] += 1
+            continue
+        if timestamp == epoch_time:
+            epoch.append(record)
+            continue
+        if epoch_time is not None and timestamp < epoch_time:
+            counts['out_of_order'] += 1
+            continue
+        if epoch:
+            yield epoch_time, epoch
+        epoch_time, epoch = timestamp, [record]
+    if epoch:
+        yield epoch_time, epoch
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _can_interpolate(before, after):
+    """Single-record epochs with a position at both ends (RINEX epochs hold one record per signal)"""
+    return (
+        len(before) == 1 and len(after) == 1
+        and all(_is_number(before[0].get(f)) and _is_number(after[0].get(f)) for f in ('latitude', 'longitude'))
+    )
+
+def interpolate_record(before, after, t0, t1, target):
+    """Linear interpolation of a location record at target, between the records at t0 and t1"""
+    weight = (target - t0) / (t1 - t0)
+    record = dict(before if weight < 0.5 else after)
+    record['timestamp_ms'] = target
+    for field in INTERPOLATED_FIELDS:
+        a, b = before.get(field), after.get(field)
+        if _is_number(a) and _is_number(b):
+            record[field] = a + (b - a) * weight
+    a, b = before.get('course'), after.get('course')
+    if _is_number(a) and _is_number(b):
+        # Shortest way around the circle, e.g. 350 -> 10 passes through 0
+        delta = (b - a + 180) % 360 - 180
+        record['course'] = (a + delta * weight) % 360
+    return record
+
+class Resampler:
+    """Resample a time-ordered location stream onto a fixed-rate grid in one pass
+
+    Target times are multiples of the period since the Unix epoch, so outputs
+    of different files line up. 'nearest' keeps the epoch closest to each
+    target (within half a period) with its original records, which decimates
+    a high-rate log. 'linear' interpolates position, altitude, speed and course
+    at each target between the two surrounding epochs, leaving out targets
+    outside the log or in gaps longer than MAX_INTERPOLATION_GAP_MS; epochs
+    that cannot be interpolated (several records, no position) fall back to
+    the nearest epoch. Only the previous epoch is kept, so memory does not
+    grow with the input.
+    """
+
+    def __init__(self, rate_hz, method='nearest', max_gap_ms=MAX_INTERPOLATION_GAP_MS):
+        if rate_hz <= 0:
+            raise ValueError("Sample rate must be positive")
+        if method not in RESAMPLE_METHODS:
+            raise ValueError(f"Unknown resampling method: {method}")
+        self.period = 1000.0 / rate_hz
+        self.method = method
+        self.max_gap_ms = max_gap_ms
+        self._previous = None
+        self._emitted = None
+        self._step = None
+
+    def _target(self):
+        return round(self._step * self.period)
+
+    def _nearest(self, target, current):
+        """Epoch closest to target among the previous and current one, None outside half a period"""
+        best = None
+        for epoch in (self._previous, current):
+            if epoch is None:
+                continue
+            distance = abs(epoch[0] - target)
+            if distance <= self.period / 2 and (best is None or distance < abs(best[0] - target)):
+                best = epoch
+        return best
+
+    def _emit_epoch(self, epoch):
+        # Each input epoch is written at most once
+        if epoch is None or epoch is self._emitted:
+            return []
+        self._emitted = epoch
+        return epoch[1]
+
+    def add(self, timestamp, records):
+        """Add one epoch and return the output records for the targets up to its time"""
+        current = (timestamp, records)
+        if self._step is None:
+            self._step = math.ceil((timestamp - self.period / 2) / self.period)
+        output = []
+        while self._target() <= timestamp:
+            target = self._target()
+            previous = self._previous
+            if self.method == 'linear' and _can_interpolate(records, records):
+                if target == timestamp:
+                    output.append(dict(records[0]))
+                elif (
+                    previous is not None and previous[0] < target
+                    and timestamp - previous[0] <= self.max_gap_ms and _can_interpolate(previous[1], records)
+                ):
+                    output.append(interpolate_record(previous[1][0], records[0], previous[0], timestamp, target))
+            else:
+                output.extend(self._emit_epoch(self._nearest(target, current)))
+            self._step += 1
+        self._previous = current
+        return output
+
+    def flush(self):
+        """Return the records for the targets after the last epoch"""
+        output = []
+        if self._previous is not None:
+            # Targets past the last epoch can only take it as their nearest epoch
+            while self._target() - self._previous[0] <= self.period / 2:
+                if self.method == 'nearest' or not _can_interpolate(self._previous[1], self._previous[1]):
+                    output.extend(self._emit_epoch(self._previous))
+                self._step += 1
+        self._previous = None
+        return output
+
+def new_resample_counts():
+    """Counters for one resampling pass"""
+    return {'input': 0, 'epochs': 0, 'output': 0, 'skipped': 0, 'out_of_order': 0}
+
+def iter_resampled(records, rate_hz, method='nearest', counts=None):
+    """Stream location records resampled to rate_hz (see Resampler)"""
+    counts = counts if counts is not None else new_resample_counts()
+    resampler = Resampler(rate_hz, method)
+
+    def counted(records):
+        for record in records:
+            counts['input'] += 1
+            yield record
+
+    for timestamp, epoch in iter_epochs(counted(records), counts):
+        counts['epochs'] += 1
+        for record in resampler.add(timestamp, epoch):
+            counts['output'] += 1
+            yield record
+    for record in resampler.flush():
+        counts['output'] += 1
+        yield record
+
+def resample_location_file(input_file, output_file=None, rate_hz=1.0, method='nearest', output_format='jsonl'):
+    """Resample a location output (JSONL or Parquet) to a fixed rate and return the output file, None on failure
+
+    output_file may be the input file itself, it is then replaced once the
+    resampled records are complete.
+    """
+    if output_file is None:
+        output_file = os.path.splitext(input_file)[0] + f".{rate_hz:g}hz" + OUTPUT_EXTENSIONS[output_format]
+    temp_file = output_file + '.resampling'
+    counts = new_resample_counts()
+    try:
+        print(f"Resampling {input_file} to {rate_hz:g} Hz ({method})")
+        with open_record_writer(temp_file, output_format, index=True) as writer:
+            for record in iter_resampled(iter_input_records(input_file), rate_hz, method, counts):
+                writer.write(record)
+        print(f"Resampled {counts['input']} records in {counts['epochs']} epochs to {counts['output']} records")
+        if counts['skipped'] or counts['out_of_order']:
+            print(f"- Skipped {counts['skipped']} records without timestamp, {counts['out_of_order']} out of order")
+        if counts['output'] == 0:
+            raise ValueError("No records left after resampling")
+        os.replace(temp_file, output_file)
+        if os.path.exists(index_path(temp_file)):
+            os.replace(index_path(temp_file), index_path(output_file))
+        return output_file
+    except Exception as e:
+        print(f"Error resampling location data: {str(e)}")
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        remove_index(temp_file)
+        return None
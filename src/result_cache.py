@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from src.stream_reader import CHUNK_SIZE
+from src.timestamp_index import index_path, remove_index
+
+# Bump whenever converter or extractor output changes, so older cache entries are ignored
+PIPELINE_VERSION = '5'
+
+# Default size bound of the result cache, least recently used entries are evicted first
+CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Per-entry manifest listing the cached files
+MANIFEST_NAME = 'entry.json'
+
+def save_and_hash(stream, file_path, chunk_size=CHUNK_SIZE):
+    """Copy an upload stream to file_path in chunks and return its SHA-256 hex digest"""
+    digest = hashlib.sha256()
+    with open(file_path, 'wb') as f:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+def cache_key(content_hash, options=None):
+    """Key results by content hash, pipeline version and processing options"""
+    key = json.dumps({
+        'content': content_hash,
+        'version': PIPELINE_VERSION,
+        'options': options or {},
+    }, sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def _link_or_copy(source, destination):
+    """Hard link when possible (same filesystem), copy otherwise"""
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+def _link_with_index(source, destination, link=True):
+    """Link or copy a file together with its timestamp sidecar index, if it has one"""
+    place = _link_or_copy if link else _copy
+    place(source, destination)
+    if os.path.exists(index_path(source)):
+        place(index_path(source), index_path(destination))
+    else:
+        remove_index(destination)
+
+def _copy(source, destination):
+    """Copy into a new file, so changing the copy never changes a cached (linked) file"""
+    if os.path.exists(destination):
+        os.remove(destination)
+    shutil.copyfile(source, destination)
+
+class ResultCache:
+    """Size-bounded, content-addressed store of pipeline outputs
+
+    Each entry is a directory named by its cache key, holding the output files
+    (with their timestamp indexes) and a manifest mapping roles (e.g. 'converted', 'location') to file names.
+    The manifest mtime records the last use for LRU eviction.
+    """
+
+    def __init__(self, folder, max_bytes=CACHE_MAX_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        os.makedirs(folder, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.folder, key)
+
+    def lookup(self, key):
+        """Return the manifest of a cached entry (marking it as used), or None"""
+        manifest_path = os.path.join(self._entry_dir(key), MANIFEST_NAME)
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+            os.utime(manifest_path)
+        except (OSError, ValueError):
+            return None
+        # Entries whose files went missing are treated as misses
+        files = manifest.get('files', {})
+        if not all(os.path.exists(os.path.join(self._entry_dir(key), name)) for name in files.values()):
+            return None
+        return manifest
+
+    def restore(self, key, manifest, role, destination, link=True):
+        """Place a cached file at destination, returning False if the role is not cached
+
+        link=False always copies, for restored files that will be modified.
+        """
+        name = manifest.get('files', {}).get(role)
+        if name is None:
+            return False
+        _link_with_index(os.path.join(self._entry_dir(key), name), destination, link)
+        return True
+
+    def store(self, key, files, metadata=None):
+        """Cache output files given as {role: path}, merging with an existing entry"""
+        files = {role: path for role, path in files.items() if path and os.path.exists(path)}
+        if not files:
+            return False
+
+        # Build the entry next to the cache and rename it into place, so
+        # concurrent workers never see a half-written entry
+        staging = os.path.join(self.folder, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        try:
+            manifest = self.lookup(key) or {'files': {}}
+            for role, name in manifest['files'].items():
+                if role not in files:
+                    _link_with_index(os.path.join(self._entry_dir(key), name), os.path.join(staging, name))
+            for role, path in files.items():
+                name = f"{role}{os.path.splitext(path)[1]}"
+                _link_with_index(path, os.path.join(staging, name))
+                manifest['files'][role] = name
+            manifest.update(metadata or {})
+            manifest['created'] = time.time()
+            with open(os.path.join(staging, MANIFEST_NAME), 'w') as f:
+                json.dump(manifest, f)
+
+            entry = self._entry_dir(key)
+            if os.path.exists(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                # Another worker stored the same entry first, keep theirs
+                return False
+        finally:
+            if os.path.exists(staging):
+                shutil.rmtree(staging, ignore_errors=True)
+
+        self.evict()
+        return True
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for key in os.listdir(self.folder):
+            entry = self._entry_dir(key)
+            manifest_path = os.path.join(entry, MANIFEST_NAME)
+            if key.startswith('.tmp-'):
+                continue
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry)
+                )
+                entries.append((os.path.getmtime(manifest_path), size, entry))
+            except OSError:
+                # Entries without a manifest yet, or removed by another worker
+                continue
+            total += size
+
+        entries.sort()
+        while entries and total > self.max_bytes:
+            _, size, entry = entries.pop(0)
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -0,0 +1,107 @@
+import os
+import uuid
+from datetime import datetime, timezone
+from src.columnar_writer import OUTPUT_EXTENSIONS, is_parquet_file, pq
+from src.timestamp_index import iter_window
+
+# Record batch size when scanning the matching row groups of a Parquet result
+QUERY_BATCH_ROWS = 65536
+
+def is_result_file(filename):
+    """Whether a file in the upload folder is a processing result (converted, location or satellite records)
+
+    Raw uploads are kept under a UUID name until they are processed, and
+    other files (logs, notes, indexes) are not records, so neither is queried.
+    """
+    stem, extension = os.path.splitext(filename)
+    if extension.lower() not in OUTPUT_EXTENSIONS.values():
+        return False
+    try:
+        uuid.UUID(stem)
+    except ValueError:
+        return True
+    return False
+
+def parse_time_ms(value):
+    """Parse a query time given as epoch milliseconds or an ISO 8601 string (UTC when no offset is given)"""
+    if value is None or value == '':
+        return None
+    value = value.strip()
+    if value.lstrip('-').isdigit():
+        return int(value)
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return round(parsed.timestamp() * 1000)
+
+def parse_bbox(value):
+    """Parse 'min_lat,min_lon,max_lat,max_lon' into a tuple, None when not given"""
+    if not value:
+        return None
+    bbox = tuple(float(part) for part in value.split(','))
+    if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        raise ValueError("bbox must be min_lat,min_lon,max_lat,max_lon")
+    return bbox
+
+def parse_fields(value):
+    """Parse a comma separated field list, None for all fields"""
+    if not value:
+        return None
+    return [field.strip() for field in value.split(',') if field.strip()]
+
+def in_bbox(record, bbox):
+    """Whether a record's latitude and longitude fall inside the bounding box"""
+    latitude, longitude = record.get('latitude'), record.get('longitude')
+    if not isinstance(latitude, (int, float)) or not isinstance(longitude, (int, float)):
+        return False
+    return bbox[0] <= latitude <= bbox[2] and bbox[1] <= longitude <= bbox[3]
+
+def iter_parquet_window(file_path, start_ms=None, end_ms=None):
+    """Yield Parquet rows within a time window, skipping row groups by their timestamp_ms statistics
+
+    Without a window every row is returned, with or without timestamp_ms.
+    """
+    parquet_file = pq.ParquetFile(file_path, memory_map=True)
+    if start_ms is None and end_ms is None:
+        for batch in parquet_file.iter_batches(batch_size=QUERY_BATCH_ROWS):
+            yield from batch.to_pylist()
+        return
+    names = parquet_file.schema_arrow.names
+    if 'timestamp_ms' not in names:
+        return
+    column = names.index('timestamp_ms')
+    groups = []
+    for i in range(parquet_file.num_row_groups):
+        stats = parquet_file.metadata.row_group(i).column(column).statistics
+        if stats is not None and stats.has_min_max:
+            if (start_ms is not None and stats.max < start_ms) or (end_ms is not None and stats.min > end_ms):
+                continue
+        groups.append(i)
+    if not groups:
+        return
+    for batch in parquet_file.iter_batches(batch_size=QUERY_BATCH_ROWS, row_groups=groups):
+        for record in batch.to_pylist():
+            timestamp = record.get('timestamp_ms')
+            if timestamp is None:
+                continue
+            if (start_ms is None or timestamp >= start_ms) and (end_ms is None or timestamp <= end_ms):
+                yield record
+
+def query_records(file_path, start_ms=None, end_ms=None, bbox=None, fields=None):
+    """Yield the records of a processed result inside a time window and bounding box
+
+    JSONL results are read through their timestamp index and Parquet results
+    through their row group statistics, so only the blocks overlapping the
+    window are read. Without start_ms and end_ms every record is returned,
+    timed or not. fields limits each record to the given keys.
+    """
+    if is_parquet_file(file_path):
+        records = iter_parquet_window(file_path, start_ms, end_ms)
+    else:
+        records = iter_window(file_path, start_ms, end_ms)
+    for record in records:
+        if bbox is not None and not in_bbox(record, bbox):
+            continue
+        if fields is not None:
+            record = {field: record[field] for field in fields if field in record}
+        yield record
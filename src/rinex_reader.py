@@ -0,0 +1,227 @@
+from datetime import datetime
+import math
+import os
+import georinex as gr
+import numpy as np
+import pandas as pd
+
+# Satellite systems converted by default: GPS, GLONASS, Galileo, BeiDou, QZSS
+RINEX_SYSTEMS = ['G', 'R', 'E', 'C', 'J']
+
+# Epochs gathered into one DataFrame block by iter_rinex3_frames
+EPOCHS_PER_FRAME = 500
+
+# Each observation is F14.3 followed by the LLI and SSI flags
+OBS_WIDTH = 16
+
+def read_rinex3_header(input_file):
+    """Parse a RINEX 3 observation header, or return None if the file needs georinex"""
+    header = {'obs_types': {}, 'header_bytes': 0}
+    last_system = None
+    with open(input_file, 'rb') as f:
+        for raw in f:
+            header['header_bytes'] += len(raw)
+            line = raw.decode('latin1').rstrip('\r\n')
+            label = line[60:80].strip()
+
+            if label == 'CRINEX VERS   / TYPE':
+                # Hatanaka-compressed bodies are left to georinex
+                return None
+            elif label == 'RINEX VERSION / TYPE':
+                try:
+                    header['version'] = float(line[:9])
+                except ValueError:
+                    return None
+                # Only RINEX 3.x observation files are read natively
+                if not 3 <= header['version'] < 4 or line[20:21] != 'O':
+                    return None
+            elif label == 'SYS / # / OBS TYPES':
+                # Continuation lines leave the system and count blank
+                if line[0] != ' ':
+                    last_system = line[0]
+                    header['obs_types'][last_system] = []
+                if last_system is not None:
+                    header['obs_types'][last_system].extend(line[7:60].split())
+            elif label == 'END OF HEADER':
+                break
+        else:
+            return None
+
+    if 'version' not in header or not header['obs_types']:
+        return None
+    return header
+
+def parse_epoch_time(line):
+    """Convert a '>' epoch line to datetime (same rounding as georinex)"""
+    return datetime(
+        int(line[2:6]), int(line[7:9]), int(line[10:12]),
+        hour=int(line[13:15]), minute=int(line[16:18]), second=int(line[19:21]),
+        microsecond=int(float(line[19:29]) % 1 * 1000000),
+    )
+
+def parse_observations(line, count):
+    """Parse the fixed-width observation values that follow the satellite ID"""
+    values = []
+    for i in range(count):
+        start = 3 + i * OBS_WIDTH
+        field = line[start:start + 14].strip()
+        if field:
+            try:
+                values.append(float(field))
+                continue
+            except ValueError:
+                pass
+        values.append(math.nan)
+    return values
+
+def iter_rinex3_epochs(input_file, header=None, use=None, start=None, end=None):
+    """Yield (time, [(sv, values)]) one epoch at a time from a RINEX 3 observation file
+
+    Values follow the header's SYS / # / OBS TYPES order for each satellite's system.
+    Event records (flags 2-6) are skipped, so only observation epochs are returned.
+    start/end restrict reading to epochs whose record starts in a byte range, see
+    split_epoch_ranges.
+    """
+    if header is None:
+        header = read_rinex3_header(input_file)
+        if header is None:
+            raise ValueError(f"{input_file} is not a RINEX 3 observation file")
+    obs_types = header['obs_types']
+    systems = set(use) if use else set(obs_types)
+
+    with open(input_file, 'rb') as f:
+        position = header['header_bytes'] if start is None else start
+        f.seek(position)
+        while end is None or position < end:
+            raw = f.readline()
+            if not raw:
+                break
+            position += len(raw)
+            line = raw.decode('latin1').rstrip('\r\n')
+            if not line.startswith('>'):
+                # Garbage between epochs, keep looking for the next epoch record
+                continue
+
+            try:
+                flag = int(line[31:32] or 0)
+                count = int(line[32:35])
+            except ValueError:
+                continue
+
+            satellites = []
+            for _ in range(count):
+                raw = f.readline()
+                position += len(raw)
+                if flag > 1:
+                    continue
+                record = raw.decode('latin1').rstrip('\r\n')
+                system = record[:1]
+                if system not in systems or system not in obs_types:
+                    continue
+                sv = record[:3].replace(' ', '0')
+                satellites.append((sv, parse_observations(record, len(obs_types[system]))))
+
+            if flag > 1:
+                continue
+            try:
+                time = parse_epoch_time(line)
+            except ValueError:
+                continue
+
+            satellites.sort(key=lambda item: item[0])
+            yield time, satellites
+
+def split_epoch_ranges(input_file, header, parts):
+    """Split the observation body into at most `parts` byte ranges that start at '>' epoch records"""
+    size = os.path.getsize(input_file)
+    bounds = [header['header_bytes']]
+    body = size - bounds[0]
+    with open(input_file, 'rb') as f:
+        for i in range(1, parts):
+            position = bounds[0] + body * i // parts
+            if position <= bounds[-1]:
+                continue
+            # Skip the partial line, then move the boundary to the next epoch record
+            f.seek(position)
+            position += len(f.readline())
+            while True:
+                raw = f.readline()
+                if not raw or raw.startswith(b'>'):
+                    break
+                position += len(raw)
+            if bounds[-1] < position < size:
+                bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def observation_columns(header, use=None):
+    """Union of observation codes for the selected systems, in header order"""
+    columns = []
+    for system, codes in header['obs_types'].items():
+        if use and system not in use:
+            continue
+        for code in codes:
+            if code not in columns:
+                columns.append(code)
+    return columns
+
+def epochs_to_frame(epochs, header, columns):
+    """Build a (time, sv, observation...) DataFrame from a list of parsed epochs"""
+    index = {code: i for i, code in enumerate(columns)}
+    positions = {
+        system: [index[code] for code in codes]
+        for system, codes in header['obs_types'].items()
+        if all(code in index for code in codes)
+    }
+    times, svs, rows = [], [], []
+    for time, satellites in epochs:
+        for sv, values in satellites:
+            row = [math.nan] * len(columns)
+            for position, value in zip(positions[sv[0]], values):
+                row[position] = value
+            times.append(time)
+            svs.append(sv)
+            rows.append(row)
+
+    df = pd.DataFrame(rows, columns=columns, dtype=float)
+    df.insert(0, 'sv', svs)
+    df.insert(0, 'time', pd.to_datetime(times))
+    return df
+
+def iter_rinex3_frames(input_file, header=None, use=None, epochs_per_frame=EPOCHS_PER_FRAME,
+                       start=None, end=None):
+    """Yield DataFrame blocks of a few hundred epochs from a RINEX 3 observation file"""
+    if header is None:
+        header = read_rinex3_header(input_file)
+        if header is None:
+            raise ValueError(f"{input_file} is not a RINEX 3 observation file")
+    columns = observation_columns(header, use)
+
+    batch = []
+    for epoch in iter_rinex3_epochs(input_file, header, use, start, end):
+        batch.append(epoch)
+        if len(batch) >= epochs_per_frame:
+            yield epochs_to_frame(batch, header, columns)
+            batch = []
+    if batch:
+        yield epochs_to_frame(batch, header, columns)
+
+def frame_timestamps(df):
+    """timestamp_ms of each row of a RINEX block, from its epoch time"""
+    return pd.to_datetime(df['time']).to_numpy().astype('datetime64[ms]').astype(np.int64)
+
+def iter_rinex_frames(input_file, use=None, block_rows=50000):
+    """Yield observation DataFrame blocks, epoch by epoch for RINEX 3 and via georinex otherwise"""
+    header = read_rinex3_header(input_file)
+    if header is not None:
+        print("Reading RINEX 3 observations epoch by epoch...")
+        yield from iter_rinex3_frames(input_file, header, use=use)
+        return
+
+    # RINEX 2, compressed or unusual files still go through georinex
+    print("Loading RINEX file with georinex...")
+    obs_data = gr.load(input_file, use=use) if use else gr.load(input_file)
+    df = obs_data.to_dataframe().reset_index()
+    print(f"Found {len(df)} RINEX records")
+    for start in range(0, len(df), block_rows):
+        yield df.iloc[start:start + block_rows]
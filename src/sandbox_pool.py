@@ -0,0 +1,304 @@
+import atexit
+import importlib
+import json
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Idle sandbox processes kept started and imported, ready for the next generated code (0 starts one per job)
+SANDBOX_POOL_SIZE = int(os.getenv('SANDBOX_POOL_SIZE', '2'))
+
+# Wall-clock seconds generated code may run on a whole file
+SANDBOX_TIMEOUT = float(os.getenv('SANDBOX_TIMEOUT', '900'))
+
+# CPU seconds generated code may use on a whole file
+SANDBOX_CPU_SECONDS = int(os.getenv('SANDBOX_CPU_SECONDS', '900'))
+
+# Address space of a sandbox process in MB, 0 for no limit
+SANDBOX_MEMORY_MB = int(os.getenv('SANDBOX_MEMORY_MB', '4096'))
+
+# Seconds a new sandbox may take to start and import its modules
+SANDBOX_START_TIMEOUT = 120
+
+# Seconds a sandbox may take to report a killed job before it is replaced
+SANDBOX_EXIT_TIMEOUT = 5
+
+# Seconds between checks of the cancel event of a running job
+CANCEL_POLL_SECONDS = 0.2
+
+# Imported by every sandbox before it takes a job, so attempts do not pay for them
+PRELOAD_MODULES = (
+    'numpy', 'pandas', 'georinex', 'pynmea2',
+    'src.format_converter', 'src.location_extractor', 'src.gnss_processor',
+)
+
+# Folder the sandboxes run in, so the src package is importable
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class SandboxError(Exception):
+    """Generated code could not be run to completion in a sandbox"""
+
+class _OutputStream:
+    """sys.stdout of a sandbox, sends each printed line to the pool"""
+
+    def __init__(self, send):
+        self.send = send
+        self.buffer = ''
+
+    def write(self, text):
+        self.buffer += text
+        while '\n' in self.buffer:
+            line, self.buffer = self.buffer.split('\n', 1)
+            self.send({'event': 'output', 'line': line})
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            self.send({'event': 'output', 'line': self.buffer})
+            self.buffer = ''
+
+def apply_limits(cpu_seconds, memory_mb):
+    """Limit the CPU time and address space of the current process (Unix only)"""
+    if resource is None:
+        return
+    if cpu_seconds:
+        used = int(resource.getrusage(resource.RUSAGE_SELF).ru_utime + resource.getrusage(resource.RUSAGE_SELF).ru_stime)
+        resource.setrlimit(resource.RLIMIT_CPU, (used + cpu_seconds, used + cpu_seconds + 5))
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def run_job(job, send):
+    """Run one job in the current process, sending its output and its result or error"""
+    sys.stdout = _OutputStream(send)
+    try:
+        apply_limits(job.get('cpu_seconds'), job.get('memory_mb'))
+        send({'event': 'started', 'pid': os.getpid()})
+        module, name = job['target'].split(':')
+        value = getattr(importlib.import_module(module), name)(*job['args'])
+        sys.stdout.flush()
+        send({'event': 'result', 'value': value})
+    except BaseException as e:
+        sys.stdout.flush()
+        send({'event': 'error', 'error': f"{type(e).__name__}: {str(e)}"})
+
+def exit_code(status):
+    """Exit code of a waitpid status, negative signal number when the child was killed (os.waitstatus_to_exitcode needs Python 3.9)"""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+def worker_main():
+    """Body of a sandbox process: preload, then run the jobs read from stdin
+
+    A job is one JSON line {target: 'module:function', args, cpu_seconds,
+    memory_mb}. Each job runs in a child forked from the preloaded sandbox,
+    so it starts in milliseconds and its limits, memory and crashes stay with
+    the child. Messages go back as JSON lines on the original stdout:
+    'started' with the child's pid, one 'output' per printed line, 'result'
+    or 'error', then 'exit' with the child's exit code once it is gone.
+    Stray output of native code goes to stderr. Without fork (Windows) the
+    sandbox runs a single job itself and exits.
+    """
+    channel = os.fdopen(os.dup(sys.stdout.fileno()), 'w', buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    lock = threading.Lock()
+
+    def send(message):
+        with lock:
+            channel.write(json.dumps(message, default=str) + '\n')
+            channel.flush()
+
+    for module in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"Could not preload {module}: {str(e)}", file=sys.stderr)
+
+    for line in iter(sys.stdin.readline, ''):
+        job = json.loads(line)
+        if not hasattr(os, 'fork'):
+            run_job(job, send)
+            send({'event': 'exit', 'code': 0, 'reusable': False})
+            return
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_job(job, send)
+            finally:
+                os._exit(0)
+        _, status = os.waitpid(pid, 0)
+        send({'event': 'exit', 'code': exit_code(status)})
+
+class SandboxPool:
+    """Pool of started, preloaded processes that run generated code
+
+    Generated code runs in a separate process under CPU-time and memory
+    limits and a wall-clock timeout, so a runaway loop or memory blowup ends
+    that process instead of the worker. Sandboxes import PRELOAD_MODULES
+    once when they start and fork a child for each job, so attempts do not
+    pay interpreter and import start-up; a job that overruns its time is
+    ended by killing its child, and the sandbox takes the next job. Up to
+    size idle sandboxes are kept, more are started while more jobs run at
+    once. The pool belongs to the process that started it, a forked child
+    (a Celery worker) starts its own sandboxes.
+    """
+
+    def __init__(self, size=SANDBOX_POOL_SIZE):
+        self.size = size
+        self._idle = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _spawn(self):
+        return subprocess.Popen(
+            [sys.executable, '-m', 'src.sandbox_pool'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=ROOT_FOLDER,
+        )
+
+    def _prune(self):
+        # Sandboxes inherited from a parent process belong to the parent
+        if self._pid != os.getpid():
+            self._idle, self._pid = [], os.getpid()
+        self._idle = [sandbox for sandbox in self._idle if sandbox.poll() is None]
+
+    def start(self):
+        """Start the idle sandboxes ahead of the first job"""
+        with self._lock:
+            self._prune()
+            while len(self._idle) < self.size:
+                self._idle.append(self._spawn())
+
+    def _take(self):
+        with self._lock:
+            self._prune()
+            # With no idle sandbox (or size 0) the job starts its own
+            return self._idle.pop(0) if self._idle else self._spawn()
+
+    def _release(self, sandbox, reusable):
+        with self._lock:
+            self._prune()
+            if reusable and sandbox.poll() is None and len(self._idle) < self.size:
+                self._idle.append(sandbox)
+                return
+        self._stop(sandbox)
+
+    def _stop(self, sandbox):
+        if sandbox.poll() is None:
+            sandbox.kill()
+        sandbox.wait()
+        for stream in (sandbox.stdin, sandbox.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+    def run(self, target, args, timeout=SANDBOX_TIMEOUT, cpu_seconds=SANDBOX_CPU_SECONDS,
+            memory_mb=SANDBOX_MEMORY_MB, on_output=print, cancel=None):
+        """Run target ('module:function') with JSON-serializable args in a sandbox
+
+        Lines printed in the sandbox are passed to on_output as they arrive.
+        Setting the cancel event (threading.Event) stops the job. Returns the
+        function's return value, raises SandboxError when it raised, timed
+        out, hit a limit or was cancelled.
+        """
+        sandbox = self._take()
+        messages = queue.Queue()
+
+        def read():
+            for line in sandbox.stdout:
+                message = json.loads(line)
+                messages.put(message)
+                if message['event'] == 'exit':
+                    return
+            messages.put(None)
+
+        threading.Thread(target=read, daemon=True).start()
+        outcome, child, exit_message = None, None, None
+        try:
+            job = {'target': target, 'args': list(args), 'cpu_seconds': cpu_seconds, 'memory_mb': memory_mb}
+            sandbox.stdin.write((json.dumps(job) + '\n').encode('utf-8'))
+            sandbox.stdin.flush()
+            # The wall clock of the job starts once the sandbox has finished importing
+            limit = SANDBOX_START_TIMEOUT
+            deadline = time.monotonic() + limit
+            while True:
+                if outcome is None and cancel is not None and cancel.is_set():
+                    outcome = ('error', "Cancelled")
+                    deadline = self._end_child(sandbox, child)
+                remaining = max(0.0, deadline - time.monotonic())
+                try:
+                    message = messages.get(timeout=min(remaining, CANCEL_POLL_SECONDS) if cancel is not None else remaining)
+                except queue.Empty:
+                    if time.monotonic() < deadline:
+                        continue
+                    if outcome is not None:
+                        # The child was killed but the sandbox does not report back
+                        break
+                    outcome = ('error', f"Timed out after {limit:g} s")
+                    deadline = self._end_child(sandbox, child)
+                    continue
+                if message is None:
+                    break
+                event = message['event']
+                if event == 'started':
+                    child = message['pid']
+                    limit = timeout
+                    deadline = time.monotonic() + limit
+                elif event == 'output':
+                    on_output(message['line'])
+                elif event in ('result', 'error') and outcome is None:
+                    outcome = (event, message.get('value', message.get('error')))
+                elif event == 'exit':
+                    exit_message = message
+                    break
+        except OSError as e:
+            outcome = outcome or ('error', f"Sandbox unavailable: {str(e)}")
+        finally:
+            self._release(sandbox, exit_message is not None and exit_message.get('reusable', True))
+
+        if outcome is None:
+            code = exit_message['code'] if exit_message else sandbox.returncode
+            limit_hit = code == -getattr(signal, 'SIGXCPU', 0)
+            raise SandboxError(
+                f"Sandbox exited with code {code} before finishing"
+                + (" (CPU time limit exceeded)" if limit_hit else "")
+            )
+        if outcome[0] == 'error':
+            raise SandboxError(outcome[1])
+        return outcome[1]
+
+    def _end_child(self, sandbox, child):
+        """Kill the child running a job (the sandbox while it has none), returning the deadline for its exit report"""
+        try:
+            if child is not None:
+                os.kill(child, signal.SIGKILL)
+            else:
+                sandbox.kill()
+        except OSError:
+            pass
+        return time.monotonic() + SANDBOX_EXIT_TIMEOUT
+
+    def close(self):
+        """Stop the idle sandboxes of this process"""
+        with self._lock:
+            if self._pid == os.getpid():
+                for sandbox in self._idle:
+                    self._stop(sandbox)
+            self._idle = []
+
+# Shared by the converter, the extractor and GNSSProcessor
+sandbox_pool = SandboxPool()
+atexit.register(sandbox_pool.close)
+
+if __name__ == '__main__':
+    worker_main()
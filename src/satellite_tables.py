@@ -0,0 +1,173 @@
+from datetime import datetime
+from src.stream_reader import iter_lines
+from src.nmea_decoder import ChecksumMismatch, parse_datestamp, parse_timestamp, sentence_body, split_log_timestamp
+from src.columnar_writer import open_record_writer
+
+# Constellation of each GSV talker ID, as RINEX system letters
+TALKER_SYSTEMS = {
+    'GP': 'G', 'GL': 'R', 'GA': 'E', 'GB': 'C', 'BD': 'C', 'GQ': 'J', 'QZ': 'J', 'GI': 'I',
+}
+
+# Columns of a per-epoch satellite table, each stored as an array
+SATELLITE_COLUMNS = ('system', 'prn', 'signal', 'elevation', 'azimuth', 'snr')
+
+def _optional_int(value):
+    """Parse a GSV field, None when it is empty"""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+def parse_gsv(sentence):
+    """Parse a GSV sentence into its group position and satellites, None if it is not a valid GSV
+
+    NMEA 4.10+ sentences end with a signal ID after the satellite blocks,
+    which is told apart by the field count (blocks have 4 fields each).
+    """
+    if len(sentence) < 7 or sentence[0] != '$' or sentence[3:6] != 'GSV':
+        return None
+    if sentence[1] == 'P':
+        # Proprietary sentence (e.g. $PIGSV), not a talker's satellites in view
+        return None
+    try:
+        body = sentence_body(sentence)
+    except ChecksumMismatch:
+        return None
+    if body is None:
+        return None
+
+    fields = body.split(',')
+    if len(fields) < 4:
+        return None
+    talker = fields[0][:2]
+    num_messages, msg_num = _optional_int(fields[1]), _optional_int(fields[2])
+    if num_messages is None or msg_num is None:
+        return None
+    blocks = fields[4:]
+    signal = blocks.pop() if len(blocks) % 4 == 1 else None
+
+    satellites = []
+    for i in range(0, len(blocks) - 3, 4):
+        prn = _optional_int(blocks[i])
+        if prn is None:
+            continue
+        satellites.append((prn, _optional_int(blocks[i + 1]), _optional_int(blocks[i + 2]), _optional_int(blocks[i + 3])))
+    return {
+        'talker': talker,
+        'num_messages': num_messages,
+        'msg_num': msg_num,
+        'signal': signal or None,
+        'satellites': satellites,
+    }
+
+class GsvAssembler:
+    """Join multi-part GSV groups of all constellations into one satellite table per epoch
+
+    Each constellation (talker) and signal sends its group once per epoch, so
+    an epoch ends when a group that was already seen starts again.
+    """
+
+    def __init__(self):
+        self._table = None
+        self._groups = set()
+
+    def add(self, gsv, timestamp_ms=None):
+        """Add one parsed GSV sentence, returning the previous epoch's table when this one starts a new epoch"""
+        group = (gsv['talker'], gsv['signal'])
+        finished = None
+        if self._table is not None and gsv['msg_num'] == 1 and group in self._groups:
+            finished = self.flush()
+        if self._table is None:
+            self._table = {'timestamp_ms': timestamp_ms, 'num_satellites': 0}
+            self._table.update({column: [] for column in SATELLITE_COLUMNS})
+        self._groups.add(group)
+
+        table = self._table
+        system = TALKER_SYSTEMS.get(gsv['talker'], gsv['talker'])
+        for prn, elevation, azimuth, snr in gsv['satellites']:
+            table['system'].append(system)
+            table['prn'].append(prn)
+            table['signal'].append(gsv['signal'])
+            table['elevation'].append(elevation)
+            table['azimuth'].append(azimuth)
+            table['snr'].append(snr)
+        table['num_satellites'] = len(table['prn'])
+        return finished
+
+    def flush(self):
+        """Return the table of the open epoch, None if there is none"""
+        table = self._table
+        self._table = None
+        self._groups = set()
+        return table
+
+class FixClock:
+    """UTC time of the last GGA or RMC sentence, in milliseconds
+
+    GGA only carries the time of day, so the date comes from the last RMC.
+    Logs without receive times get their satellite tables stamped with it.
+    """
+
+    def __init__(self):
+        self.date = None
+        self.time = None
+
+    def update(self, sentence):
+        """Take the UTC time (and RMC date) of a GGA or RMC sentence, ignore anything else"""
+        kind = sentence[3:6]
+        if kind not in ('GGA', 'RMC') or sentence[1] == 'P':
+            return
+        fields = sentence.split('*')[0].split(',')
+        try:
+            if kind == 'RMC' and len(fields) > 9 and fields[9]:
+                self.date = parse_datestamp(fields[9])
+            if len(fields) > 1 and fields[1]:
+                self.time = parse_timestamp(fields[1])
+        except ValueError:
+            return
+
+    def timestamp_ms(self):
+        """Milliseconds since the Unix epoch of the last fix, None before a date and time are known"""
+        if self.date is None or self.time is None:
+            return None
+        return int(datetime.combine(self.date, self.time).timestamp() * 1000)
+
+def iter_satellite_tables(input_file, start=0):
+    """Stream per-epoch satellite tables (PRN, elevation, azimuth, SNR arrays) from an NMEA log, from byte start on
+
+    Tables are stamped with the logger's receive time, or the UTC time of the
+    last GGA/RMC fix when the log has none.
+    """
+    assembler = GsvAssembler()
+    clock = FixClock()
+    for line in iter_lines(input_file, start=start):
+        line = line.strip()
+        if 'GSV' not in line[:7]:
+            if 'GGA' in line[:7] or 'RMC' in line[:7]:
+                clock.update(split_log_timestamp(line)[0])
+            continue
+        sentence, timestamp = split_log_timestamp(line)
+        gsv = parse_gsv(sentence)
+        if gsv is None:
+            continue
+        if timestamp is None:
+            timestamp = clock.timestamp_ms()
+        table = assembler.add(gsv, timestamp)
+        if table is not None:
+            yield table
+    table = assembler.flush()
+    if table is not None:
+        yield table
+
+def write_satellite_tables(input_file, output_file, output_format='jsonl', start=0, append=False):
+    """Write the satellite tables of an NMEA log and return the number of epochs
+
+    start and append continue an earlier output from a byte offset of a grown log.
+    """
+    epochs = 0
+    with open_record_writer(output_file, output_format, index=True, append=append) as writer:
+        for table in iter_satellite_tables(input_file, start):
+            writer.write(table)
+            epochs += 1
+    print(f"Wrote {epochs} satellite tables to {output_file}")
+    return epochs
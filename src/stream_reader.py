@@ -0,0 +1,81 @@
+import os
+
+# Read uploads in 1 MiB chunks so memory stays flat regardless of file size
+CHUNK_SIZE = 1024 * 1024
+
+def decode_block(block):
+    """Decode a block of complete lines, falling back to latin1 per line"""
+    try:
+        return block.decode('utf-8')
+    except UnicodeDecodeError:
+        # Multi-byte UTF-8 sequences never contain b'\n', so each line can be
+        # decoded on its own and the result does not depend on chunk boundaries
+        decoded = []
+        for line in block.split(b'\n'):
+            try:
+                decoded.append(line.decode('utf-8'))
+            except UnicodeDecodeError:
+                decoded.append(line.decode('latin1'))
+        return '\n'.join(decoded)
+
+def iter_lines(input_file, chunk_size=CHUNK_SIZE, start=0, end=None):
+    """Stream decoded lines (without line endings) from a text or mixed binary file
+
+    start/end restrict reading to a byte range, see split_line_ranges. Runs
+    without a line break longer than chunk_size are split into lines of at
+    most twice chunk_size.
+    """
+    with open(input_file, 'rb') as f:
+        f.seek(start)
+        remaining = None if end is None else end - start
+        tail = b''
+        # Whether the bytes handed out so far end in \r, whose \n may start the next chunk
+        after_cr = False
+        while True:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            chunk = f.read(size) if size > 0 else b''
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            if after_cr and chunk.startswith(b'\n'):
+                # Second half of a \r\n split across chunks, its line was already handed out
+                chunk = chunk[1:]
+            chunk = tail + chunk
+
+            # Only hand complete lines to the decoder, keep the rest for the next chunk
+            cut = chunk.rfind(b'\n')
+            if cut == -1:
+                cut = chunk.rfind(b'\r')
+            if cut == -1:
+                after_cr = False
+                if len(chunk) > chunk_size:
+                    # No line break in over a chunk (binary data), hand it out as a line so memory stays bounded
+                    yield from decode_block(chunk).splitlines()
+                    chunk = b''
+                tail = chunk
+                continue
+            tail = chunk[cut + 1:]
+            after_cr = not tail and chunk.endswith(b'\r')
+            yield from decode_block(chunk[:cut + 1]).splitlines()
+
+        if tail:
+            yield from decode_block(tail).splitlines()
+
+def split_line_ranges(input_file, parts):
+    """Split a file into at most `parts` contiguous byte ranges that start at line boundaries"""
+    size = os.path.getsize(input_file)
+    bounds = [0]
+    with open(input_file, 'rb') as f:
+        for i in range(1, parts):
+            position = size * i // parts
+            if position <= bounds[-1]:
+                continue
+            # Move the boundary to just after the next newline
+            f.seek(position)
+            f.readline()
+            position = f.tell()
+            if bounds[-1] < position < size:
+                bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
@@ -0,0 +1,281 @@
+import bisect
+import json
+import os
+import re
+import numpy as np
+
+# Sidecar file next to each indexed JSONL output
+INDEX_SUFFIX = '.idx'
+
+# Records per checkpoint, a window read scans at most this many records too many at each end
+INDEX_STRIDE = 1000
+
+# Bump when the index layout changes, older indexes are rebuilt
+INDEX_VERSION = 1
+
+# timestamp_ms as written by encode_record (compact separators)
+_TIMESTAMP = re.compile(rb'"timestamp_ms":(-?\d+)')
+
+def index_path(output_file):
+    """Path of the sidecar index of an output file"""
+    return output_file + INDEX_SUFFIX
+
+class TimestampIndex:
+    """Sparse timestamp checkpoints of a JSONL file, collected while it is written
+
+    Each checkpoint is [byte offset, min timestamp_ms, max timestamp_ms] of a
+    block of records. sorted tells whether timestamps never decrease along the
+    file, which allows binary search over the blocks.
+    """
+
+    def __init__(self, stride=INDEX_STRIDE):
+        self.stride = stride
+        self.rows = 0
+        self.sorted = True
+        self.checkpoints = []
+        self._last = None
+
+    @classmethod
+    def from_dict(cls, index, stride=INDEX_STRIDE):
+        """Continue a saved index, the next record starts a new checkpoint"""
+        resumed = cls(stride)
+        resumed.checkpoints = [list(checkpoint) for checkpoint in index['checkpoints']]
+        resumed.sorted = index['sorted']
+        resumed.rows = len(resumed.checkpoints) * stride
+        timed = [checkpoint[2] for checkpoint in resumed.checkpoints if checkpoint[2] is not None]
+        resumed._last = timed[-1] if timed else None
+        return resumed
+
+    def add(self, timestamp_ms, offset):
+        """Note one record starting at offset"""
+        if self.rows % self.stride == 0:
+            self.checkpoints.append([offset, None, None])
+        self.rows += 1
+        if timestamp_ms is not None:
+            self._update(self.checkpoints[-1], timestamp_ms, timestamp_ms, timestamp_ms)
+
+    def add_block(self, offset, starts, timestamps):
+        """Note a block of records, with their start offsets relative to offset and timestamps in file order
+
+        timestamps may hold NaN for records without one.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        for i in range(0, len(starts), self.stride):
+            self.checkpoints.append([offset + int(starts[i]), None, None])
+            chunk = timestamps[i:i + self.stride]
+            chunk = chunk[~np.isnan(chunk)]
+            if len(chunk):
+                if np.any(np.diff(chunk) < 0):
+                    self.sorted = False
+                self._update(self.checkpoints[-1], int(chunk[0]), int(chunk.min()), int(chunk.max()))
+                self._last = int(chunk[-1])
+        # Keep the stride phase so a following add() starts a fresh checkpoint
+        self.rows += -(-len(starts) // self.stride) * self.stride
+
+    def _update(self, checkpoint, first, low, high):
+        if self._last is not None and first < self._last:
+            self.sorted = False
+        self._last = first
+        checkpoint[1] = low if checkpoint[1] is None else min(checkpoint[1], low)
+        checkpoint[2] = high if checkpoint[2] is None else max(checkpoint[2], high)
+
+    def to_dict(self, size):
+        return {
+            'version': INDEX_VERSION,
+            'size': size,
+            'sorted': self.sorted,
+            'checkpoints': self.checkpoints,
+        }
+
+    def save(self, output_file):
+        """Write the sidecar index for output_file, which must be complete"""
+        with open(index_path(output_file), 'w') as f:
+            json.dump(self.to_dict(os.path.getsize(output_file)), f, separators=(',', ':'))
+
+def load_index(output_file):
+    """Load the sidecar index of an output file, None if it is missing or stale"""
+    try:
+        with open(index_path(output_file), 'r') as f:
+            index = json.load(f)
+        if index.get('version') != INDEX_VERSION or index.get('size') != os.path.getsize(output_file):
+            return None
+        return index
+    except (OSError, ValueError):
+        return None
+
+def build_index(output_file, stride=INDEX_STRIDE):
+    """Index an existing JSONL file in one scan (for outputs not written through JsonlWriter)"""
+    index = TimestampIndex(stride)
+    offset = 0
+    with open(output_file, 'rb') as f:
+        for line in f:
+            match = _TIMESTAMP.search(line)
+            if match is None and line.strip():
+                # Not in compact form, parse the whole line
+                try:
+                    timestamp = json.loads(line).get('timestamp_ms')
+                except (ValueError, AttributeError):
+                    timestamp = None
+            else:
+                timestamp = int(match.group(1)) if match else None
+            if line.strip():
+                index.add(timestamp if isinstance(timestamp, int) else None, offset)
+            offset += len(line)
+    index.save(output_file)
+    return index.to_dict(offset)
+
+def line_timestamps(lines):
+    """timestamp_ms of each encoded line, NaN where a line has none"""
+    timestamps = np.full(len(lines), np.nan)
+    for i, line in enumerate(lines):
+        match = _TIMESTAMP.search(line.encode('utf-8') if isinstance(line, str) else line)
+        if match:
+            timestamps[i] = int(match.group(1))
+    return timestamps
+
+def line_starts(data):
+    """Offset of each line within a block of newline-terminated lines"""
+    ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10) + 1
+    return np.concatenate(([0], ends[:-1]))
+
+def remove_index(output_file):
+    """Delete the sidecar index of an output file if there is one"""
+    if os.path.exists(index_path(output_file)):
+        os.remove(index_path(output_file))
+
+def ensure_index(output_file):
+    """Load the index of an output file, building it when it is missing or stale"""
+    return load_index(output_file) or build_index(output_file)
+
+def merge_indexes(output_file, part_files):
+    """Combine the indexes of parts that were concatenated into output_file, in order"""
+    checkpoints = []
+    is_sorted = True
+    base = 0
+    last = None
+    for part_file in part_files:
+        index = load_index(part_file)
+        if index is None:
+            return build_index(output_file)
+        for offset, low, high in index['checkpoints']:
+            checkpoints.append([base + offset, low, high])
+            if low is not None:
+                if last is not None and low < last:
+                    is_sorted = False
+                last = high
+        is_sorted = is_sorted and index['sorted']
+        base += index['size']
+
+    index = {'version': INDEX_VERSION, 'size': base, 'sorted': is_sorted, 'checkpoints': checkpoints}
+    with open(index_path(output_file), 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    return index
+
+def record_offset(output_file, timestamp_ms):
+    """Byte offset of the first record at or after timestamp_ms, the file size when there is none"""
+    index = ensure_index(output_file)
+    ranges = window_ranges(index, timestamp_ms)
+    if not ranges:
+        return index['size']
+    with open(output_file, 'rb') as f:
+        f.seek(ranges[0][0])
+        offset = ranges[0][0]
+        for line in f:
+            match = _TIMESTAMP.search(line)
+            if match and int(match.group(1)) >= timestamp_ms:
+                return offset
+            offset += len(line)
+    return offset
+
+def truncate_records(output_file, timestamp_ms):
+    """Cut an indexed JSONL output before its first record at or after timestamp_ms, keeping the index in step
+
+    Returns the new file size.
+    """
+    index = ensure_index(output_file)
+    size = record_offset(output_file, timestamp_ms)
+    with open(output_file, 'r+b') as f:
+        f.truncate(size)
+    index['checkpoints'] = [checkpoint for checkpoint in index['checkpoints'] if checkpoint[0] < size]
+    index['size'] = size
+    if index['checkpoints']:
+        # The last kept block lost records, recompute its bounds from the ones left
+        last = index['checkpoints'][-1]
+        with open(output_file, 'rb') as f:
+            f.seek(last[0])
+            timestamps = [int(match) for match in _TIMESTAMP.findall(f.read(size - last[0]))]
+        last[1], last[2] = (min(timestamps), max(timestamps)) if timestamps else (None, None)
+    with open(index_path(output_file), 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    return size
+
+def window_ranges(index, start_ms=None, end_ms=None):
+    """Byte ranges of the blocks that can hold records between start_ms and end_ms (inclusive)"""
+    checkpoints = index['checkpoints']
+    ends = [checkpoint[0] for checkpoint in checkpoints[1:]] + [index['size']]
+    timed = [i for i, checkpoint in enumerate(checkpoints) if checkpoint[1] is not None]
+
+    if index['sorted']:
+        # Binary search for the first block that reaches start_ms
+        first = 0
+        if start_ms is not None:
+            first = bisect.bisect_left([checkpoints[i][2] for i in timed], start_ms)
+        candidates = []
+        for i in timed[first:]:
+            if end_ms is not None and checkpoints[i][1] > end_ms:
+                break
+            candidates.append(i)
+    else:
+        candidates = [
+            i for i in timed
+            if (start_ms is None or checkpoints[i][2] >= start_ms)
+            and (end_ms is None or checkpoints[i][1] <= end_ms)
+        ]
+
+    # Merge adjacent blocks into contiguous reads
+    ranges = []
+    for i in candidates:
+        start, end = checkpoints[i][0], ends[i]
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return ranges
+
+def iter_window(output_file, start_ms=None, end_ms=None):
+    """Yield the records of a JSONL output with start_ms <= timestamp_ms <= end_ms
+
+    Only the blocks of its index that overlap the window are read. Without
+    a window, or without a current index, the whole file is read (the index
+    is not built here, so reads never write). Records without timestamp_ms
+    only match when there is no window, lines that are not JSON objects are
+    skipped and counted.
+    """
+    windowed = start_ms is not None or end_ms is not None
+    index = load_index(output_file) if windowed else None
+    ranges = window_ranges(index, start_ms, end_ms) if index else [[0, os.path.getsize(output_file)]]
+    skipped = 0
+    with open(output_file, 'rb') as f:
+        for start, end in ranges:
+            f.seek(start)
+            while f.tell() < end:
+                line = f.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    skipped += 1
+                    continue
+                if not isinstance(record, dict):
+                    skipped += 1
+                    continue
+                if windowed:
+                    timestamp = record.get('timestamp_ms')
+                    if timestamp is None or (start_ms is not None and timestamp < start_ms) or (end_ms is not None and timestamp > end_ms):
+                        continue
+                yield record
+    if skipped:
+        print(f"Skipped {skipped} malformed lines in {output_file}")
@@ -0,0 +1,35 @@
+import os
+import pytest
+from src.code_cache import input_fingerprint
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads')
+
+# Receiver logs with variable-length GSV blocks, binary garbage (f9p) and receive-time suffixes (pixel4)
+LOGS = [
+    os.path.join(UPLOADS, 'UrbanNav-HK-Medium-Urban-1.ublox.f9p.nmea'),
+    os.path.join(UPLOADS, 'UrbanNav-HK-Medium-Urban-1.google.pixel4.nmea'),
+]
+
+def write_windows(input_file, folder, count=4, size=20000):
+    """Copy `count` evenly spaced windows of `size` lines of input_file into folder"""
+    with open(input_file, 'rb') as f:
+        lines = f.readlines()
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"window{i}.nmea")
+        with open(path, 'wb') as f:
+            f.writelines(lines[i * len(lines) // count:][:size])
+        paths.append(path)
+    return paths
+
+@pytest.mark.parametrize('log', LOGS, ids=os.path.basename)
+def test_windows_of_one_log_share_a_fingerprint(log, tmp_path):
+    if not os.path.exists(log):
+        pytest.skip(f"{log} not available")
+    fingerprints = {input_fingerprint(path) for path in write_windows(log, str(tmp_path))}
+    assert len(fingerprints) == 1
+
+def test_different_logs_have_different_fingerprints():
+    if not all(os.path.exists(log) for log in LOGS):
+        pytest.skip("UrbanNav logs not available")
+    assert input_fingerprint(LOGS[0]) != input_fingerprint(LOGS[1])
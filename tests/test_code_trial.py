@@ -0,0 +1,46 @@
+import os
+import pytest
+
+# Sandboxes preload the converter modules, which build their LLM client on import
+for name in ('AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_API_VERSION', 'AZURE_OPENAI_ENDPOINT', 'AZURE_OPENAI_ENGINE'):
+    os.environ.setdefault(name, 'test')
+
+from src.code_trial import trial_run, write_sample
+
+def check_arguments(code, input_file, output_file):
+    """Trial target that passes when it gets the sample as input and a fresh output path"""
+    with open(input_file, 'rb') as f:
+        sample = f.read()
+    return (
+        os.path.basename(input_file).startswith('sample-')
+        and sample.startswith(b'$GPGGA')
+        and not os.path.exists(output_file)
+        and input_file in code and output_file in code
+    )
+
+def write_log(path, lines=20000):
+    with open(path, 'w') as f:
+        for i in range(lines):
+            f.write(f"$GPGGA,{i:06d}.00,2218.07395,N,11410.74198,E,1,08,0.9,9.0,M,-1.6,M,,*47\n")
+
+def test_sample_keeps_whole_lines_from_the_whole_file(tmp_path):
+    input_file = str(tmp_path / 'log.nmea')
+    write_log(input_file)
+    sample_file = str(tmp_path / 'sample.nmea')
+    assert write_sample(input_file, sample_file, max_bytes=4096, slices=4)
+    with open(sample_file) as f:
+        lines = f.read().splitlines()
+    assert all(line.startswith('$GPGGA,') and line.endswith('*47') for line in lines)
+    assert lines[0].startswith('$GPGGA,000000') and lines[-1].startswith('$GPGGA,019999')
+    assert not write_sample(sample_file, str(tmp_path / 'again.nmea'), max_bytes=1024 * 1024)
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="sandboxes fork a child per job")
+def test_trial_passes_paths_by_name(tmp_path):
+    input_file = str(tmp_path / 'log.nmea')
+    output_file = str(tmp_path / 'log.location.jsonl')
+    write_log(input_file)
+    code = f"records = open({input_file!r}).read()\nout = {output_file!r}"
+    # Keys in the opposite order of the target's parameters
+    paths = {'output_file': output_file, 'input_file': input_file}
+    passed, error = trial_run('tests.test_code_trial:check_arguments', code, paths)
+    assert passed, error
@@ -0,0 +1,125 @@
+import os
+import pytest
+
+# The extractor builds its LLM client on import, the assembler never calls it
+for name in ('AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_API_VERSION', 'AZURE_OPENAI_ENDPOINT', 'AZURE_OPENAI_ENGINE'):
+    os.environ.setdefault(name, 'test')
+
+from src.location_extractor import (
+    EPOCH_FIELDS, EPOCH_REORDER_WINDOW, NmeaEpochAssembler, candidate_locations, new_extraction_counts,
+)
+
+# Receive time of the first epoch, one epoch per second
+START_MS = 1621218691000
+
+def utc(second):
+    return f"02:31:{second:02d}"
+
+def gga(second, received=True):
+    """Converter record of a GGA sentence"""
+    return {
+        'sentence_type': 'GNGGA', 'timestamp': utc(second),
+        'timestamp_ms': START_MS + second * 1000 if received else None,
+        'lat': '2218.072629', 'lat_dir': 'N', 'lon': '11410.739589', 'lon_dir': 'E',
+        'gps_qual': '1', 'num_sats': '07', 'horizontal_dil': '1.0', 'altitude': '10.9',
+    }
+
+def rmc(second, received=True):
+    """Converter record of an RMC sentence, 10 knots due east"""
+    return {
+        'sentence_type': 'GNRMC', 'timestamp': utc(second),
+        'timestamp_ms': START_MS + second * 1000 if received else None,
+        'lat': '2218.072629', 'lat_dir': 'N', 'lon': '11410.739589', 'lon_dir': 'E',
+        'spd_over_grnd': '10.0', 'true_course': '90.0',
+    }
+
+def vtg(second, received=True, course='45.0'):
+    """Converter record of a VTG sentence, which has no UTC time of its own"""
+    return {
+        'sentence_type': 'GNVTG', 'timestamp_ms': START_MS + second * 1000 if received else None,
+        'spd_over_grnd_kts': '20.0', 'true_track': course,
+    }
+
+def assemble(records, window=EPOCH_REORDER_WINDOW):
+    counts = new_extraction_counts()
+    return list(candidate_locations(records, counts, window)), counts
+
+def test_gga_rmc_vtg_fuse_into_one_epoch():
+    (record,), counts = assemble([gga(0), rmc(0), vtg(0)])
+    assert counts['epochs'] == 1
+    assert set(record) == set(EPOCH_FIELDS) | {'record_type'}
+    assert record['record_type'] == 'NMEA'
+    assert record['timestamp_ms'] == START_MS
+    assert record['latitude'] == pytest.approx(22 + 18.072629 / 60)
+    assert record['longitude'] == pytest.approx(114 + 10.739589 / 60)
+    assert (record['altitude'], record['hdop'], record['num_satellites'], record['quality']) == (10.9, 1.0, 7, 1)
+    # The first sentence with a field sets it, RMC comes before VTG here
+    assert record['speed'] == pytest.approx(10 * 0.514444)
+    assert record['course'] == 90.0
+    assert record['pdop'] is None
+
+def test_vtg_fills_fields_its_epoch_lacks():
+    partial_rmc = dict(rmc(0), spd_over_grnd='', true_course='')
+    (record,), _ = assemble([gga(0), partial_rmc, vtg(0)])
+    assert record['speed'] == pytest.approx(20 * 0.514444)
+    assert record['course'] == 45.0
+
+def test_untimed_sentence_joins_the_epoch_received_with_it():
+    # The VTG of second 1 arrives after the GGA of second 2 but carries the receive time of second 1
+    records = [gga(0), gga(1), gga(2), vtg(1), vtg(2, course='10.0')]
+    output, _ = assemble(records)
+    assert [record['course'] for record in output] == [None, 45.0, 10.0]
+
+def test_untimed_sentence_before_its_epoch_is_held_for_it():
+    (record,), _ = assemble([vtg(0), gga(0)])
+    assert record['timestamp_ms'] == START_MS
+    assert record['latitude'] is not None and record['course'] == 45.0
+
+def test_untimed_sentence_without_receive_time_joins_the_latest_epoch():
+    records = [gga(0, received=False), gga(1, received=False), vtg(0, received=False)]
+    output, _ = assemble(records)
+    assert [record['course'] for record in output] == [None, 45.0]
+
+def test_late_sentence_merges_while_its_epoch_is_open():
+    # RMC of second 0 arrives after the GGAs of the following window - 1 epochs
+    records = [gga(second) for second in range(EPOCH_REORDER_WINDOW)] + [rmc(0)]
+    output, counts = assemble(records)
+    assert len(output) == EPOCH_REORDER_WINDOW and counts['epochs'] == EPOCH_REORDER_WINDOW
+    assert output[0]['speed'] == pytest.approx(10 * 0.514444)
+    assert [record['timestamp_ms'] for record in output] == [START_MS + i * 1000 for i in range(EPOCH_REORDER_WINDOW)]
+
+def test_sentence_later_than_the_window_starts_a_new_epoch():
+    records = [gga(second) for second in range(EPOCH_REORDER_WINDOW + 1)] + [rmc(0)]
+    output, _ = assemble(records)
+    assert len(output) == EPOCH_REORDER_WINDOW + 2
+    assert output[0]['speed'] is None
+    late = output[-1]
+    assert late['timestamp_ms'] == START_MS and late['speed'] == pytest.approx(10 * 0.514444)
+
+def test_out_of_order_epochs_are_emitted_in_arrival_order():
+    seconds = [1, 0, 3, 2, 4]
+    records = [gga(second) for second in seconds] + [rmc(second) for second in seconds]
+    output, _ = assemble(records, window=len(seconds))
+    assert [record['timestamp_ms'] for record in output] == [START_MS + second * 1000 for second in seconds]
+    assert all(record['course'] == 90.0 for record in output)
+
+@pytest.mark.parametrize('window', [1, 2, EPOCH_REORDER_WINDOW])
+def test_window_keeps_at_most_window_epochs_open(window):
+    assembler = NmeaEpochAssembler(window)
+    emitted = []
+    for second in range(window + 3):
+        location = {'timestamp_ms': START_MS + second * 1000, 'latitude': 22.0, 'longitude': 114.0}
+        left = assembler.add(utc(second), START_MS + second * 1000, location)
+        # The oldest epoch leaves once window epochs are already open
+        assert len(left) == (1 if second >= window else 0)
+        emitted += left
+    assert [record['timestamp_ms'] for record in emitted] == [START_MS + i * 1000 for i in range(3)]
+    rest = assembler.flush()
+    assert [record['timestamp_ms'] for record in rest] == [START_MS + i * 1000 for i in range(3, window + 3)]
+    assert assembler.flush() == []
+
+def test_records_without_sentence_type_pass_through():
+    location = {'timestamp_ms': START_MS, 'latitude': 22.0, 'longitude': 114.0}
+    output, counts = assemble([location, gga(0), {'sentence_type': 'GNTXT'}])
+    assert output[0] is location
+    assert counts['skipped'] == 1 and counts['epochs'] == 1
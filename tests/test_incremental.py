@@ -0,0 +1,119 @@
+import filecmp
+import os
+import pytest
+
+# The pipeline imports the LLM converter, which builds its client on import; resuming never calls it
+for name in ('AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_API_VERSION', 'AZURE_OPENAI_ENDPOINT', 'AZURE_OPENAI_ENGINE'):
+    os.environ.setdefault(name, 'test')
+
+from src.incremental import (
+    find_resume_point, iter_lines_backwards, matches_prefix, nmea_line_time, resume_processing, resume_state,
+    rinex_line_time,
+)
+from src.pipeline import run_fused_pipeline
+from src.satellite_tables import write_satellite_tables
+from src.timestamp_index import iter_window, load_index
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PIXEL4_NMEA = os.path.join(ROOT, 'uploads', 'UrbanNav-HK-Medium-Urban-1.google.pixel4.nmea')
+F9P_OBS = os.path.join(ROOT, 'tests', 'data', 'urbannav_f9p_head.obs')
+
+def write_lines(path, lines):
+    with open(path, 'wb') as f:
+        f.write(b''.join(lines))
+    return str(path)
+
+def head(input_file, lines, output_file):
+    """Copy the first lines of a file, as an earlier upload of a growing log"""
+    with open(input_file, 'rb') as f:
+        return write_lines(output_file, [line for _, line in zip(range(lines), f)])
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 64, 1 << 20])
+def test_lines_backwards_at_any_chunk_size(tmp_path, chunk_size):
+    lines = [b'first\n', b'\n', b'a much longer line than the chunk size\n', b'x\n', b'no newline at the end']
+    path = write_lines(tmp_path / 'log.txt', lines)
+    offsets = [sum(len(line) for line in lines[:i]) for i in range(len(lines))]
+    expected = [(offset, line.rstrip(b'\n')) for offset, line in zip(offsets, lines)]
+    assert list(iter_lines_backwards(path, chunk_size)) == expected[::-1]
+
+def test_lines_backwards_of_a_file_ending_in_newline(tmp_path):
+    path = write_lines(tmp_path / 'log.txt', [b'ab\n', b'cd\n'])
+    assert list(iter_lines_backwards(path, 2)) == [(6, b''), (3, b'cd'), (0, b'ab')]
+
+def test_line_times():
+    assert nmea_line_time(b'$GPGGA,000001.00,,,,,0,00,,,M,,M,,*49,1621218775994\r') == 1621218775994
+    assert nmea_line_time(b'$GPGGA,000001.00,,,,,0,00,,,M,,M,,*49,600') is None
+    assert nmea_line_time(b'$GPGGA,000001.00,,,,,0,00,,,M,,M,,*49') is None
+    assert rinex_line_time(b'> 2021 05 17 02 32 59.0000000  0 21') == 1621218779000
+    assert rinex_line_time(b'G01  23053234.123') is None
+    assert rinex_line_time(b'> not an epoch') is None
+
+# Receive time of the first epoch in the synthetic NMEA log
+LOG_START_MS = 1621218691000
+
+def nmea_log(tmp_path):
+    """A receive-timed NMEA log with untimed lines between its epochs, cut off in its last line"""
+    lines = [b'$GPTXT,01,01,02,header*00\n']
+    for second in range(5):
+        lines.append(f'$GPGGA,0000{second:02d}.00,,,,,0,00,,,M,,M,,*49,{LOG_START_MS + second * 1000}\n'.encode())
+        lines.append(b'$GPTXT,01,01,02,untimed*00\n')
+    lines.append(f'$GPGGA,000005.00,,,,,0,00,,,M,,M,,*49,{LOG_START_MS + 5000}'.encode())
+    path = write_lines(tmp_path / 'log.nmea', lines)
+    offsets = [sum(len(line) for line in lines[:i]) for i in range(len(lines))]
+    return path, offsets
+
+def test_resume_point_of_nmea_log(tmp_path):
+    path, offsets = nmea_log(tmp_path)
+    # The last timed line, whatever its time
+    assert find_resume_point(path, 'NMEA') == (offsets[11], LOG_START_MS + 5000)
+    # The first line scanning back from the end until a line before resume_ms
+    assert find_resume_point(path, 'NMEA', LOG_START_MS + 2000) == (offsets[5], LOG_START_MS + 2000)
+    assert find_resume_point(path, 'NMEA', LOG_START_MS + 1500) == (offsets[5], LOG_START_MS + 2000)
+    assert find_resume_point(path, 'NMEA', LOG_START_MS) == (offsets[1], LOG_START_MS)
+    assert find_resume_point(path, 'NMEA', LOG_START_MS * 2) == (None, None)
+
+def test_resume_point_of_untimed_file(tmp_path):
+    path = write_lines(tmp_path / 'log.nmea', [b'$GPGGA,000001.00,,,,,0,00,,,M,,M,,*49\n', b'\n'])
+    assert find_resume_point(path, 'NMEA') == (None, None)
+
+def test_resume_point_of_rinex_is_the_last_epoch_line():
+    with open(F9P_OBS, 'rb') as f:
+        content = f.read()
+    offset, timestamp = find_resume_point(F9P_OBS, 'RINEX')
+    assert offset == content.rindex(b'\n>') + 1
+    assert timestamp == rinex_line_time(content[offset:content.index(b'\n', offset)])
+
+def process(input_file, folder, tag):
+    """Outputs of a fresh upload: location records, satellite tables and converted records"""
+    files = [os.path.join(folder, f'{tag}.{name}.jsonl') for name in ('location', 'satellites', 'converted')]
+    assert run_fused_pipeline(input_file, files[0], 'jsonl', files[2])
+    write_satellite_tables(input_file, files[1], 'jsonl')
+    return files
+
+def assert_resume_matches_fresh(tmp_path, earlier, grown, file_format):
+    files = process(earlier, tmp_path, 'resumed')
+    state = resume_state(earlier, file_format, files[0])
+    assert state and matches_prefix(grown, state)
+    assert resume_processing(grown, state, *files)
+    for resumed, fresh in zip(files, process(grown, tmp_path, 'fresh')):
+        assert filecmp.cmp(resumed, fresh, shallow=False), resumed
+        # The resumed index starts a new block at the resume point but answers windows the same
+        assert load_index(resumed)['size'] == os.path.getsize(resumed)
+        window = (state['resume_ms'] - 5000, state['resume_ms'] + 5000)
+        assert list(iter_window(resumed, *window)) == list(iter_window(fresh, *window))
+
+@pytest.mark.skipif(not os.path.exists(PIXEL4_NMEA), reason="UrbanNav pixel4 log not bundled")
+def test_resumed_nmea_upload_equals_fresh_run(tmp_path):
+    earlier = head(PIXEL4_NMEA, 3000, tmp_path / 'earlier.nmea')
+    grown = head(PIXEL4_NMEA, 6000, tmp_path / 'grown.nmea')
+    assert_resume_matches_fresh(tmp_path, earlier, grown, 'NMEA')
+
+def test_resumed_rinex_upload_equals_fresh_run(tmp_path):
+    earlier = head(F9P_OBS, 300, tmp_path / 'earlier.obs')
+    assert_resume_matches_fresh(tmp_path, earlier, F9P_OBS, 'RINEX')
+
+def test_changed_prefix_does_not_resume(tmp_path):
+    path, offsets = nmea_log(tmp_path)
+    state = {'version': 1, 'resume_offset': offsets[5], 'prefix_hash': '0' * 64}
+    assert not matches_prefix(path, state)
+    assert not matches_prefix(path, None)
@@ -0,0 +1,57 @@
+import importlib.util
+import json
+import math
+import sys
+from datetime import datetime
+from decimal import Decimal
+import numpy as np
+import pytest
+from src import json_encoder
+
+def load_stdlib_encoder(monkeypatch):
+    """A separate copy of json_encoder loaded as if orjson were not installed"""
+    monkeypatch.setitem(sys.modules, 'orjson', None)
+    spec = importlib.util.spec_from_file_location('json_encoder_stdlib', json_encoder.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert module.orjson is None
+    return module
+
+@pytest.fixture(params=['default', 'stdlib'])
+def encode_record(request, monkeypatch):
+    if request.param == 'stdlib':
+        return load_stdlib_encoder(monkeypatch).encode_record
+    return json_encoder.encode_record
+
+RECORD = {
+    'timestamp_ms': np.int64(1621218793444),
+    'time': datetime(2021, 5, 17, 2, 33, 13, 444606),
+    'latitude': np.float64(22.3),
+    'altitude': float('nan'),
+    'speed': Decimal('1.5'),
+    'flags': (np.bool_(True), None),
+    'nested': {'snr': [np.float32(22.5), math.inf]},
+    'name': 'Hong Kong 港',
+}
+
+def test_records_encode_to_the_same_strict_json(encode_record):
+    line = encode_record(RECORD)
+    assert b'\n' not in line
+    assert json.loads(line) == {
+        'timestamp_ms': 1621218793444,
+        'time': '2021-05-17T02:33:13.444606',
+        'latitude': 22.3,
+        'altitude': None,
+        'speed': 1.5,
+        'flags': [True, None],
+        'nested': {'snr': [22.5, None]},
+        'name': 'Hong Kong 港',
+    }
+
+def test_non_str_keys_are_stringified_like_json_dumps(encode_record):
+    # Records from generated extractors may key values by PRN or by None
+    record = {1: 'G01', None: 'unknown', 'signal': {2: 35.0}}
+    assert json.loads(encode_record(record)) == json.loads(json.dumps(record))
+
+def test_unknown_types_fall_back_to_str(encode_record):
+    assert json.loads(encode_record({'value': object})) == {'value': str(object)}
@@ -0,0 +1,80 @@
+import os
+from functools import reduce
+from operator import xor
+import pynmea2
+import pytest
+
+# The converter module builds its LLM client on import, the checks below never call it
+for name in ('AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_API_VERSION', 'AZURE_OPENAI_ENDPOINT', 'AZURE_OPENAI_ENGINE'):
+    os.environ.setdefault(name, 'test')
+
+from src.format_converter import nmea_to_dict
+from src.nmea_decoder import ChecksumMismatch, decode_sentence, split_log_timestamp
+
+def with_checksum(body):
+    """Sentence for a body between '$' and '*', with its correct checksum"""
+    return f"${body}*{reduce(xor, body.encode('ascii'), 0):02X}"
+
+SENTENCES = [
+    # u-blox F9P
+    with_checksum('GNGGA,023255.00,2218.07395,N,11410.74198,E,2,12,0.62,9.0,M,-1.6,M,,0000'),
+    '$GNRMC,023255.00,A,2218.07395,N,11410.74198,E,0.064,,170521,,,D,V*17',
+    '$GNVTG,,T,,M,0.064,N,0.119,K,D*33',
+    '$GPGSV,3,1,10,01,41,170,27,04,21,197,18,07,55,321,10,08,55,010,27,1*6B',
+    '$GPGSV,3,3,10,30,17,320,09,41,46,238,40,1*62',
+    '$GNGSA,A,3,16,09,01,07,21,27,04,08,30,,,,1.23,0.62,1.06,1*03',
+    # Hand-built: every talker type, empty and missing fields
+    with_checksum('GNGNS,023255.00,2218.07395,N,11410.74198,E,DDDD,28,0.62,9.0,-1.6,,0000,V'),
+    with_checksum('GPGGA,023256.00,,,,,0,00,99.99,,,,,,'),
+    with_checksum('GPRMC,023256.00,V,,,,,,,,,,N'),
+    with_checksum('GPRMC,235959.50,A,4807.038,S,01131.000,W,022.4,084.4,230394,003.1,W'),
+    with_checksum('GPVTG,054.7,T,034.4,M,005.5,N,010.2,K,A'),
+    with_checksum('GLGSV,1,1,02,71,02,267,,72,,,'),
+    with_checksum('GPGSA,A,1,,,,,,,,,,,,,,,'),
+    with_checksum('GPGGA,023256.00,2218.07403,N,11410.74192,E,1,08'),
+    # No checksum at all
+    '$GPGGA,023257.00,2218.07403,N,11410.74192,E,1,08,0.9,8.9,M,-1.6,M,,',
+]
+
+@pytest.mark.parametrize('sentence', SENTENCES)
+@pytest.mark.parametrize('timestamp', [None, 1621218691980])
+def test_decoder_matches_pynmea2_field_by_field(sentence, timestamp):
+    decoded = decode_sentence(sentence, timestamp)
+    expected = nmea_to_dict(pynmea2.parse(sentence), timestamp)
+    assert decoded is not None
+    assert list(decoded) == list(expected)
+    for field, value in expected.items():
+        assert decoded[field] == value, field
+        assert type(decoded[field]) is type(value), field
+
+def test_bad_checksum_is_rejected_like_pynmea2():
+    sentence = '$GNVTG,,T,,M,0.064,N,0.119,K,D*30'
+    with pytest.raises(ChecksumMismatch):
+        decode_sentence(sentence)
+    with pytest.raises(pynmea2.ChecksumError):
+        pynmea2.parse(sentence)
+
+@pytest.mark.parametrize('sentence', [
+    '$PUBX,00,023255.00,2218.07395,N,11410.74198,E,7.380,D3*00',  # Proprietary
+    with_checksum('GNZDA,023255.00,17,05,2021,00,00'),  # Not in the field tables
+    '$GNGGA,023255.00,2218.07395,N*ZZ',  # Malformed checksum
+    '$GN',  # Truncated
+    'GNGGA,023255.00,2218.07395,N',  # No '$'
+])
+def test_sentences_outside_the_tables_are_left_to_pynmea2(sentence):
+    assert decode_sentence(sentence) is None
+
+@pytest.mark.parametrize('line, expected', [
+    ('$GPGGA,023256.00,,,,,0,00,99.99,,,,,,*48,1621218691980', ('$GPGGA,023256.00,,,,,0,00,99.99,,,,,,*48', 1621218691980)),
+    ('$GPGGA,023256.00,,,,,0,00,99.99,,,,,,*48', ('$GPGGA,023256.00,,,,,0,00,99.99,,,,,,*48', None)),
+    # Short digit runs are sentence fields, not receive times
+    ('$GPGSV,3,1,10', ('$GPGSV,3,1,10', None)),
+    ('1621218691980', ('1621218691980', None)),
+])
+def test_split_log_timestamp(line, expected):
+    assert split_log_timestamp(line) == expected
+
+def test_decoded_logged_line_matches_pynmea2():
+    sentence, timestamp = split_log_timestamp(SENTENCES[1] + ',1621218775000')
+    assert timestamp == 1621218775000
+    assert decode_sentence(sentence, timestamp) == nmea_to_dict(pynmea2.parse(sentence), timestamp)
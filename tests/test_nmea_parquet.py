@@ -0,0 +1,28 @@
+import os
+import pytest
+
+# The converter module builds its LLM client on import, the checks below never call it
+for name in ('AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_API_VERSION', 'AZURE_OPENAI_ENDPOINT', 'AZURE_OPENAI_ENGINE'):
+    os.environ.setdefault(name, 'test')
+
+pq = pytest.importorskip('pyarrow.parquet')
+import pyarrow as pa
+from src.format_converter import convert_nmea_to_jsonl, validate_parquet
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads')
+F9P_NMEA = os.path.join(UPLOADS, 'UrbanNav-HK-Medium-Urban-1.ublox.f9p.nmea')
+
+@pytest.mark.skipif(not os.path.exists(F9P_NMEA), reason="UrbanNav f9p log not bundled")
+def test_f9p_nmea_converts_to_parquet(tmp_path):
+    # altitude is a float in GGA but a string in DTM/GNS sentences of the same log
+    output_file = str(tmp_path / 'f9p.parquet')
+    assert convert_nmea_to_jsonl(F9P_NMEA, output_file, output_format='parquet')
+    table = pq.read_table(output_file)
+    assert table.num_rows > 0
+    assert 'altitude' in table.column_names
+
+def test_validate_parquet_counts_rows_missing_any_required_field(tmp_path):
+    # Nulls in different rows of each column leave only two complete rows
+    output_file = str(tmp_path / 'records.parquet')
+    pq.write_table(pa.table({'timestamp_ms': [1, None, 3, 4], 'latitude': [None, 2.0, 3.0, 4.0]}), output_file)
+    assert validate_parquet(output_file, ['timestamp_ms', 'latitude']) == (True, 2, 4)
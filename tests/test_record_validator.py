@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+from src.record_validator import (
+    OBSERVATION_FIELDS, RANGE_RULES, iter_blocks, merge_reasons, records_to_columns, validate_batch,
+    validate_location_batch,
+)
+
+def location(**fields):
+    record = {'timestamp_ms': 1621218691000, 'latitude': 22.3, 'longitude': 114.17}
+    record.update(fields)
+    return record
+
+def signal(**fields):
+    record = {'timestamp_ms': 1621218691000, 'satellite_system': 'G', 'satellite_number': 5}
+    record.update(fields)
+    return record
+
+def record_without(field):
+    record = location()
+    del record[field]
+    return record
+
+def check(records):
+    accept, reasons = validate_location_batch(records)
+    assert accept.dtype == bool and accept.shape == (len(records),)
+    return accept.tolist(), reasons
+
+def test_valid_locations_pass():
+    records = [
+        location(),
+        location(altitude=-20.5, hdop=0.8, pdop=None, num_satellites='12', speed='3.5', course=359.9),
+        location(latitude='-33.86', longitude='151.2'),
+        location(latitude=-90, longitude=180, altitude=9000, speed=0, course=0),
+    ]
+    assert check(records) == ([True] * 4, {})
+
+@pytest.mark.parametrize('record, reason', [
+    ('not a record', 'not_a_record'),
+    (None, 'not_a_record'),
+    (record_without('timestamp_ms'), 'missing_timestamp_ms'),
+    (location(hdop='n/a'), 'non_numeric'),
+    (location(latitude=[22.3]), 'non_numeric'),
+    (location(latitude=None, longitude=None), 'no_position'),
+    (record_without('longitude'), 'no_position'),
+    (location(latitude=91.0), 'no_position'),
+    (location(longitude=-180.5), 'no_position'),
+    (location(latitude=float('nan')), 'no_position'),
+])
+def test_each_rejection_reason(record, reason):
+    # Valid records around the rejected one keep their place in the mask
+    assert check([location(), record, location()]) == ([True, False, True], {reason: 1})
+
+@pytest.mark.parametrize('field', sorted(RANGE_RULES))
+def test_range_limits_are_inclusive(field):
+    low, high = RANGE_RULES[field]
+    records = [location(**{field: low}), location(**{field: high}), location(**{field: low - 1}),
+               location(**{field: high + 1}), location(**{field: None})]
+    assert check(records) == ([True, True, False, False, True], {f"{field}_out_of_range": 2})
+
+@pytest.mark.parametrize('field', OBSERVATION_FIELDS)
+def test_any_single_observable_gives_a_signal_its_position(field):
+    assert check([signal(**{field: 1.5}), signal(**{field: None}), signal()]) == (
+        [True, False, False], {'no_position': 2},
+    )
+
+def test_first_failed_rule_counts_the_rejection():
+    records = [
+        {'latitude': 95.0, 'longitude': 114.0, 'hdop': 'x'},  # missing timestamp, non-numeric and no position
+        location(latitude=95.0, hdop='x'),  # non-numeric and no position
+        location(latitude=95.0, speed=500),  # no position and speed out of range
+        location(speed=500, course=400),  # two ranges, speed is checked first
+    ]
+    accept, reasons = check(records)
+    assert accept == [False] * 4
+    assert reasons == {'missing_timestamp_ms': 1, 'non_numeric': 1, 'no_position': 1, 'speed_out_of_range': 1}
+    assert sum(reasons.values()) == len(records)
+
+def test_mask_matches_record_by_record_validation():
+    rng = np.random.default_rng(7)
+    values = [None, 'text', 1.0, -1.0, 45.0, 95.0, 200.0, '12.5']
+    fields = ['timestamp_ms', 'latitude', 'longitude', 'altitude', 'hdop', 'speed', 'course', 'pseudorange']
+    records = []
+    for _ in range(500):
+        record = {field: values[rng.integers(len(values))] for field in fields if rng.random() < 0.8}
+        records.append(record)
+    accept, _ = check(records)
+    assert accept == [check([record])[0][0] for record in records]
+
+def test_empty_batch():
+    accept, reasons = validate_location_batch([])
+    assert accept.shape == (0,) and reasons == {}
+
+def test_records_to_columns_tells_missing_from_none():
+    is_record, columns, present, non_numeric = records_to_columns(
+        [{'a': 1}, {'a': None}, {}, 'x', {'a': 'bad'}, {'a': '2.5'}], ['a'],
+    )
+    assert is_record.tolist() == [True, True, True, False, True, True]
+    assert present['a'].tolist() == [True, True, False, False, True, True]
+    assert non_numeric['a'].tolist() == [False, False, False, False, True, False]
+    assert np.array_equal(columns['a'], [1.0, np.nan, np.nan, np.nan, np.nan, 2.5], equal_nan=True)
+
+def test_any_of_and_required_rules():
+    accept, reasons = validate_batch(
+        [{'t': 1, 'x': 1}, {'t': 1}, {'x': 1}], required=('t',), any_of=('x', 'y'),
+    )
+    assert accept.tolist() == [True, False, False]
+    assert reasons == {'missing_t': 1, 'no_positioning_fields': 1}
+
+def test_blocks_and_reason_totals():
+    assert [len(block) for block in iter_blocks(range(25), 10)] == [10, 10, 5]
+    assert list(iter_blocks([], 10)) == []
+    total = {}
+    merge_reasons(total, {'no_position': 2})
+    assert merge_reasons(total, {'no_position': 1, 'non_numeric': 3}) == {'no_position': 3, 'non_numeric': 3}
@@ -0,0 +1,133 @@
+import json
+import os
+import pytest
+
+# The resampler reads records through the extractor, which builds its LLM client on import
+for name in ('AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_API_VERSION', 'AZURE_OPENAI_ENDPOINT', 'AZURE_OPENAI_ENGINE'):
+    os.environ.setdefault(name, 'test')
+
+from src.resampler import (
+    MAX_INTERPOLATION_GAP_MS, Resampler, iter_epochs, iter_resampled, new_resample_counts, resample_location_file,
+)
+from src.timestamp_index import load_index
+
+# A whole second, so 1 Hz and 2 Hz targets fall on START_MS
+START_MS = 1621218691000
+
+def fix(offset_ms, latitude=22.0, longitude=114.0, **fields):
+    record = {'timestamp_ms': START_MS + offset_ms, 'latitude': latitude, 'longitude': longitude}
+    record.update(fields)
+    return record
+
+def times(records):
+    return [record['timestamp_ms'] - START_MS for record in records]
+
+def test_nearest_decimates_to_the_closest_epochs():
+    records = [fix(offset) for offset in range(30, 3000, 100)]
+    output = list(iter_resampled(records, 1.0))
+    assert times(output) == [30, 1030, 2030, 2930]
+    # The chosen records are passed on as they are
+    assert output[1] is records[10]
+
+def test_nearest_ties_keep_the_earlier_epoch():
+    records = [fix(offset) for offset in (-50, 50, 950, 1050)]
+    assert times(iter_resampled(records, 1.0)) == [-50, 950]
+
+def test_nearest_never_repeats_an_epoch_when_upsampling():
+    records = [fix(0), fix(1000), fix(1240)]
+    # 4 Hz targets: 0 250 500 750 1000 1250, 1000 and 1240 are both within 125 ms of their targets
+    assert times(iter_resampled(records, 4.0)) == [0, 1000, 1240]
+
+def test_nearest_leaves_gaps_empty():
+    records = [fix(0), fix(1000), fix(9000), fix(10000)]
+    assert times(iter_resampled(records, 1.0)) == [0, 1000, 9000, 10000]
+
+def test_nearest_keeps_multi_record_epochs_whole():
+    records = [fix(0, sv=sv) for sv in ('G01', 'G02')] + [fix(500, sv='G01')] + [fix(1000, sv=sv) for sv in ('G01', 'G03')]
+    output = list(iter_resampled(records, 1.0))
+    assert [(record['timestamp_ms'] - START_MS, record['sv']) for record in output] == [
+        (0, 'G01'), (0, 'G02'), (1000, 'G01'), (1000, 'G03'),
+    ]
+
+def test_linear_interpolates_between_epochs():
+    records = [
+        fix(0, 22.0, 114.0, altitude=10.0, speed=2.0, course=350.0, hdop=0.9, quality=1),
+        fix(1000, 22.1, 114.2, altitude=20.0, speed=4.0, course=10.0, hdop=1.5, quality=2),
+    ]
+    output = list(iter_resampled(records, 4.0, 'linear'))
+    assert times(output) == [0, 250, 500, 750, 1000]
+    quarter = output[1]
+    assert quarter['latitude'] == pytest.approx(22.025)
+    assert quarter['longitude'] == pytest.approx(114.05)
+    assert (quarter['altitude'], quarter['speed']) == (pytest.approx(12.5), pytest.approx(2.5))
+    # Course turns the short way through north
+    assert quarter['course'] == pytest.approx(355.0)
+    assert output[2]['course'] == pytest.approx(0.0)
+    # Other fields come from the nearer epoch
+    assert (quarter['hdop'], quarter['quality']) == (0.9, 1)
+    assert (output[3]['hdop'], output[3]['quality']) == (1.5, 2)
+    # Records on a target are copies of the input records
+    assert output[0] == records[0] and output[0] is not records[0]
+
+def test_linear_targets_off_the_input_epochs():
+    records = [fix(300, 22.0), fix(1300, 23.0), fix(2300, 24.0)]
+    output = list(iter_resampled(records, 1.0, 'linear'))
+    # Targets before the first epoch and after the last one are left out
+    assert times(output) == [1000, 2000]
+    assert [record['latitude'] for record in output] == [pytest.approx(22.7), pytest.approx(23.7)]
+
+def test_linear_leaves_out_targets_in_gaps():
+    records = [fix(0, 22.0), fix(1000, 22.1), fix(1000 + MAX_INTERPOLATION_GAP_MS + 1000, 23.0),
+               fix(2000 + MAX_INTERPOLATION_GAP_MS + 1000, 23.1)]
+    output = list(iter_resampled(records, 2.0, 'linear'))
+    assert times(output) == [0, 500, 1000, 7000, 7500, 8000]
+    assert output[1]['latitude'] == pytest.approx(22.05)
+
+def test_linear_gap_limit_is_configurable():
+    resampler = Resampler(1.0, 'linear', max_gap_ms=10000)
+    output = resampler.add(START_MS, [fix(0, 22.0)]) + resampler.add(START_MS + 8000, [fix(8000, 23.0)])
+    assert times(output) == list(range(0, 9000, 1000))
+    assert output[4]['latitude'] == pytest.approx(22.5)
+    assert resampler.flush() == []
+
+def test_linear_falls_back_to_nearest_for_epochs_it_cannot_interpolate():
+    records = [fix(0, sv='G01'), fix(0, sv='G02'), fix(1000, latitude=None), fix(2000)]
+    output = list(iter_resampled(records, 1.0, 'linear'))
+    assert times(output) == [0, 0, 1000, 2000]
+    assert output[2]['latitude'] is None
+
+def test_epochs_group_records_and_drop_the_ones_going_back():
+    counts = new_resample_counts()
+    records = [fix(0, sv='G01'), fix(0, sv='G02'), {'latitude': 22.0}, 'text', fix(1000), fix(500), fix(1000), fix(2000)]
+    epochs = list(iter_epochs(records, counts))
+    assert [(t - START_MS, len(epoch)) for t, epoch in epochs] == [(0, 2), (1000, 2), (2000, 1)]
+    assert (counts['skipped'], counts['out_of_order']) == (2, 1)
+
+def test_counts():
+    counts = new_resample_counts()
+    list(iter_resampled([fix(offset) for offset in range(0, 2000, 100)], 1.0, counts=counts))
+    assert counts == {'input': 20, 'epochs': 20, 'output': 3, 'skipped': 0, 'out_of_order': 0}
+
+@pytest.mark.parametrize('rate_hz, method', [(0, 'nearest'), (-1, 'linear'), (1, 'cubic')])
+def test_invalid_settings(rate_hz, method):
+    with pytest.raises(ValueError):
+        Resampler(rate_hz, method)
+
+def test_resample_file_in_place(tmp_path):
+    path = str(tmp_path / 'locations.jsonl')
+    with open(path, 'w') as f:
+        for offset in range(0, 3000, 100):
+            f.write(json.dumps(fix(offset, 22.0 + offset / 1e5)) + '\n')
+    assert resample_location_file(path, path, 2.0, 'linear') == path
+    with open(path) as f:
+        output = [json.loads(line) for line in f]
+    assert times(output) == [0, 500, 1000, 1500, 2000, 2500]
+    assert load_index(path)['size'] == os.path.getsize(path)
+    assert not os.path.exists(path + '.resampling')
+
+def test_resample_without_timed_records_fails_and_keeps_the_input(tmp_path):
+    path = str(tmp_path / 'locations.jsonl')
+    with open(path, 'w') as f:
+        f.write(json.dumps({'latitude': 22.0, 'longitude': 114.0}) + '\n')
+    assert resample_location_file(path, path, 1.0) is None
+    assert os.path.getsize(path) > 0 and not os.path.exists(path + '.resampling')
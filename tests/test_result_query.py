@@ -0,0 +1,120 @@
+import pytest
+from src.columnar_writer import ColumnarWriter, parquet_available
+from src.json_encoder import JsonlWriter
+from src.result_query import in_bbox, is_result_file, parse_bbox, parse_fields, parse_time_ms, query_records
+
+# Span of the test track, row groups of the Parquet result cover one minute each
+TRACK_SECONDS = 300
+
+def make_track():
+    """One record per second moving north-east, a few without a position and one without a time"""
+    records = []
+    for second in range(TRACK_SECONDS):
+        positioned = second % 50 != 7
+        records.append({
+            'timestamp_ms': 1700000000000 + second * 1000,
+            'latitude': 22.3 + second * 1e-4 if positioned else None,
+            'longitude': 114.1 + second * 1e-4 if positioned else None,
+            'sentence_type': 'GGA',
+        })
+    records.insert(150, {'timestamp_ms': None, 'latitude': 22.31, 'longitude': 114.11, 'sentence_type': 'TXT'})
+    return records
+
+def expected(records, start_ms=None, end_ms=None, bbox=None, fields=None):
+    """Brute-force reference for query_records"""
+    found = []
+    for record in records:
+        if start_ms is not None or end_ms is not None:
+            timestamp = record['timestamp_ms']
+            if timestamp is None or (start_ms is not None and timestamp < start_ms) or (end_ms is not None and timestamp > end_ms):
+                continue
+        if bbox is not None and not in_bbox(record, bbox):
+            continue
+        if fields is not None:
+            record = {field: record[field] for field in fields if field in record}
+        found.append(record)
+    return found
+
+@pytest.fixture(params=['jsonl', 'parquet'])
+def result_file(request, tmp_path):
+    records = make_track()
+    if request.param == 'jsonl':
+        path = str(tmp_path / 'locations.jsonl')
+        with JsonlWriter(path, index=True) as writer:
+            for record in records:
+                writer.write(record)
+    else:
+        if not parquet_available():
+            pytest.skip("pyarrow not installed")
+        path = str(tmp_path / 'locations.parquet')
+        with ColumnarWriter(path) as writer:
+            writer.write_records(records)
+    return path, records
+
+# Queries as the /query endpoint parses them: start, end, bbox, fields
+QUERIES = [
+    (None, None, None, None),
+    ('1700000000000', '1700000000000', None, None),
+    ('2023-11-14T22:14:00Z', '2023-11-14T22:15:00.500Z', None, None),
+    ('1700000059000', '1700000061000', None, None),
+    ('1700000250000', None, None, None),
+    (None, '1700000010000', None, None),
+    ('1699999000000', '1699999999999', None, None),
+    (None, None, '22.305,114.105,22.31,114.11', None),
+    ('1700000000000', '1700000100000', '22.305,114.105,22.31,114.11', None),
+    (None, None, None, 'timestamp_ms,latitude'),
+    ('1700000120000', '1700000180000', '22.3,114.1,22.33,114.13', 'longitude, missing'),
+]
+
+@pytest.mark.parametrize('start, end, bbox, fields', QUERIES)
+def test_query_matches_brute_force(result_file, start, end, bbox, fields):
+    path, records = result_file
+    query = parse_time_ms(start), parse_time_ms(end), parse_bbox(bbox), parse_fields(fields)
+    assert list(query_records(path, *query)) == expected(records, *query)
+
+def test_untimed_records_only_without_window(result_file):
+    path, _ = result_file
+    untimed = [record for record in query_records(path) if record['timestamp_ms'] is None]
+    assert [record['sentence_type'] for record in untimed] == ['TXT']
+    assert all(record['timestamp_ms'] is not None for record in query_records(path, 0, None))
+
+def test_bbox_drops_records_without_position(result_file):
+    path, _ = result_file
+    found = list(query_records(path, bbox=(-90, -180, 90, 180)))
+    assert len(found) == TRACK_SECONDS + 1 - TRACK_SECONDS // 50
+    assert all(record['latitude'] is not None for record in found)
+
+def test_parse_time_ms():
+    assert parse_time_ms(None) is None
+    assert parse_time_ms('') is None
+    assert parse_time_ms(' 1700000000000 ') == 1700000000000
+    assert parse_time_ms('-5') == -5
+    assert parse_time_ms('1970-01-01T00:00:01') == 1000
+    assert parse_time_ms('1970-01-01T00:00:01.250Z') == 1250
+    assert parse_time_ms('1970-01-01T02:00:00+02:00') == 0
+    with pytest.raises(ValueError):
+        parse_time_ms('yesterday')
+
+def test_parse_bbox():
+    assert parse_bbox(None) is None
+    assert parse_bbox('') is None
+    assert parse_bbox('22.3, 114.1, 22.4, 114.2') == (22.3, 114.1, 22.4, 114.2)
+    for value in ('22.3,114.1,22.4', '22.4,114.1,22.3,114.2', '22.3,114.2,22.4,114.1', 'a,b,c,d'):
+        with pytest.raises(ValueError):
+            parse_bbox(value)
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields('') is None
+    assert parse_fields(' latitude, ,longitude ') == ['latitude', 'longitude']
+
+@pytest.mark.parametrize('filename, result', [
+    ('locations.jsonl', True),
+    ('satellites.PARQUET', True),
+    ('3f2b6c1e-8a4d-4e57-9b1a-2c6d8e0f4a7b.jsonl', False),
+    ('locations.jsonl.idx', False),
+    ('upload.nmea', False),
+    ('notes.txt', False),
+])
+def test_is_result_file(filename, result):
+    assert is_result_file(filename) is result
@@ -0,0 +1,109 @@
+import os
+import pandas as pd
+import pytest
+
+# The converter module builds its LLM client on import, the checks below never call it
+for name in ('AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_API_VERSION', 'AZURE_OPENAI_ENDPOINT', 'AZURE_OPENAI_ENGINE'):
+    os.environ.setdefault(name, 'test')
+
+from src.rinex_reader import (
+    RINEX_SYSTEMS, iter_rinex3_epochs, iter_rinex3_frames, read_rinex3_header, split_epoch_ranges,
+)
+from src.format_converter import convert_rinex_to_jsonl
+
+gr = pytest.importorskip('georinex')
+
+# Header and first 12 epochs of the UrbanNav F9P observations (GPS, GLONASS, Galileo, QZSS, SBAS, BeiDou)
+F9P_HEAD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'urbannav_f9p_head.obs')
+
+def header_line(content, label):
+    """A RINEX header line: content in columns 1-60, label in 61-80"""
+    return f"{content:<60}{label:<20}\n"
+
+def write_header(path, first_line, body=''):
+    with open(path, 'w') as f:
+        f.write(first_line)
+        f.write(header_line('G    4 C1C L1C D1C S1C', 'SYS / # / OBS TYPES'))
+        f.write(header_line('', 'END OF HEADER'))
+        f.write(body)
+    return path
+
+@pytest.mark.filterwarnings('ignore::FutureWarning')
+def test_native_reader_matches_georinex():
+    native = pd.concat(list(iter_rinex3_frames(F9P_HEAD, use=RINEX_SYSTEMS)), ignore_index=True)
+    reference = gr.load(F9P_HEAD, use=RINEX_SYSTEMS).to_dataframe().reset_index()
+    columns = [column for column in native.columns if column not in ('time', 'sv')]
+    assert set(columns) <= set(reference.columns)
+
+    # georinex keeps a row for every satellite of the file in every epoch
+    reference = reference.dropna(subset=columns, how='all')
+    native = native.dropna(subset=columns, how='all')
+    reference = reference.sort_values(['time', 'sv']).reset_index(drop=True)[['time', 'sv'] + columns]
+    native = native.sort_values(['time', 'sv']).reset_index(drop=True)
+    assert len(native) > 200
+    pd.testing.assert_frame_equal(native, reference, check_dtype=False)
+
+def test_header_lists_observation_types_per_system():
+    header = read_rinex3_header(F9P_HEAD)
+    assert header['version'] == 3.03
+    assert header['obs_types']['G'][:4] == ['C1C', 'L1C', 'D1C', 'S1C']
+    assert set(header['obs_types']) == {'G', 'R', 'E', 'J', 'S', 'C'}
+    with open(F9P_HEAD, 'rb') as f:
+        assert f.read(header['header_bytes']).rstrip().endswith(b'END OF HEADER')
+
+def test_epochs_are_read_in_order_with_every_satellite():
+    epochs = list(iter_rinex3_epochs(F9P_HEAD))
+    assert len(epochs) == 12
+    times = [time for time, _ in epochs]
+    assert times == sorted(times)
+    for _, satellites in epochs:
+        assert [sv for sv, _ in satellites] == sorted(sv for sv, _ in satellites)
+
+def test_crinex_is_left_to_georinex(tmp_path):
+    path = write_header(
+        str(tmp_path / 'hatanaka.crx'),
+        header_line('3.0                 COMPACT RINEX FORMAT', 'CRINEX VERS   / TYPE')
+        + header_line('     3.03           OBSERVATION DATA    M', 'RINEX VERSION / TYPE'),
+    )
+    assert read_rinex3_header(path) is None
+    with pytest.raises(ValueError):
+        next(iter_rinex3_epochs(path))
+
+@pytest.mark.parametrize('first_line', [
+    header_line('     2.11           OBSERVATION DATA    G (GPS)', 'RINEX VERSION / TYPE'),
+    header_line('     3.04           N: GNSS NAV DATA    M: Mixed', 'RINEX VERSION / TYPE'),
+    header_line('     4.00           OBSERVATION DATA    M', 'RINEX VERSION / TYPE'),
+    header_line('     x.yz           OBSERVATION DATA    M', 'RINEX VERSION / TYPE'),
+])
+def test_other_versions_and_types_are_left_to_georinex(tmp_path, first_line):
+    assert read_rinex3_header(write_header(str(tmp_path / 'other.obs'), first_line)) is None
+
+def test_truncated_header_is_declined(tmp_path):
+    path = str(tmp_path / 'truncated.obs')
+    with open(path, 'w') as f:
+        f.write(header_line('     3.03           OBSERVATION DATA    M', 'RINEX VERSION / TYPE'))
+    assert read_rinex3_header(path) is None
+
+@pytest.mark.parametrize('parts', [2, 3, 5, 40])
+def test_epoch_ranges_cover_the_body_at_epoch_records(parts):
+    header = read_rinex3_header(F9P_HEAD)
+    ranges = split_epoch_ranges(F9P_HEAD, header, parts)
+    assert 1 < len(ranges) <= parts
+    assert ranges[0][0] == header['header_bytes'] and ranges[-1][1] == os.path.getsize(F9P_HEAD)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    with open(F9P_HEAD, 'rb') as f:
+        for start, _ in ranges:
+            f.seek(start)
+            assert f.read(1) == b'>'
+
+    # Reading the ranges one after another gives the serial epochs
+    sharded = [epoch for start, end in ranges for epoch in iter_rinex3_epochs(F9P_HEAD, header, start=start, end=end)]
+    assert sharded == list(iter_rinex3_epochs(F9P_HEAD, header))
+
+def test_parallel_conversion_matches_serial(tmp_path, capsys):
+    serial, parallel = str(tmp_path / 'serial.jsonl'), str(tmp_path / 'parallel.jsonl')
+    assert convert_rinex_to_jsonl(F9P_HEAD, serial, workers=1)
+    assert convert_rinex_to_jsonl(F9P_HEAD, parallel, workers=3)
+    assert "3 shards in parallel" in capsys.readouterr().out
+    with open(serial, 'rb') as f, open(parallel, 'rb') as g:
+        assert f.read() == g.read()
@@ -0,0 +1,49 @@
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# The processor module builds its LLM client on import, the checks below never call it
+for name in ('AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_API_VERSION', 'AZURE_OPENAI_ENDPOINT', 'AZURE_OPENAI_ENGINE'):
+    os.environ.setdefault(name, 'test')
+
+from src.gnss_processor import rinex_frame_records
+
+def iterrows_records(df):
+    """Row-by-row conversion that rinex_frame_records replaced, kept as the reference"""
+    records = []
+    for _, row in df.iterrows():
+        sv = row.get('sv', '')
+        if isinstance(sv, str) and ' ' in sv:
+            sat_sys, sat_num = sv.split()
+        else:
+            sat_sys = sv[:1] if isinstance(sv, str) and sv else None
+            sat_num = sv[1:] if isinstance(sv, str) and len(sv) > 1 else None
+        record = {
+            'timestamp': row.get('time'),
+            'satellite_system': sat_sys,
+            'satellite_number': sat_num,
+            'pseudorange': float(row.get('C1', 0)) if pd.notna(row.get('C1')) else None,
+            'carrier_phase': float(row.get('L1', 0)) if pd.notna(row.get('L1')) else None,
+            'doppler': float(row.get('D1', 0)) if pd.notna(row.get('D1')) else None,
+            'signal_strength': float(row.get('S1', 0)) if pd.notna(row.get('S1')) else None,
+        }
+        if any(v is not None and v != 0 for v in [record['pseudorange'], record['carrier_phase'], record['doppler'], record['signal_strength']]):
+            records.append(record)
+    return records
+
+def test_vectorized_records_match_iterrows_with_blank_sv():
+    time = datetime(2021, 5, 17, 2, 33, 13)
+    df = pd.DataFrame({
+        'time': [time] * 7,
+        # Blank IDs right after filled ones must not inherit the previous row's system and number
+        'sv': ['G01', '', 'R 7', '', 'E', 'C12', 'J03'],
+        'C1': [2.1e7, 2.2e7, np.nan, 2.3e7, 2.4e7, np.nan, 0.0],
+        'L1': [1.1e8, np.nan, 1.2e8, np.nan, np.nan, np.nan, 0.0],
+        'D1': [np.nan, 12.5, np.nan, np.nan, -3.0, np.nan, np.nan],
+        'S1': [40.0, np.nan, 35.0, 20.0, np.nan, np.nan, np.nan],
+    })
+    records = rinex_frame_records(df)
+    assert records == iterrows_records(df)
+    assert [record['satellite_system'] for record in records] == ['G', None, 'R', None, 'E']
+    assert [record['satellite_number'] for record in records] == ['01', None, '7', None, None]
@@ -0,0 +1,76 @@
+import os
+import time
+import pytest
+
+# Sandboxes preload the converter modules, which build their LLM client on import
+for name in ('AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_API_VERSION', 'AZURE_OPENAI_ENDPOINT', 'AZURE_OPENAI_ENGINE'):
+    os.environ.setdefault(name, 'test')
+
+from src.sandbox_pool import SandboxError, SandboxPool, exit_code
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason="sandboxes fork a child per job")
+
+def spin():
+    """Busy loop that never returns"""
+    while True:
+        pass
+
+def allocate(megabytes):
+    """Hold megabytes of memory and report how much was allocated"""
+    block = bytearray(megabytes * 1024 * 1024)
+    return len(block)
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = SandboxPool(size=1)
+    pool.start()
+    yield pool
+    pool.close()
+
+def test_exit_code_decodes_waitpid_status():
+    pid = os.fork()
+    if pid == 0:
+        os._exit(3)
+    assert exit_code(os.waitpid(pid, 0)[1]) == 3
+    pid = os.fork()
+    if pid == 0:
+        os.kill(os.getpid(), 9)
+    assert exit_code(os.waitpid(pid, 0)[1]) == -9
+
+def test_job_result_and_output(pool):
+    lines = []
+    assert pool.run('os.path:join', ['a', 'b'], on_output=lines.append) == os.path.join('a', 'b')
+    assert pool.run('builtins:print', ['hello'], on_output=lines.append) is None
+    assert lines == ['hello']
+
+def test_runaway_loop_is_killed_at_the_timeout(pool):
+    start = time.monotonic()
+    with pytest.raises(SandboxError, match="Timed out"):
+        pool.run('tests.test_sandbox_pool:spin', [], timeout=1, cpu_seconds=0)
+    assert time.monotonic() - start < 30
+    # The sandbox only lost its child and takes the next job
+    assert pool.run('os.path:basename', ['/x/y']) == 'y'
+
+def test_cpu_limit_ends_a_busy_job(pool):
+    with pytest.raises(SandboxError, match="CPU time limit"):
+        pool.run('tests.test_sandbox_pool:spin', [], timeout=60, cpu_seconds=1)
+    assert pool.run('os.path:basename', ['/x/y']) == 'y'
+
+def test_memory_limit_stops_a_large_allocation(pool):
+    with pytest.raises(SandboxError, match="MemoryError"):
+        pool.run('tests.test_sandbox_pool:allocate', [64 * 1024], memory_mb=4096)
+    assert pool.run('tests.test_sandbox_pool:allocate', [16], memory_mb=4096) == 16 * 1024 * 1024
+
+def test_dead_sandbox_is_replaced(pool):
+    pool.start()
+    sandbox = pool._idle[0]
+    sandbox.kill()
+    sandbox.wait()
+    # The dead sandbox is pruned and a new one serves the job
+    assert pool.run('os.path:basename', ['/x/y']) == 'y'
+    assert pool._idle and pool._idle[0] is not sandbox and pool._idle[0].poll() is None
+
+def test_job_that_kills_its_process_does_not_take_down_the_pool(pool):
+    with pytest.raises(SandboxError, match="exited with code 7"):
+        pool.run('os:_exit', [7])
+    assert pool.run('os.path:basename', ['/x/y']) == 'y'
@@ -0,0 +1,92 @@
+import os
+import pytest
+
+# The extractor builds its LLM client on import, sampling never calls it
+for name in ('AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_API_VERSION', 'AZURE_OPENAI_ENDPOINT', 'AZURE_OPENAI_ENGINE'):
+    os.environ.setdefault(name, 'test')
+
+from src.stream_reader import decode_block, iter_lines, split_line_ranges
+from src.location_extractor import LLM_SAMPLE_HEAD_LINES, LLM_SAMPLE_MAX_LINES, read_sample_lines
+
+# Lines with multi-byte UTF-8, invalid UTF-8 (latin1), CRLF, bare CR and empty lines
+MIXED_CONTENT = (
+    b'$GPGGA,023255.00,2218.07,N,11410.73,E,1,07,1.0,10.9,M,-1.3,M,,*5D\r\n'
+    b'{"note": "caf\xc3\xa9 \xe2\x82\xac"}\n'
+    b'latin1 caf\xe9\r\n'
+    b'\n'
+    b'bare cr\rline\r\n'
+    b'\xff\xfe binary \x00 bytes\n'
+    b'last line without newline'
+)
+
+def write(tmp_path, content, name='input.txt'):
+    path = str(tmp_path / name)
+    with open(path, 'wb') as f:
+        f.write(content)
+    return path
+
+@pytest.mark.parametrize('chunk_size', [40, 41, 42, 43, 64, 70, 100, 1 << 20])
+def test_lines_do_not_depend_on_chunk_boundaries(tmp_path, chunk_size):
+    # Every chunk size from 40 on holds the longest line, boundaries fall inside lines, CRLFs and UTF-8 sequences
+    path = write(tmp_path, MIXED_CONTENT)
+    assert list(iter_lines(path, chunk_size)) == decode_block(MIXED_CONTENT).splitlines()
+
+@pytest.mark.parametrize('chunk_size', range(2, 12))
+def test_crlf_split_across_chunks_is_one_line_break(tmp_path, chunk_size):
+    path = write(tmp_path, b'ab\r\ncd\r\n\r\nef\rgh\r\n')
+    assert list(iter_lines(path, chunk_size)) == ['ab', 'cd', '', 'ef', 'gh']
+
+def test_line_split_across_chunk_boundary(tmp_path):
+    path = write(tmp_path, b'first line\nsecond line\n')
+    # The first chunk ends inside "second"
+    assert list(iter_lines(path, 14)) == ['first line', 'second line']
+
+def test_latin1_fallback_is_per_line(tmp_path):
+    path = write(tmp_path, 'café €\n'.encode('utf-8') + b'caf\xe9\n' + 'naïve\n'.encode('utf-8'))
+    # Only the invalid line is decoded as latin1, its UTF-8 neighbours keep their characters
+    assert list(iter_lines(path, 12)) == ['café €', 'café', 'naïve']
+    assert list(iter_lines(path)) == ['café €', 'café', 'naïve']
+
+def test_utf8_character_split_across_chunk_boundary(tmp_path):
+    line = 'grüße €€€'
+    path = write(tmp_path, (line + '\n').encode('utf-8') * 3)
+    for chunk_size in range(len(line.encode('utf-8')) + 1, 40):
+        assert list(iter_lines(path, chunk_size)) == [line] * 3
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 1000])
+def test_carried_over_tail_is_bounded(tmp_path, chunk_size):
+    # Data without line breaks is handed out in lines of at most twice the chunk size
+    content = bytes(range(32, 127)) * 50 + b'\nend\n'
+    path = write(tmp_path, content)
+    lines = list(iter_lines(path, chunk_size))
+    assert max(len(line) for line in lines) <= 2 * chunk_size
+    assert ''.join(lines) == content.decode('ascii').replace('\n', '')
+
+def test_byte_ranges_give_the_lines_of_the_whole_file(tmp_path):
+    path = write(tmp_path, b''.join(b'line %d\n' % i for i in range(100)))
+    for parts in (1, 3, 7):
+        lines = [line for start, end in split_line_ranges(path, parts) for line in iter_lines(path, 16, start, end)]
+        assert lines == [f'line {i}' for i in range(100)]
+
+def test_empty_file(tmp_path):
+    assert list(iter_lines(write(tmp_path, b''))) == []
+
+def test_llm_sample_adds_unseen_message_types_after_the_head(tmp_path):
+    lines = [f'$GPGGA,{i}*00' for i in range(LLM_SAMPLE_HEAD_LINES)]
+    lines += ['$GPGGA,late*00', '$GPRMC,1*00', 'not a record', '{"sentence_type": "VTG"}', '$GPRMC,2*00', '[1, 2]']
+    lines += [f'$GPX{i:02d},*00' for i in range(50)]
+    path = write(tmp_path, '\n'.join(lines).encode('utf-8'))
+    sample = read_sample_lines(path)
+    assert sample[:LLM_SAMPLE_HEAD_LINES] == lines[:LLM_SAMPLE_HEAD_LINES]
+    assert sample[LLM_SAMPLE_HEAD_LINES:LLM_SAMPLE_HEAD_LINES + 2] == ['$GPRMC,1*00', '{"sentence_type": "VTG"}']
+    assert len(sample) == LLM_SAMPLE_MAX_LINES
+
+def test_llm_sample_scans_a_bounded_number_of_lines(tmp_path):
+    lines = ['$GPGGA,*00'] * 20 + ['$GPRMC,*00']
+    path = write(tmp_path, '\n'.join(lines).encode('utf-8'))
+    assert read_sample_lines(path, head=2, scan=10) == ['$GPGGA,*00'] * 2
+    assert read_sample_lines(path, head=2, scan=19) == ['$GPGGA,*00'] * 2 + ['$GPRMC,*00']
+
+def test_llm_sample_of_a_short_file(tmp_path):
+    path = write(tmp_path, b'one\ntwo\n')
+    assert read_sample_lines(path) == ['one', 'two']
@@ -0,0 +1,197 @@
+import json
+import os
+import random
+import pytest
+from src.json_encoder import JsonlWriter
+from src.timestamp_index import (
+    INDEX_STRIDE, build_index, ensure_index, index_path, iter_window, load_index, merge_indexes,
+    truncate_records, window_ranges,
+)
+
+def make_records(count, first=0, step=10):
+    """Records with timestamp_ms first, first + step, ... and their position as value"""
+    return [{'timestamp_ms': first + i * step, 'value': i} for i in range(count)]
+
+def write_records(path, records, append=False):
+    with JsonlWriter(path, index=True, append=append) as writer:
+        for record in records:
+            writer.write(record)
+
+def read_records(path):
+    with open(path, 'rb') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def in_window(records, start_ms, end_ms):
+    """Brute-force reference for iter_window"""
+    return [
+        record for record in records
+        if record.get('timestamp_ms') is not None
+        and (start_ms is None or record['timestamp_ms'] >= start_ms)
+        and (end_ms is None or record['timestamp_ms'] <= end_ms)
+    ]
+
+@pytest.fixture
+def indexed(tmp_path):
+    """A sorted, indexed JSONL output of 2.5 index blocks"""
+    path = str(tmp_path / 'records.jsonl')
+    records = make_records(INDEX_STRIDE * 2 + INDEX_STRIDE // 2)
+    write_records(path, records)
+    return path, records
+
+# Record positions around the block boundaries at INDEX_STRIDE and 2 * INDEX_STRIDE
+BOUNDARY_WINDOWS = [
+    (INDEX_STRIDE - 1, INDEX_STRIDE - 1),
+    (INDEX_STRIDE, INDEX_STRIDE),
+    (INDEX_STRIDE - 1, INDEX_STRIDE),
+    (INDEX_STRIDE * 2 - 1, INDEX_STRIDE * 2 + 3),
+    (0, 0),
+    (INDEX_STRIDE * 2 + INDEX_STRIDE // 2 - 1, None),
+    (None, INDEX_STRIDE),
+    (None, None),
+]
+
+@pytest.mark.parametrize('first, last', BOUNDARY_WINDOWS)
+def test_window_at_block_boundaries(indexed, first, last):
+    path, records = indexed
+    start_ms = None if first is None else first * 10
+    end_ms = None if last is None else last * 10
+    assert list(iter_window(path, start_ms, end_ms)) == in_window(records, start_ms, end_ms)
+
+@pytest.mark.parametrize('start_ms, end_ms', [(5, 5), (-100, -1), (10 ** 9, None), (25, 24)])
+def test_windows_between_or_outside_records_are_empty(indexed, start_ms, end_ms):
+    path, _ = indexed
+    assert list(iter_window(path, start_ms, end_ms)) == []
+
+def test_window_reads_only_the_overlapping_blocks(indexed):
+    path, _ = indexed
+    index = load_index(path)
+    assert index['sorted'] and len(index['checkpoints']) == 3
+    second = index['checkpoints'][1]
+    assert window_ranges(index, second[1], second[2]) == [[second[0], index['checkpoints'][2][0]]]
+    # A window across a boundary reads both blocks as one range
+    assert window_ranges(index, second[2], second[2] + 10) == [[second[0], index['size']]]
+
+def test_unsorted_records_fall_back_to_block_bounds(tmp_path):
+    path = str(tmp_path / 'unsorted.jsonl')
+    records = make_records(INDEX_STRIDE * 3)
+    random.Random(1).shuffle(records)
+    write_records(path, records)
+    assert not load_index(path)['sorted']
+    for start_ms, end_ms in [(0, 0), (9990, 10010), (100, 25000), (None, 500)]:
+        assert list(iter_window(path, start_ms, end_ms)) == in_window(records, start_ms, end_ms)
+
+def test_records_without_timestamp_only_match_without_window(tmp_path):
+    path = str(tmp_path / 'mixed.jsonl')
+    records = make_records(10)
+    records[3:6] = [{'value': 'untimed'}] * 3
+    write_records(path, records)
+    assert list(iter_window(path)) == records
+    assert list(iter_window(path, 0, 100)) == in_window(records, 0, 100)
+
+def test_append_continues_the_index(tmp_path):
+    path = str(tmp_path / 'appended.jsonl')
+    records = make_records(INDEX_STRIDE + 500)
+    write_records(path, records[:INDEX_STRIDE // 2 + 7])
+    write_records(path, records[INDEX_STRIDE // 2 + 7:], append=True)
+    assert read_records(path) == records
+    index = load_index(path)
+    assert index is not None and index['size'] == os.path.getsize(path) and index['sorted']
+    for start_ms, end_ms in [(5060, 5080), (0, 10), (14990, None), (None, None)]:
+        assert list(iter_window(path, start_ms, end_ms)) == in_window(records, start_ms, end_ms)
+
+def test_append_to_a_file_without_index_indexes_it_first(tmp_path):
+    path = str(tmp_path / 'plain.jsonl')
+    records = make_records(30)
+    with JsonlWriter(path) as writer:
+        for record in records[:20]:
+            writer.write(record)
+    assert load_index(path) is None
+    write_records(path, records[20:], append=True)
+    assert list(iter_window(path, 150, 250)) == in_window(records, 150, 250)
+
+def test_merged_index_of_concatenated_parts(tmp_path):
+    parts = [str(tmp_path / f'part{i}.jsonl') for i in range(3)]
+    records = make_records(INDEX_STRIDE * 2 + 123)
+    bounds = [0, 700, 700 + INDEX_STRIDE + 1, len(records)]
+    for part, start, end in zip(parts, bounds, bounds[1:]):
+        write_records(part, records[start:end])
+    output = str(tmp_path / 'merged.jsonl')
+    with open(output, 'wb') as out:
+        for part in parts:
+            with open(part, 'rb') as f:
+                out.write(f.read())
+
+    index = merge_indexes(output, parts)
+    assert index == load_index(output)
+    assert index['sorted'] and index['size'] == os.path.getsize(output)
+    assert [checkpoint[0] for checkpoint in index['checkpoints']] == sorted(checkpoint[0] for checkpoint in index['checkpoints'])
+    for start_ms, end_ms in [(6990, 7010), (6990, 17020), (0, 0), (20000, None)]:
+        assert list(iter_window(output, start_ms, end_ms)) == in_window(records, start_ms, end_ms)
+
+def test_merged_parts_out_of_time_order_are_not_sorted(tmp_path):
+    parts = [str(tmp_path / 'late.jsonl'), str(tmp_path / 'early.jsonl')]
+    write_records(parts[0], make_records(5, first=1000))
+    write_records(parts[1], make_records(5, first=0))
+    output = str(tmp_path / 'merged.jsonl')
+    with open(output, 'wb') as out:
+        for part in parts:
+            with open(part, 'rb') as f:
+                out.write(f.read())
+    assert not merge_indexes(output, parts)['sorted']
+    assert [record['timestamp_ms'] for record in iter_window(output, 0, 20)] == [0, 10, 20]
+
+def test_stale_index_is_ignored_and_not_rewritten_by_reads(indexed):
+    path, records = indexed
+    with open(path, 'ab') as f:
+        f.write(b'{"timestamp_ms":99999999,"value":"late"}\n')
+    with open(index_path(path), 'rb') as f:
+        saved = f.read()
+    assert load_index(path) is None
+    window = list(iter_window(path, 99999999, None))
+    assert window == [{'timestamp_ms': 99999999, 'value': 'late'}]
+    with open(index_path(path), 'rb') as f:
+        assert f.read() == saved
+    # ensure_index rebuilds it for the writers that need it
+    assert ensure_index(path)['size'] == os.path.getsize(path)
+
+def test_missing_index_is_read_in_full_without_writing_one(indexed):
+    path, records = indexed
+    os.remove(index_path(path))
+    assert list(iter_window(path, 9990, 10010)) == in_window(records, 9990, 10010)
+    assert not os.path.exists(index_path(path))
+    assert build_index(path) == load_index(path)
+
+def test_index_of_another_version_is_ignored(indexed):
+    path, _ = indexed
+    with open(index_path(path)) as f:
+        index = json.load(f)
+    index['version'] = -1
+    with open(index_path(path), 'w') as f:
+        json.dump(index, f)
+    assert load_index(path) is None
+
+def test_malformed_lines_are_skipped(tmp_path):
+    path = str(tmp_path / 'broken.jsonl')
+    with open(path, 'w') as f:
+        f.write('{"timestamp_ms":1}\nnot json\n[1, 2]\n\n{"timestamp_ms":2}\n')
+    assert list(iter_window(path)) == [{'timestamp_ms': 1}, {'timestamp_ms': 2}]
+    assert list(iter_window(path, 2, 2)) == [{'timestamp_ms': 2}]
+@pytest.mark.parametrize('cut', [0, 1, INDEX_STRIDE - 1, INDEX_STRIDE, INDEX_STRIDE + 1, INDEX_STRIDE * 2 + 499])
+def test_truncate_keeps_records_before_the_cut_and_the_index_in_step(indexed, cut):
+    path, records = indexed
+    size = truncate_records(path, records[cut]['timestamp_ms'])
+    assert size == os.path.getsize(path)
+    assert read_records(path) == records[:cut]
+    index = load_index(path)
+    assert index is not None and index['size'] == size
+    assert list(iter_window(path, 0, None)) == records[:cut]
+    # Appending after the cut continues from the trimmed index
+    write_records(path, records[cut:], append=True)
+    assert list(iter_window(path, records[cut]['timestamp_ms'] - 20, records[cut]['timestamp_ms'] + 20)) == \
+        in_window(records, records[cut]['timestamp_ms'] - 20, records[cut]['timestamp_ms'] + 20)
+
+def test_truncate_after_the_last_record_keeps_everything(indexed):
+    path, records = indexed
+    size = os.path.getsize(path)
+    assert truncate_records(path, records[-1]['timestamp_ms'] + 1) == size
+    assert read_records(path) == records